@@ -10,18 +10,21 @@ from flask import (
     session,
     redirect,
     abort,
-    send_file,
 )
 from datetime import datetime
 from typing import cast
 from config import Config
-from models import db
+from models import db, init_read_replica
 from models.tuban import Tuban
 from models.dictionary import Dictionary
 from models.rectify_record import RectifyRecord
 from models.event import Event
 from models.tuban_event import tuban_events
 from models.user import User
+from models.content_cache import ContentCache  # noqa: F401
+from models.blob import Blob  # noqa: F401
+from models.boundary_zone import BoundaryZone  # noqa: F401
+from models.duplicate_candidate import DuplicateCandidate  # noqa: F401
 from routes.tuban import tuban_bp
 from routes.stats import stats_bp
 from routes.system import system_bp
@@ -32,19 +35,29 @@ from utils.helpers import (
     format_date,
     format_datetime,
     get_status_color,
-    safe_join_upload,
 )
+from utils.db_tuning import init_db_tuning
+from utils.blob_store import ref_display_name, resolve_upload_path
+from utils.file_serving import (
+    image_url,
+    send_upload_file,
+    tile_manifest_url,
+    upload_url,
+)
+from utils.search_index import ensure_search_index
+from utils.document_extract_advanced import start_ocr_warmup
+from utils.upload_gc import start_gc_scheduler
 import os
 import secrets
-from test_icons import test_bp
 
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
-    # 初始化扩展
-    db.init_app(app)
+    # 初始化扩展（含数据库连接池与SQLite PRAGMA调优）
+    init_db_tuning(app, db)
+    init_read_replica(app)
 
     # 注册蓝图
     app.register_blueprint(tuban_bp, url_prefix="/tuban")
@@ -53,13 +66,21 @@ def create_app(config_class=Config):
     app.register_blueprint(map_bp, url_prefix="/map")
     app.register_blueprint(event_bp, url_prefix="/")
     app.register_blueprint(project_bp, url_prefix="/")
-    app.register_blueprint(test_bp, url_prefix="/test")
+
+    # 图标测试页面仅在调试模式或显式开启时注册
+    if app.debug or app.config.get("ENABLE_TEST_PAGES"):
+        from test_icons import test_bp
+
+        app.register_blueprint(test_bp, url_prefix="/test")
 
     # 添加模板全局函数
     template_globals = cast(dict[str, object], app.jinja_env.globals)
     template_globals["format_date"] = format_date
     template_globals["format_datetime"] = format_datetime
     template_globals["get_status_color"] = get_status_color
+    template_globals["upload_url"] = upload_url
+    template_globals["image_url"] = image_url
+    template_globals["tile_manifest_url"] = tile_manifest_url
 
     def get_csrf_token():
         token = session.get("_csrf_token")
@@ -86,6 +107,9 @@ def create_app(config_class=Config):
         except:
             return []
 
+    # 附件引用显示为原文件名
+    app.add_template_filter(ref_display_name, "ref_name")
+
     template_globals["get_current_date"] = get_current_date
 
     # 创建上传目录
@@ -178,10 +202,12 @@ def create_app(config_class=Config):
 
     @app.route("/uploads/<path:filename>")
     def serve_upload(filename):
-        safe_path = safe_join_upload(app.config["UPLOAD_FOLDER"], filename)
+        safe_path = resolve_upload_path(app.config["UPLOAD_FOLDER"], filename)
         if not safe_path or not safe_path.exists():
             abort(404)
-        return send_file(safe_path, as_attachment=True, download_name=safe_path.name)
+        return send_upload_file(
+            safe_path, as_attachment=True, download_name=ref_display_name(filename)
+        )
 
     @app.before_request
     def before_request():
@@ -213,6 +239,13 @@ def create_app(config_class=Config):
             if not csrf_token or not submitted_token or csrf_token != submitted_token:
                 abort(400)
 
+    # 后台预加载OCR模型（可选）
+    if app.config.get("OCR_WARMUP"):
+        start_ocr_warmup()
+
+    # 定期回收上传目录中的孤儿文件（可选）
+    start_gc_scheduler(app)
+
     return app
 
 
@@ -220,4 +253,5 @@ if __name__ == "__main__":
     app = create_app()
     with app.app_context():
         db.create_all()
+        ensure_search_index()
     app.run(debug=True)
@@ -0,0 +1,149 @@
+"""
+为已有图斑图片补生成缩略图/预览图
+
+用法：
+    python build_image_derivatives.py            # 只处理缺少派生图的图片
+    python build_image_derivatives.py --force    # 全部重新生成
+    python build_image_derivatives.py --workers 4
+    python build_image_derivatives.py --tiles    # 同时为大幅面卫片生成瓦片金字塔
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app
+from config import Config
+from models import db
+from models.tuban_image import TubanImage
+from utils.blob_store import image_source_path
+from utils.image_derivatives import generate_derivatives, is_available
+from utils.image_tiles import build_tile_pyramid
+
+BATCH_SIZE = 100
+
+
+def _generate(images_folder: str, filename: str, force: bool):
+    try:
+        return generate_derivatives(images_folder, filename, force), None
+    except Exception as e:
+        return None, e
+
+
+def build_derivatives(images_folder: str, force: bool, workers: int) -> dict[str, int]:
+    """分批生成派生图并记录到数据库，返回统计"""
+    query = db.session.query(TubanImage.id).filter(TubanImage.is_deleted == 0)
+    if not force:
+        query = query.filter(
+            db.or_(
+                TubanImage.thumb_filename.is_(None),
+                TubanImage.medium_filename.is_(None),
+            )
+        )
+    image_ids = [image_id for (image_id,) in query.order_by(TubanImage.id)]
+
+    counts = {"ok": 0, "skip": 0, "fail": 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(image_ids), BATCH_SIZE):
+            images = TubanImage.query.filter(
+                TubanImage.id.in_(image_ids[start : start + BATCH_SIZE])
+            ).all()
+
+            pending = []
+            for image in images:
+                if not os.path.exists(image_source_path(images_folder, image.filename)):
+                    print(f"[skip] file missing: {image.filename}")
+                    counts["skip"] += 1
+                    continue
+                pending.append(image)
+
+            results = pool.map(
+                lambda image: _generate(images_folder, image.filename, force), pending
+            )
+            for image, (names, error) in zip(pending, results):
+                if error is not None:
+                    print(f"[fail] {image.filename}: {error}")
+                    counts["fail"] += 1
+                    continue
+                image.thumb_filename = names["thumb"]
+                image.medium_filename = names["medium"]
+                counts["ok"] += 1
+            db.session.commit()
+    return counts
+
+
+def build_tiles(images_folder: str, force: bool) -> dict[str, int]:
+    """为卫片生成瓦片金字塔（逐张串行，避免多张大图同时占用内存）"""
+    filenames = [
+        filename
+        for (filename,) in db.session.query(TubanImage.filename)
+        .filter(TubanImage.is_deleted == 0, TubanImage.image_type == "satellite")
+        .order_by(TubanImage.id)
+    ]
+
+    counts = {"ok": 0, "skip": 0, "fail": 0}
+    for filename in filenames:
+        if not os.path.exists(image_source_path(images_folder, filename)):
+            print(f"[skip] file missing: {filename}")
+            counts["skip"] += 1
+            continue
+        try:
+            result = build_tile_pyramid(images_folder, filename, force=force)
+        except Exception as e:
+            print(f"[fail] {filename}: {e}")
+            counts["fail"] += 1
+            continue
+        if result is None:
+            counts["skip"] += 1
+        else:
+            print(
+                f"[ok] {filename}: {result['levels']} levels, {result['tiles']} tiles"
+            )
+            counts["ok"] += 1
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="为已有图斑图片补生成缩略图/预览图")
+    parser.add_argument("--force", action="store_true", help="全部重新生成")
+    parser.add_argument(
+        "--tiles", action="store_true", help="同时为大幅面卫片生成瓦片金字塔"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=Config.IMAGE_DERIVATIVE_WORKERS,
+        help="并发生成线程数",
+    )
+    args = parser.parse_args()
+
+    if not is_available():
+        print("[fail] Pillow is not installed")
+        sys.exit(1)
+
+    app = create_app()
+    with app.app_context():
+        images_folder = os.path.join(app.config["UPLOAD_FOLDER"], "images")
+        try:
+            counts = build_derivatives(images_folder, args.force, max(1, args.workers))
+            tile_counts = build_tiles(images_folder, args.force) if args.tiles else None
+        except Exception as e:
+            db.session.rollback()
+            print(f"[fail] {e}")
+            sys.exit(1)
+        print(
+            f"[done] generated: {counts['ok']}, skipped: {counts['skip']}, "
+            f"failed: {counts['fail']}"
+        )
+        if tile_counts is not None:
+            print(
+                f"[done] tiled: {tile_counts['ok']}, skipped: {tile_counts['skip']}, "
+                f"failed: {tile_counts['fail']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
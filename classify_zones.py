@@ -0,0 +1,80 @@
+"""
+按功能区边界图层批量判定图斑所在功能区
+
+用法：
+    python classify_zones.py                          # 报告与已填功能区不一致的图斑
+    python classify_zones.py --apply                  # 把不一致的功能区更新为判定结果
+    python classify_zones.py --park 某某地质公园
+    python classify_zones.py --load 功能区.zip --park 某某地质公园 --zone-field GNQ
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+from app import create_app
+from models import db
+from utils.boundary_zones import load_boundary_file, reclassify_tubans
+from utils.gis_import import GISImportError
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="按边界图层判定图斑功能区")
+    parser.add_argument("--apply", action="store_true", help="写回不一致的功能区")
+    parser.add_argument("--park", help="只处理该地质公园（--load 时必填）")
+    parser.add_argument("--load", metavar="PATH", help="先导入边界面图层文件")
+    parser.add_argument("--zone-field", help="导入：功能区属性列名")
+    parser.add_argument("--zone", help="导入：整个文件都属于该功能区")
+    parser.add_argument("--crs", help="导入：源坐标系，默认按文件声明")
+    parser.add_argument(
+        "--replace", action="store_true", help="导入：先删除该公园已有的边界面"
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            if args.load:
+                if not args.park:
+                    parser.error("--load 需要同时指定 --park")
+                counts = load_boundary_file(
+                    args.load,
+                    args.park,
+                    zone_field=args.zone_field,
+                    default_zone=args.zone,
+                    crs=args.crs,
+                    replace=args.replace,
+                    source_name=args.load,
+                )
+                print(
+                    f"[ok] zones: {counts['zones']}, skipped: {counts['skipped']}, "
+                    f"replaced: {counts['replaced']}"
+                )
+            started = time.perf_counter()
+            result = reclassify_tubans(apply=args.apply, park_name=args.park)
+        except (GISImportError, ValueError) as e:
+            print(f"[skip] {e}")
+            sys.exit(1)
+        except Exception as e:
+            db.session.rollback()
+            print(f"[fail] {e}")
+            sys.exit(1)
+
+        for row in result["mismatches"]:
+            detected = row["detected"] or "(不在功能区内)"
+            print(
+                f"[{row['status']}] {row['tuban_code']} {row['park_name']}: "
+                f"{row['func_zone'] or '(空)'} -> {detected}"
+            )
+        print(
+            f"[done] checked: {result['checked']}, matched: {result['matched']}, "
+            f"mismatched: {result['mismatched']}, outside: {result['outside']}, "
+            f"no_layer: {result['no_layer']}, updated: {result['updated']} "
+            f"({time.perf_counter() - started:.2f}s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,60 @@ import os
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 
+def _database_url() -> str:
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        return "sqlite:///" + os.path.join(basedir, "database", "tubans.db")
+    # 兼容部分平台提供的 postgres:// 前缀
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://") :]
+    return url
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY") or "dev-secret-key-change-in-production"
-    SQLALCHEMY_DATABASE_URI = os.environ.get(
-        "DATABASE_URL"
-    ) or "sqlite:///" + os.path.join(basedir, "database", "tubans.db")
+    SQLALCHEMY_DATABASE_URI = _database_url()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Read replica (optional): read-only blueprints/endpoints query this bind
+    SQLALCHEMY_BINDS = (
+        {"replica": os.environ["DATABASE_REPLICA_URL"]}
+        if os.environ.get("DATABASE_REPLICA_URL")
+        else {}
+    )
+    READ_REPLICA_BLUEPRINTS = {"stats", "map"}
+    READ_REPLICA_ENDPOINTS = {
+        "tuban.export_excel",
+        "tuban.export_data",
+        "tuban.export_gis_data",
+        "project.search",
+    }
+    # Seconds after a user's own write during which their reads stay on primary
+    REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+
+    # Database pool settings (applied to SQLite files and server databases)
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+
+    # SQLite pragmas
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", 64 * 1024))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
+    # Single-writer queue (serializes write transactions, default on for SQLite)
+    WRITE_QUEUE_ENABLED = (
+        os.environ.get(
+            "WRITE_QUEUE_ENABLED",
+            "1" if SQLALCHEMY_DATABASE_URI.startswith("sqlite") else "0",
+        )
+        == "1"
+    )
+    WRITE_QUEUE_BATCH_SIZE = int(os.environ.get("WRITE_QUEUE_BATCH_SIZE", 32))
+    WRITE_QUEUE_BATCH_WINDOW_MS = int(os.environ.get("WRITE_QUEUE_BATCH_WINDOW_MS", 5))
+    WRITE_QUEUE_TIMEOUT = int(os.environ.get("WRITE_QUEUE_TIMEOUT", 60))
+
     # Pagination
     TUBANS_PER_PAGE = 20
 
@@ -17,9 +64,114 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = os.path.join(basedir, "uploads")
 
+    # File delivery: versioned (?v=<etag>) URLs are cached for a year
+    FILE_CACHE_MAX_AGE = int(os.environ.get("FILE_CACHE_MAX_AGE", 365 * 24 * 3600))
+    # Offload file bytes to the front-end server (Apache/lighttpd X-Sendfile)
+    USE_X_SENDFILE = os.environ.get("USE_X_SENDFILE", "0") == "1"
+    # nginx internal location mapped to UPLOAD_FOLDER, e.g. /_protected_uploads
+    X_ACCEL_REDIRECT_PREFIX = os.environ.get("X_ACCEL_REDIRECT_PREFIX", "")
+
+    # Image derivatives (thumbnails / previews generated after upload)
+    IMAGE_THUMB_SIZE = int(os.environ.get("IMAGE_THUMB_SIZE", 320))
+    IMAGE_MEDIUM_SIZE = int(os.environ.get("IMAGE_MEDIUM_SIZE", 1280))
+    IMAGE_DERIVATIVE_FORMAT = os.environ.get("IMAGE_DERIVATIVE_FORMAT", "webp")
+    IMAGE_DERIVATIVE_QUALITY = int(os.environ.get("IMAGE_DERIVATIVE_QUALITY", 80))
+    IMAGE_DERIVATIVE_WORKERS = int(os.environ.get("IMAGE_DERIVATIVE_WORKERS", 2))
+
+    # Satellite tile pyramid (Deep Zoom), built for images at least TILE_MIN_EDGE px
+    TILE_SIZE = int(os.environ.get("TILE_SIZE", 256))
+    TILE_QUALITY = int(os.environ.get("TILE_QUALITY", 85))
+    TILE_MIN_EDGE = int(os.environ.get("TILE_MIN_EDGE", 2048))
+    TILE_MAX_PIXELS = int(os.environ.get("TILE_MAX_PIXELS", 1_000_000_000))
+    TILE_WORKERS = int(os.environ.get("TILE_WORKERS", 1))
+
+    # Chunked resumable uploads (large attachments and satellite imagery)
+    CHUNK_UPLOAD_CHUNK_SIZE = int(
+        os.environ.get("CHUNK_UPLOAD_CHUNK_SIZE", 4 * 1024 * 1024)
+    )
+    CHUNK_UPLOAD_MAX_SIZE = int(
+        os.environ.get("CHUNK_UPLOAD_MAX_SIZE", 2 * 1024 * 1024 * 1024)
+    )
+    CHUNK_UPLOAD_EXPIRE_HOURS = int(os.environ.get("CHUNK_UPLOAD_EXPIRE_HOURS", 24))
+
+    # Orphan upload GC: unreferenced files older than the grace period are moved
+    # to .quarantine and deleted after UPLOAD_GC_QUARANTINE_DAYS
+    UPLOAD_GC_GRACE_HOURS = float(os.environ.get("UPLOAD_GC_GRACE_HOURS", 24))
+    UPLOAD_GC_QUARANTINE_DAYS = float(os.environ.get("UPLOAD_GC_QUARANTINE_DAYS", 7))
+    # Run GC in a background thread every N hours (0 = only via gc_uploads.py/cron)
+    UPLOAD_GC_INTERVAL_HOURS = float(os.environ.get("UPLOAD_GC_INTERVAL_HOURS", 0))
+
     # Excel settings
     EXCEL_ALLOWED_EXTENSIONS = {"xlsx", "xls"}
 
+    # Coordinate reference systems: wgs84 / cgcs2000 / gcj02
+    # CRS of Tuban.longitude/latitude as stored (Tianditu uses CGCS2000)
+    TUBAN_COORDINATE_CRS = os.environ.get("TUBAN_COORDINATE_CRS", "cgcs2000")
+    # CRS of the map base layer; gcj02 for AMap/Tencent tiles
+    MAP_DISPLAY_CRS = os.environ.get("MAP_DISPLAY_CRS", "cgcs2000")
+
+    # GIS import (GeoJSON/KML/Shapefile/GeoPackage)
+    # Accepted lon/lat extent "min_lon,min_lat,max_lon,max_lat" (empty = whole globe)
+    GIS_IMPORT_BOUNDS = os.environ.get("GIS_IMPORT_BOUNDS", "73,3,136,54")
+    # Extra attribute mapping as JSON {"source column": "tuban field"}
+    GIS_IMPORT_FIELD_MAPPING = os.environ.get("GIS_IMPORT_FIELD_MAPPING", "")
+    # DBF encoding used when a shapefile has no .cpg file
+    GIS_IMPORT_DBF_ENCODING = os.environ.get("GIS_IMPORT_DBF_ENCODING", "gbk")
+    # Boundary layers: set func_zone from the zone polygon containing the point on save
+    ZONE_AUTO_ASSIGN = os.environ.get("ZONE_AUTO_ASSIGN", "1") == "1"
+    # Overlapping zone polygons resolve to the first zone in this list
+    ZONE_PRECEDENCE = os.environ.get("ZONE_PRECEDENCE", "核心区,缓冲区,实验区")
+    # Near-duplicate tubans: pairs within DEDUP_DISTANCE_METERS scoring at least
+    # DEDUP_MIN_SCORE (distance/area/name similarity) go to the review queue
+    DEDUP_DISTANCE_METERS = float(os.environ.get("DEDUP_DISTANCE_METERS", 30))
+    DEDUP_MIN_SCORE = float(os.environ.get("DEDUP_MIN_SCORE", 0.7))
+    # Max neighbours compared per tuban and grid cell (guards stacked coordinates)
+    DEDUP_MAX_BLOCK = int(os.environ.get("DEDUP_MAX_BLOCK", 500))
+    DEDUP_ON_SAVE = os.environ.get("DEDUP_ON_SAVE", "1") == "1"
+    DEDUP_ON_IMPORT = os.environ.get("DEDUP_ON_IMPORT", "1") == "1"
+    # Finished background jobs stay queryable for this long
+    BACKGROUND_JOB_RETENTION_SECONDS = int(
+        os.environ.get("BACKGROUND_JOB_RETENTION_SECONDS", 3600)
+    )
+
+    # PDF analysis settings
+    PDF_SAMPLE_PAGES = int(os.environ.get("PDF_SAMPLE_PAGES", 3))
+    PDF_MIN_PAGE_CHARS = int(os.environ.get("PDF_MIN_PAGE_CHARS", 50))
+    # Larger uploads are spooled to a temp file and opened by path
+    PDF_MEMORY_LIMIT = int(os.environ.get("PDF_MEMORY_LIMIT", 8 * 1024 * 1024))
+
+    # OCR settings (scanned PDF page-level OCR)
+    OCR_WORKERS = int(os.environ.get("OCR_WORKERS", 0))  # 0 = half of CPU cores
+    OCR_MAX_PAGES = int(os.environ.get("OCR_MAX_PAGES", 200))
+    OCR_MAX_IN_FLIGHT = int(os.environ.get("OCR_MAX_IN_FLIGHT", 8))
+    # Preload OCR models on a background thread at startup
+    OCR_WARMUP = os.environ.get("OCR_WARMUP", "0") == "1"
+
+    # AI summary settings (Zhipu API)
+    ZHIPU_API_BASE = os.environ.get(
+        "ZHIPU_API_BASE", "https://open.bigmodel.cn/api/paas/v4"
+    )
+    ZHIPU_MODEL = os.environ.get("ZHIPU_MODEL", "glm-4")
+    ZHIPU_CONNECT_TIMEOUT = float(os.environ.get("ZHIPU_CONNECT_TIMEOUT", 5))
+    ZHIPU_READ_TIMEOUT = float(os.environ.get("ZHIPU_READ_TIMEOUT", 60))
+    ZHIPU_MAX_RETRIES = int(os.environ.get("ZHIPU_MAX_RETRIES", 3))
+    ZHIPU_BACKOFF_BASE = float(os.environ.get("ZHIPU_BACKOFF_BASE", 1))
+    ZHIPU_BACKOFF_MAX = float(os.environ.get("ZHIPU_BACKOFF_MAX", 30))
+    ZHIPU_POOL_SIZE = int(os.environ.get("ZHIPU_POOL_SIZE", 10))
+    ZHIPU_CIRCUIT_THRESHOLD = int(os.environ.get("ZHIPU_CIRCUIT_THRESHOLD", 5))
+    ZHIPU_CIRCUIT_RESET = float(os.environ.get("ZHIPU_CIRCUIT_RESET", 60))
+    ZHIPU_RATE_PER_SECOND = float(os.environ.get("ZHIPU_RATE_PER_SECOND", 2))
+    ZHIPU_RATE_BURST = int(os.environ.get("ZHIPU_RATE_BURST", 4))
+    SUMMARY_CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", 3000))
+    SUMMARY_MAX_WORKERS = int(os.environ.get("SUMMARY_MAX_WORKERS", 4))
+    SUMMARY_TIMEOUT = int(os.environ.get("SUMMARY_TIMEOUT", 120))
+
+    # Startup settings
+    # Icon test pages (/test/...) are registered only in debug mode or when enabled
+    ENABLE_TEST_PAGES = os.environ.get("ENABLE_TEST_PAGES", "0") == "1"
+    # Import-time budget checked by profile_startup.py (milliseconds)
+    STARTUP_IMPORT_BUDGET_MS = int(os.environ.get("STARTUP_IMPORT_BUDGET_MS", 1500))
+
     # Application settings
     APP_NAME = "地质公园疑似违法图斑管理系统"
     APP_VERSION = "1.0.0"
@@ -28,6 +180,12 @@ class Config:
     STATS_CACHE_TTL = int(os.environ.get("STATS_CACHE_TTL", 30))
     MAP_CACHE_TTL = int(os.environ.get("MAP_CACHE_TTL", 15))
 
+    # Content cache (document extraction / AI summaries, keyed by SHA-256)
+    CONTENT_CACHE_ENABLED = os.environ.get("CONTENT_CACHE_ENABLED", "1") == "1"
+    CONTENT_CACHE_MAX_BYTES = int(
+        os.environ.get("CONTENT_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+    )
+
     # Date format
     DATE_FORMAT = "%Y-%m-%d"
     DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
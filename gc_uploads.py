@@ -0,0 +1,93 @@
+"""
+回收上传目录中不再被引用的文件
+
+用法：
+    python gc_uploads.py                 # 隔离孤儿文件，并清除过期的隔离批次
+    python gc_uploads.py --dry-run       # 只统计可回收的文件数和字节数
+    python gc_uploads.py --recount       # 先按全部引用重新统计blob引用计数
+    python gc_uploads.py --grace-hours 1 --quarantine-days 3
+    python gc_uploads.py --restore 20240101-020000   # 恢复一个隔离批次
+
+可由 cron / Windows 计划任务定期执行，或设置 UPLOAD_GC_INTERVAL_HOURS 由应用定期执行。
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from app import create_app
+from models import db
+from utils.blob_store import recount_blob_refs
+from utils.upload_gc import UploadGCError, restore_quarantine, run_gc
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f}{unit}" if unit != "B" else f"{size}B"
+        size /= 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="回收上传目录中的孤儿文件")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="只统计可回收的文件，不移动/删除"
+    )
+    parser.add_argument("--recount", action="store_true", help="先重新统计blob引用计数")
+    parser.add_argument("--grace-hours", type=float, help="宽限期（小时）")
+    parser.add_argument("--quarantine-days", type=float, help="隔离保留天数")
+    parser.add_argument("--restore", metavar="BATCH", help="恢复指定隔离批次")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        upload_root = app.config["UPLOAD_FOLDER"]
+        try:
+            if args.restore:
+                counts = restore_quarantine(upload_root, args.restore)
+                print(
+                    f"[done] restored: {counts.get('restored', 0)}, "
+                    f"conflicts: {counts.get('conflicts', 0)}"
+                )
+                return
+            if args.recount:
+                counts = recount_blob_refs()
+                print(
+                    f"[recount] referenced blobs: {counts['referenced']}, "
+                    f"updated: {counts['updated']}"
+                )
+            stats = run_gc(
+                report_only=args.dry_run,
+                grace_hours=args.grace_hours,
+                quarantine_days=args.quarantine_days,
+            )
+        except UploadGCError as e:
+            print(f"[skip] {e}")
+            sys.exit(1)
+        except Exception as e:
+            db.session.rollback()
+            print(f"[fail] {e}")
+            sys.exit(1)
+
+    print(
+        f"[scan] entries: {stats.get('scanned', 0)}, "
+        f"orphans: {stats.get('orphan_files', 0)} "
+        f"({_format_bytes(stats.get('orphan_bytes', 0))} reclaimable), "
+        f"skipped recent: {stats.get('skipped_recent', 0)}, "
+        f"re-referenced: {stats.get('skipped_referenced', 0)}"
+    )
+    if args.dry_run:
+        print("[done] dry run, nothing moved")
+        return
+    print(
+        f"[done] quarantined: {stats.get('quarantined_files', 0)} "
+        f"({_format_bytes(stats.get('quarantined_bytes', 0))}), "
+        f"purged: {stats.get('purged_files', 0)} "
+        f"({_format_bytes(stats.get('purged_bytes', 0))}), "
+        f"stale upload sessions: {stats.get('stale_chunk_sessions', 0)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
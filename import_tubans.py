@@ -0,0 +1,107 @@
+"""
+从 Excel / CSV / Parquet / GIS 文件批量导入图斑（不受网页上传16MB限制）
+
+用法：
+    python import_tubans.py 台账.parquet                 # 跳过已存在的图斑编号
+    python import_tubans.py 台账.csv --mode upsert       # 更新内容有变化的图斑
+    python import_tubans.py 台账.xlsx --mode upsert
+    python import_tubans.py 卫片图斑.zip --event-id 3 --mapping "TBBH=tuban_code"
+    python import_tubans.py 高德标注.geojson --crs gcj02  # 文件未声明坐标系时指定
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import datetime
+
+from app import create_app
+from models import db
+from models.event import Event
+from utils.duplicate_detection import scan_duplicates
+from utils.excel_handler import IMPORT_MODES, import_tubans_from_excel
+from utils.gis_import import (
+    GIS_IMPORT_FORMATS,
+    GISImportError,
+    import_gis_file,
+    parse_field_mapping,
+)
+from utils.tuban_interchange import IMPORT_FORMATS, load_tubans_from_file
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量导入图斑")
+    parser.add_argument("path", help="Excel/CSV/Parquet/GIS 文件路径")
+    parser.add_argument(
+        "--mode", choices=IMPORT_MODES, default=IMPORT_MODES[0], help="导入模式"
+    )
+    parser.add_argument("--event-id", type=int, help="GIS导入：关联到该事件")
+    parser.add_argument(
+        "--mapping", help='GIS导入：属性映射，JSON 或 "源字段=图斑字段"（多条用换行）'
+    )
+    parser.add_argument(
+        "--crs",
+        help="GIS导入：源坐标系（wgs84/cgcs2000/gcj02/EPSG:4527），默认按文件声明",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        ext = args.path.rsplit(".", 1)[-1].lower()
+        started = datetime.now()
+        try:
+            if ext in GIS_IMPORT_FORMATS:
+                counts = _import_gis(args)
+            elif ext in IMPORT_FORMATS:
+                counts = load_tubans_from_file(args.path, mode=args.mode)
+            else:
+                counts = import_tubans_from_excel(args.path, mode=args.mode)
+        except GISImportError as e:
+            print(f"[skip] {e}")
+            sys.exit(1)
+        except Exception as e:
+            db.session.rollback()
+            print(f"[fail] {e}")
+            sys.exit(1)
+        for message in counts.get("errors", []):
+            print(f"[skip] {message}")
+        summary = (
+            f"[done] inserted: {counts['inserted']}, updated: {counts['updated']}, "
+            f"unchanged: {counts['unchanged']}, skipped: {counts['skipped']}"
+        )
+        if "rejected" in counts:
+            summary += f", rejected: {counts['rejected']}"
+        if "linked" in counts:
+            summary += f", linked: {counts['linked']}"
+        print(summary)
+
+        if app.config["DEDUP_ON_IMPORT"] and (counts["inserted"] or counts["updated"]):
+            try:
+                duplicates = scan_duplicates(changed_since=started)["new"]
+            except Exception as e:
+                db.session.rollback()
+                print(f"[fail] duplicate check: {e}")
+                sys.exit(1)
+            print(f"[done] duplicate candidates: {duplicates}")
+
+
+def _import_gis(args) -> dict:
+    if args.event_id is not None and db.session.get(Event, args.event_id) is None:
+        raise GISImportError(f"事件不存在: {args.event_id}")
+
+    def progress(processed, total, counts):
+        total_text = f"/{total}" if total else ""
+        print(f"[ok] {processed}{total_text} features", flush=True)
+
+    return import_gis_file(
+        args.path,
+        mode=args.mode,
+        event_id=args.event_id,
+        mapping=parse_field_mapping(args.mapping),
+        crs=args.crs,
+        progress=progress,
+    )
+
+
+if __name__ == "__main__":
+    main()
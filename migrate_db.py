@@ -2,14 +2,24 @@ from __future__ import annotations
 
 from datetime import datetime
 from pathlib import Path
+import argparse
 import os
+import sys
 
-from sqlalchemy import text
+from sqlalchemy import inspect, text
 from werkzeug.security import generate_password_hash
 
 from app import create_app
 from config import Config
 from models import db
+from models.blob import Blob
+from models.boundary_zone import BoundaryZone
+from models.content_cache import ContentCache
+from models.duplicate_candidate import DuplicateCandidate
+from models.tuban import Tuban
+from models.user import User
+from utils.index_advisor import check_query_plans, print_query_plan_report
+from utils.search_index import ensure_search_index
 
 
 def resolve_sqlite_path() -> Path | None:
@@ -32,22 +42,30 @@ def backup_database(db_path: Path) -> Path:
     return backup_path
 
 
+def _inspector():
+    return inspect(db.session.connection())
+
+
 def column_exists(table_name: str, column_name: str) -> bool:
-    rows = db.session.execute(text(f"PRAGMA table_info({table_name})")).all()
-    return any(row[1] == column_name for row in rows)
+    columns = _inspector().get_columns(table_name)
+    return any(column["name"] == column_name for column in columns)
 
 
 def index_exists(table_name: str, index_name: str) -> bool:
-    rows = db.session.execute(text(f"PRAGMA index_list({table_name})")).all()
-    return any(row[1] == index_name for row in rows)
+    indexes = _inspector().get_indexes(table_name)
+    return any(index["name"] == index_name for index in indexes)
 
 
 def table_exists(table_name: str) -> bool:
-    rows = db.session.execute(
-        text("SELECT name FROM sqlite_master WHERE type='table' AND name=:name"),
-        {"name": table_name},
-    ).all()
-    return len(rows) > 0
+    return _inspector().has_table(table_name)
+
+
+def create_table_if_missing(table) -> None:
+    if table_exists(table.name):
+        print(f"[skip] table exists: {table.name}")
+        return
+    table.create(bind=db.session.connection())
+    print(f"[add] table: {table.name}")
 
 
 def add_column_if_missing(table_name: str, column_sql: str, column_name: str) -> None:
@@ -71,36 +89,30 @@ def add_index_if_missing(table_name: str, index_name: str, column_name: str) ->
     print(f"[add] index: {index_name} on {table_name}({column_name})")
 
 
+def add_model_indexes_if_missing(table) -> None:
+    """创建模型 __table_args__ 中定义的复合/部分索引"""
+    for index in sorted(table.indexes, key=lambda item: item.name):
+        if index_exists(table.name, index.name):
+            print(f"[skip] index exists: {index.name}")
+            continue
+        index.create(bind=db.session.connection())
+        columns = ", ".join(column.name for column in index.columns)
+        print(f"[add] index: {index.name} on {table.name}({columns})")
+
+
 def migrate() -> None:
     db_path = resolve_sqlite_path()
-    if db_path is None:
-        raise RuntimeError("Only sqlite:/// databases are supported by this script.")
-    if not db_path.exists():
-        raise FileNotFoundError(f"Database not found: {db_path}")
-
-    backup_path = backup_database(db_path)
-    print(f"[backup] {backup_path}")
+    if db_path is not None:
+        if not db_path.exists():
+            raise FileNotFoundError(f"Database not found: {db_path}")
+        backup_path = backup_database(db_path)
+        print(f"[backup] {backup_path}")
+    else:
+        # 服务器数据库请使用数据库自身的备份工具（如 pg_dump）
+        print(f"[info] server database: {db.engine.dialect.name}, backup skipped")
 
     # Create users table if missing
-    if not table_exists("users"):
-        db.session.execute(
-            text(
-                """
-                CREATE TABLE users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username VARCHAR(80) NOT NULL UNIQUE,
-                    password_hash VARCHAR(255) NOT NULL,
-                    role VARCHAR(20) DEFAULT 'user',
-                    is_active INTEGER DEFAULT 1,
-                    created_at DATETIME,
-                    updated_at DATETIME
-                )
-                """
-            )
-        )
-        print("[add] table: users")
-    else:
-        print("[skip] table exists: users")
+    create_table_if_missing(User.__table__)
 
     # Ensure admin user exists
     admin_exists = db.session.execute(
@@ -131,12 +143,44 @@ def migrate() -> None:
     else:
         print("[skip] admin user exists")
 
+    # 内容缓存表（文档提取文本、AI摘要）
+    create_table_if_missing(ContentCache.__table__)
+
+    # 内容寻址附件存储（按SHA-256去重）
+    create_table_if_missing(Blob.__table__)
+
+    # 功能区边界面（点面判定功能区）
+    create_table_if_missing(BoundaryZone.__table__)
+
+    # 疑似重复图斑审核队列
+    create_table_if_missing(DuplicateCandidate.__table__)
+
     # Add missing columns
     add_column_if_missing(
         table_name="project_documents",
         column_sql="ai_summary_status VARCHAR(20)",
         column_name="ai_summary_status",
     )
+    add_column_if_missing(
+        table_name="project_documents",
+        column_sql="extracted_text TEXT",
+        column_name="extracted_text",
+    )
+    add_column_if_missing(
+        table_name="tubans",
+        column_sql="row_hash VARCHAR(64)",
+        column_name="row_hash",
+    )
+    add_column_if_missing(
+        table_name="tuban_images",
+        column_sql="thumb_filename VARCHAR(255)",
+        column_name="thumb_filename",
+    )
+    add_column_if_missing(
+        table_name="tuban_images",
+        column_sql="medium_filename VARCHAR(255)",
+        column_name="medium_filename",
+    )
 
     # Add indexes
     index_specs = [
@@ -157,19 +201,52 @@ def migrate() -> None:
         ("events", "idx_events_is_active", "is_active"),
         ("dictionaries", "idx_dictionaries_dict_type", "dict_type"),
         ("dictionaries", "idx_dictionaries_dict_code", "dict_code"),
+        ("tuban_images", "idx_tuban_images_filename", "filename"),
     ]
 
     for table_name, index_name, column_name in index_specs:
         add_index_if_missing(table_name, index_name, column_name)
 
+    # 复合索引与部分索引（匹配高频查询形态）
+    add_model_indexes_if_missing(Tuban.__table__)
+
+    db.session.commit()
+
+    # 项目公文全文索引（SQLite FTS5），已有数据请运行 rebuild_search_index.py
+    if ensure_search_index():
+        print("[ok] full-text index table: project_search_fts")
+
+    # 更新统计信息，便于查询规划器选择新索引
+    db.session.execute(text("ANALYZE"))
     db.session.commit()
     print("[done] migration completed")
 
 
+def check_plans() -> bool:
+    """检查高频查询的执行计划，存在全表扫描时返回False"""
+    ok = print_query_plan_report(check_query_plans())
+    print("[done] query plans ok" if ok else "[fail] full table scan detected")
+    return ok
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="数据库迁移")
+    parser.add_argument(
+        "--check-plans",
+        action="store_true",
+        help="迁移后检查高频查询执行计划，出现全表扫描时以非零状态退出",
+    )
+    parser.add_argument(
+        "--plans-only", action="store_true", help="只检查执行计划，不执行迁移"
+    )
+    args = parser.parse_args()
+
     app = create_app()
     with app.app_context():
-        migrate()
+        if not args.plans_only:
+            migrate()
+        if (args.check_plans or args.plans_only) and not check_plans():
+            sys.exit(1)
 
 
 if __name__ == "__main__":
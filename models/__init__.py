@@ -1,3 +1,92 @@
+"""
+数据库会话与读写分离路由
+
+配置了 replica 绑定（DATABASE_REPLICA_URL）时，只读蓝图/端点的查询发往只读副本；
+用户自己提交写入后的一小段时间内（REPLICA_STICKY_SECONDS），该用户的请求
+仍读主库，保证读到自己的写入。
+"""
+
+import time
+
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask import session as http_session
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND_KEY = "replica"
+LAST_WRITE_SESSION_KEY = "_db_last_write_at"
+
+
+class RoutingSession(Session):
+    """按请求类型在主库与只读副本之间选择连接的会话"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._route_to_replica(clause):
+            replica = self._db.engines.get(REPLICA_BIND_KEY)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _route_to_replica(self, clause) -> bool:
+        if not has_app_context() or not g.get("db_use_replica"):
+            return False
+        # 刷新中或存在未提交的修改时必须读主库
+        if self._flushing or self.new or self.dirty or self.deleted:
+            return False
+        if self.info.get("has_writes"):
+            return False
+        return isinstance(clause, (sa.sql.Select, sa.sql.CompoundSelect))
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _record_flush(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _record_commit(session):
+    if session.info.pop("has_writes", False):
+        mark_db_write()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _clear_writes(session):
+    session.info.pop("has_writes", None)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def mark_db_write() -> None:
+    """记录当前用户的写入时间，用于读己之写的粘滞窗口"""
+    if has_request_context():
+        http_session[LAST_WRITE_SESSION_KEY] = time.time()
+
+
+def should_use_replica() -> bool:
+    """判断当前请求是否可以读只读副本"""
+    config = current_app.config
+    if REPLICA_BIND_KEY not in (config.get("SQLALCHEMY_BINDS") or {}):
+        return False
+    if request.method not in ("GET", "HEAD"):
+        return False
+
+    last_write = http_session.get(LAST_WRITE_SESSION_KEY)
+    if last_write and time.time() - last_write < config["REPLICA_STICKY_SECONDS"]:
+        return False
+
+    if request.blueprint in config["READ_REPLICA_BLUEPRINTS"]:
+        return True
+    if request.endpoint in config["READ_REPLICA_ENDPOINTS"]:
+        return True
+    return request.path.endswith("/api/list")
+
+
+def init_read_replica(app) -> None:
+    """注册请求钩子，为只读请求开启副本路由"""
 
-db = SQLAlchemy()
\ No newline at end of file
+    @app.before_request
+    def _select_database_for_request():
+        g.db_use_replica = should_use_replica()
@@ -0,0 +1,22 @@
+from datetime import datetime
+from . import db
+
+
+class Blob(db.Model):
+    """内容寻址存储的文件（按SHA-256去重，引用计数）"""
+
+    __tablename__ = "blobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(
+        db.String(64), nullable=False, unique=True, comment="内容SHA-256"
+    )
+    size = db.Column(db.BigInteger, default=0, comment="文件大小(字节)")
+    ref_count = db.Column(db.Integer, default=0, nullable=False, comment="引用数")
+
+    # 系统字段
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f"<Blob {self.sha256[:12]} refs={self.ref_count}>"
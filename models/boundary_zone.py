@@ -0,0 +1,34 @@
+import json
+from datetime import datetime
+
+from . import db
+
+
+class BoundaryZone(db.Model):
+    """地质公园边界/功能区面（坐标系与图斑经纬度相同，即 TUBAN_COORDINATE_CRS）"""
+
+    __tablename__ = "boundary_zones"
+
+    id = db.Column(db.Integer, primary_key=True)
+    park_name = db.Column(
+        db.String(100), nullable=False, comment="所属地质公园名称", index=True
+    )
+    func_zone = db.Column(db.String(50), comment="功能区，为空表示公园边界")
+    source_name = db.Column(db.String(200), comment="来源文件")
+    # 面的全部环 [[[经度, 纬度], ...], ...]，按奇偶规则判断内外（内环即洞）
+    rings = db.Column(db.Text, nullable=False, comment="边界环坐标(JSON)")
+    vertex_count = db.Column(db.Integer, default=0, comment="顶点数")
+    min_lon = db.Column(db.Float, nullable=False)
+    min_lat = db.Column(db.Float, nullable=False)
+    max_lon = db.Column(db.Float, nullable=False)
+    max_lat = db.Column(db.Float, nullable=False)
+
+    # 系统字段
+    created_by = db.Column(db.String(50), comment="上传人")
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return f"<BoundaryZone {self.park_name}:{self.func_zone or '边界'}>"
+
+    def get_rings(self) -> list:
+        return json.loads(self.rings)
@@ -0,0 +1,25 @@
+from datetime import datetime
+from . import db
+
+
+class ContentCache(db.Model):
+    """内容寻址缓存（文档提取文本、AI摘要）"""
+
+    __tablename__ = "content_cache"
+    __table_args__ = (
+        db.UniqueConstraint("cache_type", "cache_key", name="uq_content_cache_key"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_type = db.Column(db.String(20), nullable=False, comment="缓存类型: extract/summary")
+    cache_key = db.Column(db.String(64), nullable=False, comment="SHA-256摘要")
+    content = db.Column(db.Text, nullable=False, comment="缓存内容")
+    content_size = db.Column(db.Integer, default=0, comment="内容大小(字节)")
+    hit_count = db.Column(db.Integer, default=0, comment="命中次数")
+
+    # 系统字段
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    last_accessed_at = db.Column(db.DateTime, default=datetime.now, index=True)
+
+    def __repr__(self):
+        return f"<ContentCache {self.cache_type}:{self.cache_key[:12]}>"
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from . import db
+
+DUPLICATE_PENDING = "pending"
+DUPLICATE_CONFIRMED = "duplicate"
+DUPLICATE_DISTINCT = "distinct"
+DUPLICATE_STATUSES = {
+    DUPLICATE_PENDING: "待审核",
+    DUPLICATE_CONFIRMED: "确认重复",
+    DUPLICATE_DISTINCT: "不是重复",
+}
+
+
+class DuplicateCandidate(db.Model):
+    """疑似重复图斑对（tuban_id < other_id，每对只记录一次）"""
+
+    __tablename__ = "duplicate_candidates"
+    __table_args__ = (
+        db.UniqueConstraint("tuban_id", "other_id", name="uq_duplicate_pair"),
+        db.Index("idx_duplicate_candidates_other", "other_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tuban_id = db.Column(db.Integer, db.ForeignKey("tubans.id"), nullable=False)
+    other_id = db.Column(db.Integer, db.ForeignKey("tubans.id"), nullable=False)
+    score = db.Column(db.Float, nullable=False, comment="综合相似度 0~1")
+    distance = db.Column(db.Float, comment="距离(米)")
+    area_ratio = db.Column(db.Float, comment="面积比（小/大）")
+    text_similarity = db.Column(db.Float, comment="名称/建设单位相似度")
+    status = db.Column(
+        db.String(20), default=DUPLICATE_PENDING, comment="审核状态", index=True
+    )
+    reviewed_by = db.Column(db.String(50), comment="审核人")
+    reviewed_at = db.Column(db.DateTime, comment="审核时间")
+
+    # 系统字段
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    tuban = db.relationship("Tuban", foreign_keys=[tuban_id])
+    other = db.relationship("Tuban", foreign_keys=[other_id])
+
+    def __repr__(self):
+        return f"<DuplicateCandidate {self.tuban_id}~{self.other_id} {self.score:.2f}>"
+
+    @property
+    def status_text(self):
+        return DUPLICATE_STATUSES.get(self.status, self.status)
@@ -128,6 +128,7 @@ class ProjectDocument(db.Model):
     doc_file = db.Column(db.String(500), comment="文件路径")
     doc_date = db.Column(db.Date, comment="文档日期")
     description = db.Column(db.Text, comment="文档描述")
+    extracted_text = db.Column(db.Text, comment="提取的文档全文")
 
     # AI摘要
     ai_summary = db.Column(db.Text, comment="AI生成的内容摘要")
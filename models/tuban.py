@@ -5,6 +5,34 @@ from models.project import project_tubans
 
 class Tuban(db.Model):
     __tablename__ = "tubans"
+    # 复合索引：软删除条件在前，匹配列表/统计/地图的高频查询
+    __table_args__ = (
+        db.Index("idx_tubans_active_created", "is_deleted", "created_at"),
+        db.Index(
+            "idx_tubans_active_park_created", "is_deleted", "park_name", "created_at"
+        ),
+        db.Index(
+            "idx_tubans_active_status_deadline",
+            "is_deleted",
+            "rectify_status",
+            "rectify_deadline",
+        ),
+        db.Index("idx_tubans_active_deadline", "is_deleted", "rectify_deadline"),
+        db.Index("idx_tubans_active_problem", "is_deleted", "problem_type"),
+        db.Index("idx_tubans_active_zone", "is_deleted", "func_zone"),
+        db.Index("idx_tubans_active_closed", "is_deleted", "is_closed"),
+        # 部分索引：地图只查询有坐标的图斑
+        db.Index(
+            "idx_tubans_map_located",
+            "is_deleted",
+            "rectify_status",
+            "func_zone",
+            sqlite_where=db.text("longitude IS NOT NULL AND latitude IS NOT NULL"),
+            postgresql_where=db.text(
+                "longitude IS NOT NULL AND latitude IS NOT NULL"
+            ),
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -67,6 +95,7 @@ class Tuban(db.Model):
     responsible_dept = db.Column(db.String(100), comment="责任部门/责任人")
     attachments = db.Column(db.Text, comment="附件材料路径")
     remark = db.Column(db.Text, comment="备注")
+    row_hash = db.Column(db.String(64), comment="最近一次台账导入的行内容哈希")
 
     # 系统字段
     created_at = db.Column(db.DateTime, default=datetime.now, index=True)
@@ -15,10 +15,14 @@ class TubanImage(db.Model):
     
     # 图片信息
     image_type = db.Column(db.String(20), nullable=False, comment='图片类型: photo(现场照片)/satellite(卫片)')
-    filename = db.Column(db.String(255), nullable=False, comment='存储的文件名')
+    filename = db.Column(db.String(255), nullable=False, index=True, comment='存储的文件名')
     original_name = db.Column(db.String(255), comment='原始文件名')
     description = db.Column(db.String(200), comment='图片说明')
     file_size = db.Column(db.Integer, comment='文件大小(字节)')
+
+    # 派生图（缩略图/预览图），未生成时访问回退原图
+    thumb_filename = db.Column(db.String(255), comment='缩略图文件名')
+    medium_filename = db.Column(db.String(255), comment='预览图文件名')
     
     # 系统字段
     uploaded_at = db.Column(db.DateTime, default=datetime.now, comment='上传时间')
@@ -41,6 +45,8 @@ class TubanImage(db.Model):
             'original_name': self.original_name,
             'description': self.description,
             'file_size': self.file_size,
+            'thumb_filename': self.thumb_filename,
+            'medium_filename': self.medium_filename,
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
             'uploaded_by': self.uploaded_by
         }
@@ -0,0 +1,98 @@
+"""
+应用启动导入耗时检查
+
+在子进程中以 python -X importtime 创建应用，统计导入耗时，
+超过预算（STARTUP_IMPORT_BUDGET_MS）或启动时加载了重量级模块时以非零状态退出。
+可用于部署前检查或CI。
+
+用法：
+    python profile_startup.py
+    python profile_startup.py --budget-ms 1000 --top 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+
+from config import Config
+
+# 只应在导入/导出、文档解析、OCR时才加载的模块
+HEAVY_MODULES = (
+    "pandas",
+    "numpy",
+    "openpyxl",
+    "fitz",
+    "pymupdf",
+    "docx",
+    "paddleocr",
+    "paddle",
+)
+
+STARTUP_CODE = "from app import create_app; create_app()"
+
+
+def profile_imports() -> list[tuple[str, int, int]]:
+    """返回 [(模块名, 自身耗时us, 累计耗时us)]，按导入顺序"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"应用启动失败:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        # 名称前的缩进表示嵌套层级（去掉分隔符后的一个空格）
+        rows.append((name.rstrip()[1:], int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="应用启动导入耗时检查")
+    parser.add_argument(
+        "--budget-ms", type=int, default=Config.STARTUP_IMPORT_BUDGET_MS
+    )
+    parser.add_argument("--top", type=int, default=15, help="显示最慢的N个导入")
+    args = parser.parse_args()
+
+    try:
+        rows = profile_imports()
+    except RuntimeError as e:
+        print(f"[fail] {e}")
+        sys.exit(1)
+
+    total_ms = sum(self_us for _, self_us, _ in rows) / 1000
+    # 顶层及其直接导入（每层缩进两个空格）
+    top_level = [row for row in rows if len(row[0]) - len(row[0].lstrip()) <= 2]
+    top_level.sort(key=lambda row: row[2], reverse=True)
+
+    print(f"{'cumulative(ms)':>14}  module")
+    for name, _, cumulative_us in top_level[: args.top]:
+        print(f"{cumulative_us / 1000:>14.1f}  {name.strip()}")
+
+    loaded = {name.strip().split(".")[0] for name, _, _ in rows}
+    heavy = [module for module in HEAVY_MODULES if module in loaded]
+
+    ok = True
+    if heavy:
+        ok = False
+        print(f"[fail] heavy modules imported at startup: {', '.join(heavy)}")
+    if total_ms > args.budget_ms:
+        ok = False
+        print(f"[fail] import time {total_ms:.0f}ms exceeds budget {args.budget_ms}ms")
+    if ok:
+        print(f"[ok] import time {total_ms:.0f}ms (budget {args.budget_ms}ms)")
+    else:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
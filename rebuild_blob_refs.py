@@ -0,0 +1,37 @@
+"""
+按数据库中的全部附件/图片引用重新统计 blob 引用计数
+
+用法：
+    python rebuild_blob_refs.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from app import create_app
+from models import db
+from utils.blob_store import recount_blob_refs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="重新统计blob引用计数")
+    parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            counts = recount_blob_refs()
+        except Exception as e:
+            db.session.rollback()
+            print(f"[fail] {e}")
+            sys.exit(1)
+        print(
+            f"[done] referenced blobs: {counts['referenced']}, "
+            f"updated: {counts['updated']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
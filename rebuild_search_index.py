@@ -0,0 +1,76 @@
+"""
+重建项目公文全文索引
+
+用法：
+    python rebuild_search_index.py            # 按数据库中已有文本重建索引
+    python rebuild_search_index.py --extract  # 先为缺少全文的文档从附件重新提取文本
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from app import create_app
+from models import db
+from models.project import ProjectDocument
+from utils.document_extract import extract_text_from_file
+from utils.blob_store import ref_display_name, resolve_upload_path
+from utils.search_index import rebuild_search_index
+
+BATCH_SIZE = 100
+
+
+def backfill_extracted_text(upload_root: str) -> int:
+    """为缺少全文的文档从已上传文件提取文本，返回补全数量"""
+    doc_ids = [
+        doc_id
+        for (doc_id,) in db.session.query(ProjectDocument.id).filter(
+            ProjectDocument.extracted_text.is_(None),
+            ProjectDocument.doc_file.isnot(None),
+        )
+    ]
+
+    filled = 0
+    for start in range(0, len(doc_ids), BATCH_SIZE):
+        batch = ProjectDocument.query.filter(
+            ProjectDocument.id.in_(doc_ids[start : start + BATCH_SIZE])
+        )
+        for doc in batch:
+            path = resolve_upload_path(upload_root, doc.doc_file)
+            if path is None or not path.exists():
+                print(f"[skip] file missing: {doc.doc_file}")
+                continue
+            text = extract_text_from_file(str(path), ref_display_name(doc.doc_file))
+            if text:
+                doc.extracted_text = text
+                filled += 1
+        db.session.commit()
+    return filled
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="重建项目公文全文索引")
+    parser.add_argument(
+        "--extract", action="store_true", help="为缺少全文的文档从附件重新提取文本"
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            if args.extract:
+                filled = backfill_extracted_text(app.config["UPLOAD_FOLDER"])
+                print(f"[extract] {filled} documents")
+            counts = rebuild_search_index()
+        except Exception as e:
+            db.session.rollback()
+            print(f"[fail] {e}")
+            sys.exit(1)
+        print(
+            f"[done] documents: {counts['document']}, timelines: {counts['timeline']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ from models.event import Event
 from models.tuban import Tuban
 from models.tuban_event import tuban_events
 from utils.helpers import parse_date
+from utils.db_dialect import icontains
 
 
 event_bp = Blueprint("event", __name__)
@@ -21,7 +22,7 @@ def list():
     query = Event.query.filter_by(is_active=1)
 
     if search_keyword:
-        query = query.filter(Event.event_name.contains(search_keyword))
+        query = query.filter(icontains(Event.event_name, search_keyword))
     if event_type:
         query = query.filter_by(event_type=event_type)
 
@@ -64,22 +64,30 @@ def api_tubans():
     - problem_type: 问题类型
     - rectify_status: 整改状态
     - event_id: 事件ID
+    - crs: 输出坐标系（wgs84/cgcs2000/gcj02，默认 MAP_DISPLAY_CRS）
     """
     func_zone = request.args.get("func_zone")
     problem_type = request.args.get("problem_type")
     rectify_status = request.args.get("rectify_status")
     event_id = request.args.get("event_id")
+    crs = (request.args.get("crs") or current_app.config["MAP_DISPLAY_CRS"]).lower()
 
-    cache_key = "map:tubans:{}:{}:{}:{}".format(
+    cache_key = "map:tubans:{}:{}:{}:{}:{}".format(
         func_zone or "",
         problem_type or "",
         rectify_status or "",
         event_id or "",
+        crs,
     )
     cached = cache_get(cache_key)
     if cached is not None:
         return jsonify(cached)
 
+    from utils.crs import GEOGRAPHIC_CRS, same_coordinates, transform
+
+    if crs not in GEOGRAPHIC_CRS:
+        return jsonify({"success": False, "message": f"不支持的坐标系: {crs}"}), 400
+
     # 构建查询
     query = Tuban.query.filter(
         Tuban.is_deleted == 0, Tuban.longitude.isnot(None), Tuban.latitude.isnot(None)
@@ -104,9 +112,16 @@ def api_tubans():
     # 执行查询
     tubans = query.all()
 
+    # 坐标整批转换到地图底图坐标系
+    lons = [float(t.longitude) for t in tubans]
+    lats = [float(t.latitude) for t in tubans]
+    source_crs = current_app.config["TUBAN_COORDINATE_CRS"]
+    if tubans and not same_coordinates(source_crs, crs):
+        lons, lats = (v.tolist() for v in transform(lons, lats, source_crs, crs))
+
     # 转换为GeoJSON格式
     features = []
-    for tuban in tubans:
+    for tuban, lon, lat in zip(tubans, lons, lats):
         # 根据整改状态确定颜色
         if tuban.is_closed == "是":
             color = "#28a745"  # 绿色 - 已销号
@@ -125,7 +140,7 @@ def api_tubans():
             "type": "Feature",
             "geometry": {
                 "type": "Point",
-                "coordinates": [float(tuban.longitude), float(tuban.latitude)],
+                "coordinates": [lon, lat],
             },
             "properties": {
                 "id": tuban.id,
@@ -150,6 +165,7 @@ def api_tubans():
         "type": "FeatureCollection",
         "features": features,
         "total": len(features),
+        "crs": crs,
     }
     cache_set(cache_key, payload, current_app.config["MAP_CACHE_TTL"])
     return jsonify(payload)
@@ -8,16 +8,31 @@ from flask import (
     jsonify,
     current_app,
 )
-from datetime import datetime
 import json
 from models import db
 from models.project import Project, ProjectDocument, ProjectTimeline, project_tubans
 from models.tuban import Tuban
 from utils.helpers import parse_date, sanitize_filename, safe_join_upload, allowed_file
-from utils.ai_summary import generate_summary
-from utils.document_extract import extract_from_upload
+from utils.ai_summary import summarize_document
+from utils.boundary_zones import assign_func_zone, zone_change_message
+from utils.db_dialect import icontains
+from utils.blob_store import (
+    adjust_blob_refs,
+    collect_refs,
+    make_attachment_ref,
+    parse_blob_ref,
+    store_upload,
+)
+from utils.document_extract import extract_from_upload_cached
+from utils.search_index import (
+    SOURCE_DOCUMENT,
+    SOURCE_TIMELINE,
+    index_document,
+    index_timeline,
+    remove_from_index,
+    search_project_content,
+)
 import os
-from werkzeug.utils import secure_filename
 
 project_bp = Blueprint("project", __name__)
 APPROVAL_STATUS = [
@@ -79,7 +94,7 @@ def list():
     query = Project.query.filter_by(is_active=1)
 
     if search_keyword:
-        query = query.filter(Project.project_name.contains(search_keyword))
+        query = query.filter(icontains(Project.project_name, search_keyword))
     if approval_status:
         query = query.filter_by(approval_status=approval_status)
     if project_status:
@@ -115,6 +130,7 @@ def add():
             project.longitude = parse_float(request.form.get("longitude"))
             project.latitude = parse_float(request.form.get("latitude"))
             project.area = parse_float(request.form.get("area"))
+            zone_change = assign_func_zone(project)
 
             project.approval_status = request.form.get("approval_status")
             project.approval_stage = request.form.get("approval_stage")
@@ -140,6 +156,8 @@ def add():
             db.session.commit()
 
             flash("项目添加成功！", "success")
+            if message := zone_change_message(zone_change):
+                flash(message, "info")
             return redirect(url_for("project.list"))
 
         except Exception as e:
@@ -173,6 +191,7 @@ def edit(id):
             project.longitude = parse_float(request.form.get("longitude"))
             project.latitude = parse_float(request.form.get("latitude"))
             project.area = parse_float(request.form.get("area"))
+            zone_change = assign_func_zone(project)
 
             project.approval_status = request.form.get("approval_status")
             project.approval_stage = request.form.get("approval_stage")
@@ -197,6 +216,8 @@ def edit(id):
             db.session.commit()
 
             flash("项目更新成功！", "success")
+            if message := zone_change_message(zone_change):
+                flash(message, "info")
             return redirect(url_for("project.detail", id=id))
 
         except Exception as e:
@@ -265,6 +286,15 @@ def detail(id):
     )
 
 
+@project_bp.route("/projects/search")
+def search():
+    """项目公文全文检索"""
+    keyword = request.args.get("q", "", type=str).strip()
+    hits = search_project_content(keyword) if keyword else []
+
+    return render_template("project_search.html", keyword=keyword, hits=hits)
+
+
 # ==================== 文档管理 ====================
 @project_bp.route("/projects/<int:id>/documents/add", methods=["POST"])
 def add_document(id):
@@ -301,29 +331,19 @@ def add_document(id):
                     flash("文件大小超过16MB限制", "error")
                     return redirect(url_for("project.detail", id=id))
 
-                filename = secure_filename(
-                    "proj_"
-                    + str(id)
-                    + "_"
-                    + datetime.now().strftime("%Y%m%d%H%M%S")
-                    + "_"
-                    + safe_name
-                )
-                upload_folder = current_app.config.get("UPLOAD_FOLDER", "uploads")
-                project_folder = os.path.join(upload_folder, "projects", str(id))
-                os.makedirs(project_folder, exist_ok=True)
-                file.save(os.path.join(project_folder, filename))
-                doc.doc_file = "projects/" + str(id) + "/" + filename
+                # 按内容存入blob存储（相同文件只存一份）
+                sha256, _ = store_upload(file)
+                doc.doc_file = make_attachment_ref(sha256, safe_name)
 
                 # 提取文档内容（支持PDF/DOCX/TXT/MD）
                 try:
-                    extracted_text = extract_from_upload(file)
+                    extracted_text = extract_from_upload_cached(file)
+                    doc.extracted_text = extracted_text
                     if extracted_text:
                         # 如果提取到内容，生成AI摘要
                         if len(extracted_text) > 10:
-                            # 限制文本长度（智谱AI最大约8K tokens）
-                            content_for_ai = extracted_text[:8000]
-                            summary = generate_summary(content_for_ai)
+                            # 长文档分段摘要后合并，不截断
+                            summary = summarize_document(extracted_text)
                             if summary:
                                 doc.ai_summary = summary
                                 doc.ai_summary_status = "success"
@@ -342,6 +362,9 @@ def add_document(id):
             doc.ai_summary_status = "pending"
 
         db.session.add(doc)
+        db.session.flush()
+        adjust_blob_refs(added=collect_refs(doc.doc_file, None))
+        index_document(doc)
         db.session.commit()
 
         flash("文档添加成功！", "success")
@@ -359,14 +382,18 @@ def delete_document(id):
     project_id = doc.project_id
 
     try:
-        # 删除文件
+        # 删除文件：blob 内容可能被其他记录共用，只减引用，由垃圾回收清理
         if doc.doc_file:
-            safe_path = safe_join_upload(
-                current_app.config.get("UPLOAD_FOLDER", "uploads"), doc.doc_file
-            )
-            if safe_path and safe_path.exists():
-                os.remove(safe_path)
+            if parse_blob_ref(doc.doc_file):
+                adjust_blob_refs(removed=[doc.doc_file])
+            else:
+                safe_path = safe_join_upload(
+                    current_app.config.get("UPLOAD_FOLDER", "uploads"), doc.doc_file
+                )
+                if safe_path and safe_path.exists():
+                    os.remove(safe_path)
 
+        remove_from_index(SOURCE_DOCUMENT, doc.id)
         db.session.delete(doc)
         db.session.commit()
 
@@ -400,14 +427,10 @@ def add_timeline(id):
         uploaded_attachments = []
 
         if attachment_files and any(f and f.filename for f in attachment_files):
-            upload_folder = current_app.config.get("UPLOAD_FOLDER", "uploads")
-            project_folder = os.path.join(upload_folder, "projects", str(id))
-            os.makedirs(project_folder, exist_ok=True)
-
             allowed_extensions = {"pdf", "doc", "docx", "txt", "md", "zip", "rar"}
             max_size = current_app.config.get("MAX_CONTENT_LENGTH", 0)
 
-            for idx, file in enumerate(attachment_files):
+            for file in attachment_files:
                 if file and file.filename:
                     # 安全处理文件名
                     safe_name = sanitize_filename(file.filename)
@@ -422,15 +445,14 @@ def add_timeline(id):
                     if max_size and file_size > max_size:
                         continue
 
-                    # 添加序号区分同名文件
-                    filename = f"tl_{id}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{idx}_{safe_name}"
-                    file.save(os.path.join(project_folder, filename))
-                    uploaded_attachments.append(f"projects/{str(id)}/{filename}")
+                    # 按内容存入blob存储，同名文件按内容区分
+                    sha256, _ = store_upload(file)
+                    uploaded_attachments.append(make_attachment_ref(sha256, safe_name))
 
                     # 从第一个附件提取文本（用于AI摘要）
                     if extracted_text is None:
                         try:
-                            extracted_text = extract_from_upload(file)
+                            extracted_text = extract_from_upload_cached(file)
                         except Exception as e:
                             print(f"附件文本提取失败: {e}")
 
@@ -448,16 +470,20 @@ def add_timeline(id):
             timeline.content = ""
 
         db.session.add(timeline)
+        db.session.flush()
+        adjust_blob_refs(added=uploaded_attachments)
+        index_timeline(timeline)
         db.session.commit()
 
         # 生成AI摘要
         if timeline.content:
-            summary = generate_summary(timeline.content)
+            summary = summarize_document(timeline.content)
             if summary:
                 timeline.ai_summary = summary
                 timeline.ai_summary_status = "success"
             else:
                 timeline.ai_summary_status = "failed"
+            index_timeline(timeline)
             db.session.commit()
 
         flash("记录添加成功！", "success")
@@ -484,10 +510,14 @@ def delete_timeline(id):
                 attachment_list = []
 
             for attachment in attachment_list:
+                if parse_blob_ref(attachment):
+                    adjust_blob_refs(removed=[attachment])
+                    continue
                 safe_path = safe_join_upload(upload_root, attachment)
                 if safe_path and safe_path.exists():
                     os.remove(safe_path)
 
+        remove_from_index(SOURCE_TIMELINE, timeline.id)
         db.session.delete(timeline)
         db.session.commit()
 
@@ -506,12 +536,13 @@ def regenerate_summary(id):
 
     try:
         if timeline.content:
-            summary = generate_summary(timeline.content)
+            summary = summarize_document(timeline.content)
             if summary:
                 timeline.ai_summary = summary
                 timeline.ai_summary_status = "success"
             else:
                 timeline.ai_summary_status = "failed"
+            index_timeline(timeline)
             db.session.commit()
             flash("AI摘要已更新！", "success")
         else:
@@ -4,6 +4,7 @@ from models import db
 from models.tuban import Tuban
 from models.rectify_record import RectifyRecord
 from utils.helpers import cache_get, cache_set
+from utils.db_dialect import month_bucket
 
 stats_bp = Blueprint("stats", __name__)
 
@@ -129,7 +130,7 @@ def api_monthly_trend():
     # 按月统计发现的问题
     monthly_stats = (
         db.session.query(
-            db.func.strftime("%Y-%m", Tuban.discover_time).label("month"),
+            month_bucket(Tuban.discover_time).label("month"),
             db.func.count(Tuban.id).label("count"),
         )
         .filter(
@@ -145,7 +146,7 @@ def api_monthly_trend():
     # 按月统计整改完成
     monthly_closed = (
         db.session.query(
-            db.func.strftime("%Y-%m", Tuban.rectify_verify_time).label("month"),
+            month_bucket(Tuban.rectify_verify_time).label("month"),
             db.func.count(Tuban.id).label("count"),
         )
         .filter(
@@ -1,7 +1,26 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+import os
+import shutil
+import tempfile
+
+from flask import (
+    Blueprint,
+    current_app,
+    flash,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
 from models import db
+from models.boundary_zone import BoundaryZone
 from models.dictionary import Dictionary
 from models.tuban import Tuban
+from utils.background_jobs import start_job
+from utils.boundary_zones import load_boundary_file, reclassify_tubans
+from utils.gis_import import GIS_IMPORT_FORMATS, GISImportError
+from utils.helpers import allowed_file, sanitize_filename
 
 system_bp = Blueprint("system", __name__)
 
@@ -121,6 +140,122 @@ def api_dictionaries(dict_type):
     )
 
 
+@system_bp.route("/boundaries")
+def boundaries():
+    """功能区边界图层"""
+    zones = BoundaryZone.query.order_by(
+        BoundaryZone.park_name, BoundaryZone.func_zone, BoundaryZone.id
+    ).all()
+    park_names = [
+        row[0]
+        for row in db.session.query(Tuban.park_name)
+        .filter(Tuban.is_deleted == 0)
+        .distinct()
+        .order_by(Tuban.park_name)
+        .all()
+        if row[0]
+    ]
+    func_zones = (
+        Dictionary.query.filter_by(dict_type="func_zone")
+        .order_by(Dictionary.sort_order)
+        .all()
+    )
+    return render_template(
+        "boundaries.html", zones=zones, park_names=park_names, func_zones=func_zones
+    )
+
+
+@system_bp.route("/boundaries/upload", methods=["POST"])
+def upload_boundary():
+    """上传功能区/公园边界面图层"""
+    file = request.files.get("file")
+    park_name = (request.form.get("park_name") or "").strip()
+    if file is None or not file.filename:
+        flash("请选择文件", "error")
+        return redirect(url_for("system.boundaries"))
+    if not park_name:
+        flash("请填写所属地质公园", "error")
+        return redirect(url_for("system.boundaries"))
+    safe_name = sanitize_filename(file.filename)
+    ext = safe_name.rsplit(".", 1)[-1].lower() if safe_name else ""
+    if (
+        not safe_name
+        or ext == "shp"
+        or not allowed_file(safe_name, set(GIS_IMPORT_FORMATS))
+    ):
+        flash("只支持 GeoJSON、KML、GeoPackage 和 Shapefile（.zip）文件", "error")
+        return redirect(url_for("system.boundaries"))
+
+    work_dir = tempfile.mkdtemp(prefix="zone_upload_")
+    try:
+        path = os.path.join(work_dir, f"source.{ext}")
+        file.save(path)
+        counts = load_boundary_file(
+            path,
+            park_name,
+            zone_field=(request.form.get("zone_field") or "").strip() or None,
+            default_zone=request.form.get("default_zone") or None,
+            crs=request.form.get("crs") or None,
+            replace=request.form.get("replace") == "1",
+            created_by=session.get("username"),
+            source_name=safe_name,
+        )
+        message = f"导入边界面 {counts['zones']} 个"
+        if counts["skipped"]:
+            message += f"，跳过非面要素 {counts['skipped']} 个"
+        if counts["replaced"]:
+            message += f"，替换旧边界面 {counts['replaced']} 个"
+        flash(message, "success")
+    except GISImportError as e:
+        flash(f"导入失败：{str(e)}", "error")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"导入失败：{str(e)}", "error")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return redirect(url_for("system.boundaries"))
+
+
+@system_bp.route("/boundaries/delete/<int:id>", methods=["POST"])
+def delete_boundary(id):
+    """删除边界面"""
+    zone = BoundaryZone.query.get_or_404(id)
+    try:
+        db.session.delete(zone)
+        db.session.commit()
+        flash("边界面已删除", "success")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"删除失败：{str(e)}", "error")
+    return redirect(url_for("system.boundaries"))
+
+
+@system_bp.route("/boundaries/reclassify", methods=["POST"])
+def reclassify_boundaries():
+    """按边界图层批量判定图斑功能区（后台任务，apply=1 时写回不一致的图斑）"""
+    if not BoundaryZone.query.first():
+        return jsonify({"success": False, "message": "尚未上传功能区边界图层"})
+    job = start_job(
+        current_app._get_current_object(),
+        "zone_reclassify",
+        _run_reclassify,
+        owner=session.get("username"),
+        apply=request.form.get("apply") == "1",
+        park_name=request.form.get("park_name") or None,
+    )
+    return jsonify(
+        {
+            "success": True,
+            "job_id": job.id,
+            "status_url": url_for("tuban.job_status", job_id=job.id),
+        }
+    )
+
+
+def _run_reclassify(job, **options):
+    return reclassify_tubans(progress=job.update, **options)
+
+
 @system_bp.route("/settings")
 def settings():
     """系统设置"""
@@ -7,7 +7,6 @@ from flask import (
     url_for,
     flash,
     current_app,
-    send_file,
     abort,
     session,
 )
@@ -19,6 +18,12 @@ from models.dictionary import Dictionary
 from models.tuban_image import TubanImage
 from models.event import Event
 from models.tuban_event import tuban_events
+from models.duplicate_candidate import (
+    DUPLICATE_CONFIRMED,
+    DUPLICATE_PENDING,
+    DUPLICATE_STATUSES,
+    DuplicateCandidate,
+)
 from utils.helpers import (
     parse_date,
     calculate_overdue_status,
@@ -27,9 +32,72 @@ from utils.helpers import (
     sanitize_filename,
     safe_join_upload,
 )
-from utils.excel_handler import import_tubans_from_excel, export_tubans_to_excel
+from utils.excel_handler import (
+    IMPORT_MODE_INSERT,
+    IMPORT_MODES,
+    import_tubans_from_excel,
+    export_tubans_to_excel,
+)
+from utils.write_queue import run_write
+from utils.image_derivatives import resolve_variant, submit_derivatives
+from utils.file_serving import image_path, send_upload_file
+from utils.image_tiles import manifest_relative_path, submit_tiles, tile_relative_path
+from utils.chunked_upload import (
+    ChunkUploadError,
+    complete_upload,
+    discard_upload,
+    init_upload,
+    upload_status,
+    write_chunk,
+)
+from utils.tuban_interchange import (
+    EXPORT_FORMATS,
+    IMPORT_FORMATS,
+    load_tubans_from_file,
+    parquet_available,
+    send_tubans_parquet,
+    stream_tubans_csv,
+)
+from utils.gis_export import GIS_EXPORT_CRS, GIS_EXPORT_FORMATS, export_gis
+from utils.gis_import import (
+    GIS_IMPORT_FORMATS,
+    GISImportError,
+    import_gis_file,
+    parse_field_mapping,
+)
+from utils.background_jobs import get_job, start_job
+from utils.boundary_zones import assign_func_zone, zone_change_message
+from utils.duplicate_detection import check_tuban_duplicates, scan_duplicates
+from utils.db_dialect import icontains
+from utils.blob_store import (
+    adjust_blob_refs,
+    collect_refs,
+    make_attachment_ref,
+    make_image_ref,
+    ref_display_name,
+    resolve_upload_path,
+    store_file,
+    store_upload,
+)
+import mimetypes
 import os
-import uuid
+import shutil
+import tempfile
+
+ATTACHMENT_EXTENSIONS = {
+    "pdf",
+    "doc",
+    "docx",
+    "jpg",
+    "jpeg",
+    "png",
+    "gif",
+    "bmp",
+    "zip",
+    "rar",
+}
+IMAGE_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "bmp", "webp"}
+IMAGE_MAX_SIZE = 5 * 1024 * 1024  # 5MB（卫片通过分块上传时不受此限制）
 
 tuban_bp = Blueprint("tuban", __name__)
 
@@ -47,29 +115,7 @@ def list():
     event_id = request.args.get("event_id", "", type=str)
 
     # 构建查询
-    query = Tuban.query.filter_by(is_deleted=0)
-
-    # 搜索条件
-    if search_keyword:
-        query = query.filter(
-            db.or_(
-                Tuban.tuban_code.contains(search_keyword),
-                Tuban.facility_name.contains(search_keyword),
-                Tuban.build_unit.contains(search_keyword),
-            )
-        )
-
-    # 筛选条件
-    if park_name:
-        query = query.filter(Tuban.park_name == park_name)
-    if problem_type:
-        query = query.filter(Tuban.problem_type == problem_type)
-    if rectify_status:
-        query = query.filter(Tuban.rectify_status == rectify_status)
-    if func_zone:
-        query = query.filter(Tuban.func_zone == func_zone)
-    if event_id:
-        query = query.join(tuban_events).filter(tuban_events.c.event_id == event_id)
+    query = _filtered_tuban_query(request.args)
 
     # 分页
     per_page = current_app.config["TUBANS_PER_PAGE"]
@@ -85,6 +131,7 @@ def list():
 
     # 获取事件列表（用于筛选）
     events = Event.query.filter_by(is_active=1).order_by(Event.issue_date.desc()).all()
+    duplicate_count = _pending_duplicates().count()
 
     return render_template(
         "tuban_list.html",
@@ -100,9 +147,45 @@ def list():
         rectify_statuses=rectify_statuses,
         func_zones=func_zones,
         events=events,
+        duplicate_count=duplicate_count,
     )
 
 
+def _filtered_tuban_query(args):
+    """按列表页的搜索/筛选参数构建图斑查询（列表、导出共用）"""
+    search_keyword = args.get("search", "", type=str)
+    park_name = args.get("park_name", "", type=str)
+    problem_type = args.get("problem_type", "", type=str)
+    rectify_status = args.get("rectify_status", "", type=str)
+    func_zone = args.get("func_zone", "", type=str)
+    event_id = args.get("event_id", "", type=str)
+
+    query = Tuban.query.filter_by(is_deleted=0)
+
+    # 搜索条件
+    if search_keyword:
+        query = query.filter(
+            db.or_(
+                icontains(Tuban.tuban_code, search_keyword),
+                icontains(Tuban.facility_name, search_keyword),
+                icontains(Tuban.build_unit, search_keyword),
+            )
+        )
+
+    # 筛选条件
+    if park_name:
+        query = query.filter(Tuban.park_name == park_name)
+    if problem_type:
+        query = query.filter(Tuban.problem_type == problem_type)
+    if rectify_status:
+        query = query.filter(Tuban.rectify_status == rectify_status)
+    if func_zone:
+        query = query.filter(Tuban.func_zone == func_zone)
+    if event_id:
+        query = query.join(tuban_events).filter(tuban_events.c.event_id == event_id)
+    return query
+
+
 @tuban_bp.route("/detail/<int:id>")
 def detail(id):
     """图斑详情"""
@@ -171,6 +254,7 @@ def add():
             tuban.longitude = request.form.get("longitude", type=float)
             tuban.latitude = request.form.get("latitude", type=float)
             tuban.area = request.form.get("area", type=float)
+            zone_change = assign_func_zone(tuban)
             tuban.image_date = parse_date(request.form.get("image_date"))
 
             # 建设主体信息
@@ -237,20 +321,9 @@ def add():
                         flash("附件文件名无效", "warning")
                         tuban.attachments = request.form.get("attachments")
                     elif allowed_file(safe_name, allowed_extensions):
-                        # 生成唯一文件名
-                        filename = f"attachment_{datetime.now().strftime('%Y%m%d%H%M%S')}_{safe_name}"
-                        filepath = os.path.join(
-                            current_app.config["UPLOAD_FOLDER"], filename
-                        )
-
-                        # 确保上传目录存在
-                        os.makedirs(current_app.config["UPLOAD_FOLDER"], exist_ok=True)
-
-                        # 保存文件
-                        file.save(filepath)
-
-                        # 保存相对路径
-                        tuban.attachments = filename
+                        # 按内容存入blob存储（相同文件只存一份）
+                        sha256, _ = store_upload(file)
+                        tuban.attachments = make_attachment_ref(sha256, safe_name)
                     else:
                         flash(
                             "附件格式不支持，请上传PDF、Word、图片或压缩包文件",
@@ -267,24 +340,19 @@ def add():
             # 处理附件（支持多附件，用逗号分隔）
             tuban.attachments = request.form.get("attachments", "")
 
-            # 保存到数据库
-            db.session.add(tuban)
-            db.session.flush()  # 获取 tuban.id
-
-            # 处理事件关联
-            event_ids = request.form.getlist("event_ids")
-            if event_ids:
-                for event_id in event_ids:
-                    if event_id.strip():
-                        stmt = tuban_events.insert().values(
-                            tuban_id=tuban.id, event_id=int(event_id)
-                        )
-                        db.session.execute(stmt)
-
-            db.session.commit()
+            # 保存到数据库（经写入队列串行提交）
+            event_ids = [
+                int(event_id)
+                for event_id in request.form.getlist("event_ids")
+                if event_id.strip()
+            ]
+            tuban_id = run_write(_save_new_tuban, tuban, event_ids)
 
             flash("图斑添加成功！", "success")
-            return redirect(url_for("tuban.detail", id=tuban.id))
+            if message := zone_change_message(zone_change):
+                flash(message, "info")
+            _check_duplicates(tuban_id)
+            return redirect(url_for("tuban.detail", id=tuban_id))
 
         except Exception as e:
             db.session.rollback()
@@ -304,12 +372,43 @@ def add():
     )
 
 
+def _check_duplicates(tuban_id):
+    """保存图斑后检查周边疑似重复图斑，有待审核的重复对时提示"""
+    if not current_app.config["DEDUP_ON_SAVE"]:
+        return
+    try:
+        pending = check_tuban_duplicates(tuban_id)
+    except Exception as e:
+        db.session.rollback()
+        flash(f"疑似重复检查失败：{str(e)}", "warning")
+        return
+    if pending:
+        flash(
+            f"发现 {pending} 个疑似重复图斑，请到「疑似重复」页面审核",
+            "warning",
+        )
+
+
+def _save_new_tuban(tuban, event_ids):
+    """保存新图斑及事件关联（写入线程中执行）"""
+    db.session.add(tuban)
+    db.session.flush()  # 获取 tuban.id
+    adjust_blob_refs(added=collect_refs(tuban.attachments))
+
+    for event_id in event_ids:
+        stmt = tuban_events.insert().values(tuban_id=tuban.id, event_id=event_id)
+        db.session.execute(stmt)
+
+    return tuban.id
+
+
 @tuban_bp.route("/edit/<int:id>", methods=["GET", "POST"])
 def edit(id):
     """编辑图斑"""
     tuban = Tuban.query.get_or_404(id)
 
     if request.method == "POST":
+        old_attachments = tuban.attachments
         try:
             # 更新图斑信息
             # 基本信息
@@ -320,6 +419,7 @@ def edit(id):
             tuban.longitude = request.form.get("longitude", type=float)
             tuban.latitude = request.form.get("latitude", type=float)
             tuban.area = request.form.get("area", type=float)
+            zone_change = assign_func_zone(tuban)
             tuban.image_date = parse_date(request.form.get("image_date"))
 
             # 建设主体信息
@@ -386,20 +486,9 @@ def edit(id):
                         flash("附件文件名无效", "warning")
                         tuban.attachments = request.form.get("attachments")
                     elif allowed_file(safe_name, allowed_extensions):
-                        # 生成唯一文件名
-                        filename = f"attachment_{datetime.now().strftime('%Y%m%d%H%M%S')}_{safe_name}"
-                        filepath = os.path.join(
-                            current_app.config["UPLOAD_FOLDER"], filename
-                        )
-
-                        # 确保上传目录存在
-                        os.makedirs(current_app.config["UPLOAD_FOLDER"], exist_ok=True)
-
-                        # 保存文件
-                        file.save(filepath)
-
-                        # 保存相对路径
-                        tuban.attachments = filename
+                        # 按内容存入blob存储（相同文件只存一份）
+                        sha256, _ = store_upload(file)
+                        tuban.attachments = make_attachment_ref(sha256, safe_name)
                     else:
                         flash(
                             "附件格式不支持，请上传PDF、Word、图片或压缩包文件",
@@ -431,9 +520,16 @@ def edit(id):
                         )
                         db.session.execute(stmt)
 
+            adjust_blob_refs(
+                added=collect_refs(tuban.attachments),
+                removed=collect_refs(old_attachments),
+            )
             db.session.commit()
 
             flash("图斑更新成功！", "success")
+            if message := zone_change_message(zone_change):
+                flash(message, "info")
+            _check_duplicates(tuban.id)
             return redirect(url_for("tuban.detail", id=tuban.id))
 
         except Exception as e:
@@ -468,7 +564,7 @@ def delete(id):
     tuban = Tuban.query.get_or_404(id)
 
     try:
-        tuban.is_deleted = 1
+        _soft_delete_tuban(tuban)
         db.session.commit()
         flash("图斑已删除！", "success")
     except Exception as e:
@@ -478,10 +574,130 @@ def delete(id):
     return redirect(url_for("tuban.list"))
 
 
+def _soft_delete_tuban(tuban):
+    """软删除图斑（不提交）"""
+    tuban.is_deleted = 1
+    # 已删除图斑的附件和图片不再计入blob引用，文件由垃圾回收清理
+    image_refs = [
+        image.filename
+        for image in TubanImage.query.filter_by(tuban_id=tuban.id, is_deleted=0)
+    ]
+    adjust_blob_refs(removed=collect_refs(tuban.attachments) + image_refs)
+
+
+@tuban_bp.route("/duplicates")
+def duplicates():
+    """疑似重复图斑审核列表"""
+    page = request.args.get("page", 1, type=int)
+    status = request.args.get("status", DUPLICATE_PENDING, type=str)
+    if status not in DUPLICATE_STATUSES:
+        status = DUPLICATE_PENDING
+
+    if status == DUPLICATE_PENDING:
+        query = _pending_duplicates().order_by(DuplicateCandidate.score.desc())
+    else:
+        query = DuplicateCandidate.query.filter_by(status=status).order_by(
+            DuplicateCandidate.reviewed_at.desc()
+        )
+
+    per_page = current_app.config["TUBANS_PER_PAGE"]
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+
+    return render_template(
+        "tuban_duplicates.html",
+        pagination=pagination,
+        status=status,
+        statuses=DUPLICATE_STATUSES,
+    )
+
+
+def _pending_duplicates():
+    """待审核的疑似重复对（任一方已删除的不再需要处理）"""
+    live_ids = db.session.query(Tuban.id).filter(Tuban.is_deleted == 0)
+    return DuplicateCandidate.query.filter(
+        DuplicateCandidate.status == DUPLICATE_PENDING,
+        DuplicateCandidate.tuban_id.in_(live_ids),
+        DuplicateCandidate.other_id.in_(live_ids),
+    )
+
+
+@tuban_bp.route("/duplicates/<int:id>/review", methods=["POST"])
+def review_duplicate(id):
+    """审核疑似重复图斑对：确认重复（可同时删除其中一个）、不是重复或撤回"""
+    candidate = DuplicateCandidate.query.get_or_404(id)
+    status = request.form.get("action", "")
+    if status not in DUPLICATE_STATUSES:
+        flash("无效的审核操作", "error")
+        return redirect(url_for("tuban.duplicates"))
+    delete_id = request.form.get("delete_id", type=int)
+    if delete_id is not None and (
+        status != DUPLICATE_CONFIRMED
+        or delete_id not in (candidate.tuban_id, candidate.other_id)
+    ):
+        flash("只能删除确认重复的图斑对中的图斑", "error")
+        return redirect(url_for("tuban.duplicates"))
+
+    try:
+        candidate.status = status
+        if status == DUPLICATE_PENDING:
+            candidate.reviewed_by = None
+            candidate.reviewed_at = None
+        else:
+            candidate.reviewed_by = session.get("username")
+            candidate.reviewed_at = datetime.now()
+        deleted = None
+        if delete_id is not None:
+            deleted = db.session.get(Tuban, delete_id)
+            if deleted.is_deleted == 0:
+                _soft_delete_tuban(deleted)
+        db.session.commit()
+        if deleted is not None:
+            flash(f"已确认重复并删除图斑 {deleted.tuban_code}", "success")
+        else:
+            flash(f"已标记为：{candidate.status_text}", "success")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"审核失败：{str(e)}", "error")
+
+    return redirect(
+        url_for(
+            "tuban.duplicates",
+            status=request.form.get("return_status", DUPLICATE_PENDING),
+            page=request.form.get("return_page", 1, type=int),
+        )
+    )
+
+
+@tuban_bp.route("/duplicates/scan", methods=["POST"])
+def scan_duplicate_tubans():
+    """全量检测疑似重复图斑（后台任务，返回任务ID供查询进度）"""
+    try:
+        job = start_job(
+            current_app._get_current_object(),
+            "duplicate_scan",
+            _run_duplicate_scan,
+            owner=session.get("username"),
+        )
+    except Exception as e:
+        return jsonify({"success": False, "message": f"检测失败: {str(e)}"})
+    return jsonify(
+        {
+            "success": True,
+            "job_id": job.id,
+            "status_url": url_for("tuban.job_status", job_id=job.id),
+        }
+    )
+
+
+def _run_duplicate_scan(job):
+    """后台任务：全量检测疑似重复图斑"""
+    return scan_duplicates(progress=job.update)
+
+
 @tuban_bp.route("/add_rectify_record/<int:id>", methods=["POST"])
 def add_rectify_record(id):
     """添加整改跟踪记录"""
-    tuban = Tuban.query.get_or_404(id)
+    Tuban.query.get_or_404(id)
 
     try:
         record = RectifyRecord()
@@ -491,15 +707,7 @@ def add_rectify_record(id):
         record.operator = request.form.get("operator")
         record.record_time = datetime.now()
 
-        # 如果状态是"已整改"，更新图斑的整改状态
-        if request.form.get("status") == "已整改":
-            tuban.rectify_status = "已整改"
-            tuban.rectify_verify_time = datetime.now().date()
-            tuban.verify_person = request.form.get("operator")
-            tuban.is_closed = "是"
-
-        db.session.add(record)
-        db.session.commit()
+        run_write(_save_rectify_record, id, record)
 
         flash("整改记录添加成功！", "success")
     except Exception as e:
@@ -509,43 +717,56 @@ def add_rectify_record(id):
     return redirect(url_for("tuban.detail", id=id))
 
 
-@tuban_bp.route("/export_excel")
-def export_excel():
-    """导出Excel"""
-    # 获取查询参数（与列表页相同）
-    search_keyword = request.args.get("search", "", type=str)
-    park_name = request.args.get("park_name", "", type=str)
-    problem_type = request.args.get("problem_type", "", type=str)
-    rectify_status = request.args.get("rectify_status", "", type=str)
-    func_zone = request.args.get("func_zone", "", type=str)
-
-    # 构建查询（与列表页相同逻辑）
-    query = Tuban.query.filter_by(is_deleted=0)
+def _save_rectify_record(tuban_id, record):
+    """保存整改记录并同步图斑状态（写入线程中执行）"""
+    # 如果状态是"已整改"，更新图斑的整改状态
+    if record.status == "已整改":
+        tuban = db.session.get(Tuban, tuban_id)
+        tuban.rectify_status = "已整改"
+        tuban.rectify_verify_time = datetime.now().date()
+        tuban.verify_person = record.operator
+        tuban.is_closed = "是"
 
-    if search_keyword:
-        query = query.filter(
-            db.or_(
-                Tuban.tuban_code.contains(search_keyword),
-                Tuban.facility_name.contains(search_keyword),
-                Tuban.build_unit.contains(search_keyword),
-            )
-        )
+    db.session.add(record)
 
-    if park_name:
-        query = query.filter(Tuban.park_name == park_name)
-    if problem_type:
-        query = query.filter(Tuban.problem_type == problem_type)
-    if rectify_status:
-        query = query.filter(Tuban.rectify_status == rectify_status)
-    if func_zone:
-        query = query.filter(Tuban.func_zone == func_zone)
 
-    tubans = query.all()
+@tuban_bp.route("/export_excel")
+def export_excel():
+    """导出Excel"""
+    # 筛选条件与列表页相同
+    tubans = _filtered_tuban_query(request.args).all()
 
     # 导出Excel
     return export_tubans_to_excel(tubans)
 
 
+@tuban_bp.route("/export/<fmt>")
+def export_data(fmt):
+    """导出CSV/Parquet（筛选条件与列表页相同，流式输出）"""
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    query = _filtered_tuban_query(request.args)
+    filename = f"图斑数据_{datetime.now().strftime('%Y%m%d%H%M%S')}.{fmt}"
+    if fmt == "csv":
+        return stream_tubans_csv(query, filename)
+    if not parquet_available():
+        flash("导出Parquet需要安装 pyarrow", "error")
+        return redirect(url_for("tuban.list", **request.args))
+    return send_tubans_parquet(query, filename)
+
+
+@tuban_bp.route("/export/gis/<fmt>")
+def export_gis_data(fmt):
+    """导出GIS数据（GeoJSON/KML/GeoPackage/Shapefile，筛选条件与列表页相同）"""
+    crs = request.args.get("crs", "wgs84")
+    if fmt not in GIS_EXPORT_FORMATS or crs not in GIS_EXPORT_CRS:
+        abort(404)
+    query = _filtered_tuban_query(request.args)
+    return export_gis(
+        query, fmt, f"图斑_{datetime.now().strftime('%Y%m%d%H%M%S')}", crs=crs
+    )
+
+
 @tuban_bp.route("/import", methods=["POST"])
 def import_excel():
     """导入Excel"""
@@ -563,11 +784,11 @@ def import_excel():
         flash("文件名无效", "error")
         return redirect(url_for("tuban.list"))
 
-    allowed_extensions = current_app.config.get(
+    excel_extensions = current_app.config.get(
         "EXCEL_ALLOWED_EXTENSIONS", {"xlsx", "xls"}
     )
-    if not allowed_file(safe_name, allowed_extensions):
-        flash("只支持Excel文件（.xlsx/.xls）", "error")
+    if not allowed_file(safe_name, set(excel_extensions) | set(IMPORT_FORMATS)):
+        flash("只支持Excel（.xlsx/.xls）、CSV 和 Parquet 文件", "error")
         return redirect(url_for("tuban.list"))
 
     filepath = None
@@ -577,8 +798,25 @@ def import_excel():
         filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], temp_name)
         file.save(filepath)
 
-        count = import_tubans_from_excel(filepath)
-        flash(f"导入完成：成功导入 {count} 条记录", "success")
+        mode = request.form.get("mode", IMPORT_MODE_INSERT)
+        if mode not in IMPORT_MODES:
+            mode = IMPORT_MODE_INSERT
+        started = datetime.now()
+        if _file_ext(safe_name) in IMPORT_FORMATS:
+            counts = load_tubans_from_file(filepath, mode=mode)
+        else:
+            counts = import_tubans_from_excel(filepath, mode=mode)
+        message = (
+            f"导入完成：新增 {counts['inserted']} 条，更新 {counts['updated']} 条，"
+            f"未变化 {counts['unchanged']} 条，跳过 {counts['skipped']} 条"
+        )
+        if current_app.config["DEDUP_ON_IMPORT"] and (
+            counts["inserted"] or counts["updated"]
+        ):
+            duplicates = scan_duplicates(changed_since=started)["new"]
+            if duplicates:
+                message += f"；发现 {duplicates} 对疑似重复图斑待审核"
+        flash(message, "success")
     except Exception as e:
         flash(f"导入失败：{str(e)}", "error")
     finally:
@@ -591,6 +829,100 @@ def import_excel():
     return redirect(url_for("tuban.list"))
 
 
+@tuban_bp.route("/import/gis", methods=["POST"])
+def import_gis():
+    """导入GIS矢量数据（后台任务，返回任务ID供查询进度）"""
+    file = request.files.get("file")
+    if file is None or not file.filename:
+        return jsonify({"success": False, "message": "请选择文件"})
+
+    safe_name = sanitize_filename(file.filename)
+    if not safe_name or not allowed_file(safe_name, set(GIS_IMPORT_FORMATS)):
+        return jsonify(
+            {
+                "success": False,
+                "message": "只支持 GeoJSON、KML、GeoPackage 和 Shapefile（.zip）文件",
+            }
+        )
+    if _file_ext(safe_name) == "shp":
+        return jsonify(
+            {"success": False, "message": "Shapefile 请将 .shp/.dbf 等文件打包为 .zip"}
+        )
+
+    mode = request.form.get("mode", IMPORT_MODE_INSERT)
+    if mode not in IMPORT_MODES:
+        mode = IMPORT_MODE_INSERT
+    event_id = request.form.get("event_id", type=int)
+    if event_id is not None and db.session.get(Event, event_id) is None:
+        return jsonify({"success": False, "message": "事件不存在"})
+    try:
+        mapping = parse_field_mapping(request.form.get("mapping"))
+    except GISImportError as e:
+        return jsonify({"success": False, "message": str(e)})
+    # 源坐标系：留空则按文件声明（.prj/crs/srs_id），未声明时按 WGS84
+    crs = (request.form.get("crs") or "").strip() or None
+    if crs is not None:
+        from utils.crs import CRSError, normalize_crs
+
+        try:
+            normalize_crs(crs)
+        except CRSError as e:
+            return jsonify({"success": False, "message": str(e)})
+
+    work_dir = tempfile.mkdtemp(prefix="gis_upload_")
+    path = os.path.join(work_dir, f"source.{_file_ext(safe_name)}")
+    try:
+        file.save(path)
+        job = start_job(
+            current_app._get_current_object(),
+            "gis_import",
+            _run_gis_import,
+            work_dir,
+            path,
+            owner=session.get("username"),
+            mode=mode,
+            event_id=event_id,
+            mapping=mapping,
+            crs=crs,
+        )
+    except Exception as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return jsonify({"success": False, "message": f"导入失败: {str(e)}"})
+    return jsonify(
+        {
+            "success": True,
+            "job_id": job.id,
+            "status_url": url_for("tuban.job_status", job_id=job.id),
+        }
+    )
+
+
+def _run_gis_import(job, work_dir, path, **options):
+    """后台任务：导入GIS文件，结束后删除上传的临时文件"""
+    try:
+        started = datetime.now()
+        result = import_gis_file(path, progress=job.update, **options)
+        if current_app.config["DEDUP_ON_IMPORT"] and (
+            result["inserted"] or result["updated"]
+        ):
+            job.update(message="正在检测疑似重复图斑")
+            result["duplicates"] = scan_duplicates(changed_since=started)["new"]
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+@tuban_bp.route("/jobs/<job_id>")
+def job_status(job_id):
+    """查询后台任务进度（只能查询自己提交的任务，管理员除外）"""
+    job = get_job(job_id)
+    if job is None or (
+        job.owner != session.get("username") and session.get("role") != "admin"
+    ):
+        return jsonify({"success": False, "message": "任务不存在或已过期"})
+    return jsonify({"success": True, "job": job.to_dict()})
+
+
 @tuban_bp.route("/upload_attachment", methods=["POST"])
 def upload_attachment():
     """上传附件"""
@@ -606,19 +938,7 @@ def upload_attachment():
         return jsonify({"success": False, "message": "文件名无效"})
 
     try:
-        allowed_extensions = {
-            "pdf",
-            "doc",
-            "docx",
-            "jpg",
-            "jpeg",
-            "png",
-            "gif",
-            "bmp",
-            "zip",
-            "rar",
-        }
-        if not allowed_file(safe_name, allowed_extensions):
+        if not allowed_file(safe_name, ATTACHMENT_EXTENSIONS):
             return jsonify({"success": False, "message": "文件格式不支持"})
 
         file.seek(0, os.SEEK_END)
@@ -628,11 +948,9 @@ def upload_attachment():
         if file_size > current_app.config["MAX_CONTENT_LENGTH"]:
             return jsonify({"success": False, "message": "文件大小超过16MB限制"})
 
-        filename = f"attachment_{datetime.now().strftime('%Y%m%d%H%M%S')}_{safe_name}"
-        filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
-
-        os.makedirs(current_app.config["UPLOAD_FOLDER"], exist_ok=True)
-        file.save(filepath)
+        # 按内容存入blob存储，表单保存时才计入引用
+        sha256, _ = store_upload(file)
+        filename = make_attachment_ref(sha256, safe_name)
 
         return jsonify({"success": True, "filename": filename})
 
@@ -640,15 +958,134 @@ def upload_attachment():
         return jsonify({"success": False, "message": str(e)})
 
 
-@tuban_bp.route("/download/<filename>")
+@tuban_bp.route("/uploads", methods=["POST"])
+def chunked_upload_init():
+    """
+    创建分块上传会话
+
+    JSON参数：filename, size, purpose(attachment/image), sha256(可选)；
+    purpose=image 时还需 tuban_id, image_type, description(可选)
+    """
+    data = request.get_json(silent=True) or {}
+    safe_name = sanitize_filename(data.get("filename") or "")
+    if not safe_name:
+        return jsonify({"success": False, "message": "文件名无效"})
+
+    try:
+        total_size = int(data.get("size") or 0)
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "文件大小无效"})
+
+    purpose = data.get("purpose", "attachment")
+    metadata = {"purpose": purpose}
+    if purpose == "attachment":
+        if not allowed_file(safe_name, ATTACHMENT_EXTENSIONS):
+            return jsonify({"success": False, "message": "文件格式不支持"})
+    elif purpose == "image":
+        image_type = (data.get("image_type") or "photo").lower()
+        if image_type not in ["photo", "satellite"]:
+            return jsonify({"success": False, "message": "无效的图片类型"})
+        if not allowed_file(safe_name, IMAGE_EXTENSIONS):
+            return jsonify(
+                {"success": False, "message": "只支持图片格式(JPG/PNG/GIF/BMP/WEBP)"}
+            )
+        if image_type == "photo" and total_size > IMAGE_MAX_SIZE:
+            return jsonify({"success": False, "message": "图片大小不能超过5MB"})
+        try:
+            tuban_id = int(data.get("tuban_id"))
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "message": "图斑不存在"})
+        if db.session.get(Tuban, tuban_id) is None:
+            return jsonify({"success": False, "message": "图斑不存在"})
+        metadata.update(
+            tuban_id=tuban_id,
+            image_type=image_type,
+            description=data.get("description", ""),
+        )
+    else:
+        return jsonify({"success": False, "message": "无效的上传用途"})
+
+    try:
+        status = init_upload(safe_name, total_size, metadata, data.get("sha256"))
+    except ChunkUploadError as e:
+        return jsonify({"success": False, "message": str(e)})
+    return jsonify({"success": True, **status})
+
+
+@tuban_bp.route("/uploads/<upload_id>", methods=["GET"])
+def chunked_upload_status(upload_id):
+    """查询分块上传进度（断点续传时获取已收到的分块）"""
+    try:
+        return jsonify({"success": True, **upload_status(upload_id)})
+    except ChunkUploadError as e:
+        return jsonify({"success": False, "message": str(e)}), 404
+
+
+@tuban_bp.route("/uploads/<upload_id>/chunks/<int:index>", methods=["PUT"])
+def chunked_upload_chunk(upload_id, index):
+    """上传一个分块（请求体为原始字节，X-Chunk-SHA256 头为分块校验值）"""
+    try:
+        size = write_chunk(
+            upload_id, index, request.stream, request.headers.get("X-Chunk-SHA256")
+        )
+    except ChunkUploadError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify({"success": True, "index": index, "size": size})
+
+
+@tuban_bp.route("/uploads/<upload_id>/complete", methods=["POST"])
+def chunked_upload_complete(upload_id):
+    """完成分块上传：组装文件并按用途登记为附件或图斑图片"""
+    try:
+        data_path, meta = complete_upload(upload_id)
+    except ChunkUploadError as e:
+        return jsonify({"success": False, "message": str(e)})
+
+    metadata = meta["metadata"]
+    safe_name = meta["filename"]
+    try:
+        # 组装好的文件直接移动进blob存储，不再复制
+        sha256, _ = store_file(data_path, move=True)
+        if metadata["purpose"] == "image":
+            unique_filename = make_image_ref(sha256, _file_ext(safe_name))
+            image_data = _register_image(
+                metadata["tuban_id"],
+                metadata["image_type"],
+                unique_filename,
+                safe_name,
+                metadata.get("description", ""),
+                meta["total_size"],
+            )
+            result = {"success": True, "message": "上传成功", "image": image_data}
+        else:
+            filename = make_attachment_ref(sha256, safe_name)
+            result = {"success": True, "filename": filename}
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "message": f"上传失败: {str(e)}"})
+    finally:
+        discard_upload(upload_id)
+    return jsonify(result)
+
+
+@tuban_bp.route("/uploads/<upload_id>", methods=["DELETE"])
+def chunked_upload_abort(upload_id):
+    """取消分块上传"""
+    discard_upload(upload_id)
+    return jsonify({"success": True})
+
+
+@tuban_bp.route("/download/<path:filename>")
 def download_attachment(filename):
     """下载附件"""
     try:
-        safe_path = safe_join_upload(current_app.config["UPLOAD_FOLDER"], filename)
-        if not safe_path or not safe_path.exists():
+        safe_path = resolve_upload_path(current_app.config["UPLOAD_FOLDER"], filename)
+        if not safe_path or not safe_path.is_file():
             abort(404)
 
-        return send_file(safe_path, as_attachment=True, download_name=safe_path.name)
+        return send_upload_file(
+            safe_path, as_attachment=True, download_name=ref_display_name(filename)
+        )
     except Exception as e:
         flash(f"下载失败：{str(e)}", "error")
         return redirect(url_for("tuban.list"))
@@ -703,8 +1140,7 @@ def upload_image(id):
 
     try:
         # 检查文件类型
-        allowed_extensions = {"jpg", "jpeg", "png", "gif", "bmp", "webp"}
-        if not allowed_file(safe_name, allowed_extensions):
+        if not allowed_file(safe_name, IMAGE_EXTENSIONS):
             return jsonify(
                 {"success": False, "message": "只支持图片格式(JPG/PNG/GIF/BMP/WEBP)"}
             )
@@ -714,51 +1150,73 @@ def upload_image(id):
         file_size = file.tell()
         file.seek(0)
 
-        max_size = 5 * 1024 * 1024  # 5MB
-        if file_size > max_size:
+        if file_size > IMAGE_MAX_SIZE:
             return jsonify({"success": False, "message": "图片大小不能超过5MB"})
 
-        # 生成唯一文件名
-        ext = safe_name.rsplit(".", 1)[1].lower()
-        unique_filename = f"{image_type}_{id}_{uuid.uuid4().hex[:8]}.{ext}"
-
-        # 创建图片目录
-        images_folder = os.path.join(current_app.config["UPLOAD_FOLDER"], "images")
-        os.makedirs(images_folder, exist_ok=True)
-
-        # 保存文件
-        filepath = os.path.join(images_folder, unique_filename)
-        file.save(filepath)
+        # 按内容存入blob存储，文件名为 <sha256>.<扩展名>
+        sha256, _ = store_upload(file)
+        unique_filename = make_image_ref(sha256, _file_ext(safe_name))
 
         # 保存到数据库
-        image = TubanImage()
-        image.tuban_id = id
-        image.image_type = image_type
-        image.filename = unique_filename
-        image.original_name = safe_name
-        image.description = request.form.get("description", "")
-        image.file_size = file_size
-        image.uploaded_by = session.get("username", "unknown")
-        db.session.add(image)
-        db.session.commit()
-
-        return jsonify(
-            {"success": True, "message": "上传成功", "image": image.to_dict()}
+        image_data = _register_image(
+            id,
+            image_type,
+            unique_filename,
+            safe_name,
+            request.form.get("description", ""),
+            file_size,
         )
 
+        return jsonify({"success": True, "message": "上传成功", "image": image_data})
+
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "message": f"上传失败: {str(e)}"})
 
 
+def _file_ext(safe_name):
+    return safe_name.rsplit(".", 1)[1].lower()
+
+
+def _register_image(
+    tuban_id, image_type, unique_filename, safe_name, description, file_size
+):
+    """登记已存入blob存储的图片，并提交后台派生图/瓦片任务"""
+    image = TubanImage()
+    image.tuban_id = tuban_id
+    image.image_type = image_type
+    image.filename = unique_filename
+    image.original_name = safe_name
+    image.description = description
+    image.file_size = file_size
+    image.uploaded_by = session.get("username", "unknown")
+    image_data = run_write(_save_image, image)
+
+    # 后台生成缩略图/预览图，生成前访问回退原图
+    submit_derivatives(image_data["id"], unique_filename)
+    # 大幅面卫片后台切分瓦片金字塔
+    if image_type == "satellite":
+        submit_tiles(unique_filename)
+    return image_data
+
+
+def _save_image(image):
+    """保存图片记录（写入线程中执行）"""
+    db.session.add(image)
+    db.session.flush()
+    adjust_blob_refs(added=[image.filename])
+    return image.to_dict()
+
+
 @tuban_bp.route("/images/<int:image_id>", methods=["DELETE"])
 def delete_image(image_id):
     """删除图片"""
     image = TubanImage.query.get_or_404(image_id)
 
     try:
-        # 软删除
+        # 软删除（不再计入blob引用，文件由垃圾回收清理）
         image.is_deleted = 1
+        adjust_blob_refs(removed=[image.filename])
         db.session.commit()
 
         # 可选：删除物理文件
@@ -775,14 +1233,46 @@ def delete_image(image_id):
 
 @tuban_bp.route("/images/<filename>")
 def serve_image(filename):
-    """提供图片访问"""
+    """提供图片访问（?size=thumb|medium|full，派生图不存在时回退原图）"""
     try:
-        relative_path = os.path.join("images", filename)
-        safe_path = safe_join_upload(current_app.config["UPLOAD_FOLDER"], relative_path)
+        variant = None
+        size = request.args.get("size", "full")
+        if size != "full":
+            image = TubanImage.query.filter_by(filename=filename).first()
+            variant = resolve_variant(image, size)
+
+        safe_path = image_path(filename, variant)
         if not safe_path or not safe_path.exists():
             abort(404)
 
-        return send_file(safe_path, as_attachment=False)
+        # blob 存储的原图没有扩展名，按图片文件名确定内容类型
+        mimetype = (
+            mimetypes.guess_type(safe_path.name)[0]
+            or mimetypes.guess_type(filename)[0]
+        )
+        return send_upload_file(safe_path, as_attachment=False, mimetype=mimetype)
 
     except Exception:
         abort(404)
+
+
+@tuban_bp.route("/images/<filename>/tiles.dzi")
+def serve_tile_manifest(filename):
+    """卫片瓦片金字塔清单（DZI）"""
+    images_folder = os.path.join(current_app.config["UPLOAD_FOLDER"], "images")
+    safe_path = safe_join_upload(images_folder, manifest_relative_path(filename))
+    if not safe_path or not safe_path.exists():
+        abort(404)
+    return send_upload_file(safe_path, mimetype="application/xml")
+
+
+@tuban_bp.route("/images/<filename>/tiles/<int:level>/<int:col>_<int:row>.jpg")
+def serve_tile(filename, level, col, row):
+    """卫片瓦片（文件名唯一，内容不变，长期缓存）"""
+    images_folder = os.path.join(current_app.config["UPLOAD_FOLDER"], "images")
+    safe_path = safe_join_upload(
+        images_folder, tile_relative_path(filename, level, col, row)
+    )
+    if not safe_path or not safe_path.exists():
+        abort(404)
+    return send_upload_file(safe_path, immutable=True)
@@ -0,0 +1,167 @@
+/**
+ * 分块断点续传客户端
+ *
+ * 文件按服务端给定的分块大小切分，逐块 PUT 并附带 SHA-256（浏览器支持时）；
+ * 失败的分块按指数退避重试。upload_id 按 文件名+大小+修改时间 记录在
+ * localStorage，页面刷新或断网后重新选择同一文件即可从缺失的分块继续。
+ *
+ * 用法：
+ *   ChunkedUpload.upload(file, {
+ *       baseUrl: '/tuban/uploads',
+ *       purpose: 'image', tubanId: 1, imageType: 'satellite', description: '',
+ *       onProgress: function (loaded, total) {}
+ *   }).then(function (result) { ... });   // result 为 complete 接口返回的JSON
+ */
+(function (window) {
+    'use strict';
+
+    const DEFAULT_BASE_URL = '/tuban/uploads';
+    const CONCURRENCY = 3;
+    const MAX_RETRIES = 5;
+    const STORAGE_PREFIX = 'chunked-upload:';
+
+    function csrfToken() {
+        const meta = document.querySelector('meta[name="csrf-token"]');
+        return meta ? meta.getAttribute('content') : '';
+    }
+
+    function request(method, url, body, headers) {
+        const allHeaders = Object.assign({ 'X-CSRF-Token': csrfToken() }, headers || {});
+        return fetch(url, {
+            method: method,
+            body: body,
+            headers: allHeaders,
+            credentials: 'same-origin'
+        }).then(function (response) {
+            return response.json().then(function (data) {
+                if (!response.ok || data.success === false) {
+                    const error = new Error(data.message || ('请求失败: ' + response.status));
+                    error.status = response.status;
+                    throw error;
+                }
+                return data;
+            });
+        });
+    }
+
+    function sha256Hex(blob) {
+        // crypto.subtle 仅在 HTTPS/localhost 下可用，不可用时只按长度校验
+        if (!window.crypto || !window.crypto.subtle) {
+            return Promise.resolve(null);
+        }
+        return blob.arrayBuffer().then(function (buffer) {
+            return window.crypto.subtle.digest('SHA-256', buffer);
+        }).then(function (hash) {
+            return Array.from(new Uint8Array(hash)).map(function (b) {
+                return b.toString(16).padStart(2, '0');
+            }).join('');
+        });
+    }
+
+    function sleep(ms) {
+        return new Promise(function (resolve) { setTimeout(resolve, ms); });
+    }
+
+    function storageKey(file, options) {
+        return STORAGE_PREFIX + [options.purpose, options.tubanId || '', options.imageType || '',
+            file.name, file.size, file.lastModified].join('|');
+    }
+
+    function startSession(file, options) {
+        const key = storageKey(file, options);
+        const saved = window.localStorage.getItem(key);
+        const create = function () {
+            return request('POST', options.baseUrl, JSON.stringify({
+                filename: file.name,
+                size: file.size,
+                purpose: options.purpose,
+                tuban_id: options.tubanId,
+                image_type: options.imageType,
+                description: options.description || ''
+            }), { 'Content-Type': 'application/json' }).then(function (status) {
+                window.localStorage.setItem(key, status.upload_id);
+                return status;
+            });
+        };
+        if (!saved) {
+            return create();
+        }
+        // 续传：会话已过期或不存在时重新创建
+        return request('GET', options.baseUrl + '/' + saved).catch(function () {
+            window.localStorage.removeItem(key);
+            return create();
+        });
+    }
+
+    function uploadChunk(file, status, index, baseUrl) {
+        const start = index * status.chunk_size;
+        const blob = file.slice(start, Math.min(start + status.chunk_size, file.size));
+        const url = baseUrl + '/' + status.upload_id + '/chunks/' + index;
+
+        const attempt = function (retry) {
+            return sha256Hex(blob).then(function (hash) {
+                const headers = { 'Content-Type': 'application/octet-stream' };
+                if (hash) {
+                    headers['X-Chunk-SHA256'] = hash;
+                }
+                return request('PUT', url, blob, headers);
+            }).catch(function (error) {
+                if (retry >= MAX_RETRIES || error.status === 404) {
+                    throw error;
+                }
+                return sleep(Math.min(1000 * Math.pow(2, retry), 15000)).then(function () {
+                    return attempt(retry + 1);
+                });
+            });
+        };
+        return attempt(0).then(function () { return blob.size; });
+    }
+
+    function upload(file, options) {
+        options = Object.assign({ baseUrl: DEFAULT_BASE_URL }, options);
+        const onProgress = options.onProgress || function () {};
+        const key = storageKey(file, options);
+
+        return startSession(file, options).then(function (status) {
+            const received = new Set(status.received);
+            const pending = [];
+            let loaded = 0;
+            for (let i = 0; i < status.total_chunks; i++) {
+                if (received.has(i)) {
+                    loaded += Math.min(status.chunk_size, file.size - i * status.chunk_size);
+                } else {
+                    pending.push(i);
+                }
+            }
+            onProgress(loaded, file.size);
+
+            const worker = function () {
+                if (pending.length === 0) {
+                    return Promise.resolve();
+                }
+                const index = pending.shift();
+                return uploadChunk(file, status, index, options.baseUrl).then(function (size) {
+                    loaded += size;
+                    onProgress(loaded, file.size);
+                    return worker();
+                });
+            };
+            const workers = [];
+            for (let i = 0; i < Math.min(CONCURRENCY, pending.length); i++) {
+                workers.push(worker());
+            }
+            return Promise.all(workers).then(function () {
+                return request('POST', options.baseUrl + '/' + status.upload_id + '/complete');
+            });
+        }).then(function (result) {
+            window.localStorage.removeItem(key);
+            return result;
+        });
+    }
+
+    window.ChunkedUpload = {
+        upload: upload,
+        // 超过该大小的附件改用分块上传
+        threshold: 8 * 1024 * 1024
+    };
+})(window);
@@ -0,0 +1,263 @@
+/**
+ * 卫片瓦片查看器（Deep Zoom / DZI）
+ *
+ * 只加载视口内、与当前缩放匹配层级的瓦片；切换层级时保留上一层瓦片作为底图，
+ * 新瓦片加载完成后再移除，避免闪烁。支持拖拽平移、滚轮/双击缩放。
+ *
+ * 用法：
+ *   const viewer = new TileViewer(containerElement, manifestUrl);
+ *   viewer.open();     // 加载清单并适应窗口
+ *   viewer.destroy();  // 释放事件与瓦片
+ */
+(function (window) {
+    'use strict';
+
+    const MAX_ZOOM = 4;   // 最大放大到原图像素的4倍
+    const WHEEL_STEP = 1.2;
+
+    function TileViewer(container, manifestUrl) {
+        this.container = container;
+        this.manifestUrl = manifestUrl;
+        // tiles.dzi?v=... -> tiles/
+        this.tilesBase = manifestUrl.replace(/tiles\.dzi(\?.*)?$/, 'tiles/');
+        this.layers = {};
+        this.scale = 1;
+        this.offsetX = 0;
+        this.offsetY = 0;
+        this.handlers = [];
+        this.renderQueued = false;
+    }
+
+    TileViewer.prototype.open = function () {
+        const self = this;
+        return fetch(this.manifestUrl, { credentials: 'same-origin' })
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error('瓦片清单加载失败: ' + response.status);
+                }
+                return response.text();
+            })
+            .then(function (text) {
+                self._parseManifest(text);
+                self._setup();
+                self.fit();
+            });
+    };
+
+    TileViewer.prototype._parseManifest = function (text) {
+        const doc = new DOMParser().parseFromString(text, 'application/xml');
+        const image = doc.getElementsByTagName('Image')[0];
+        const size = doc.getElementsByTagName('Size')[0];
+        this.tileSize = parseInt(image.getAttribute('TileSize'), 10);
+        this.format = image.getAttribute('Format');
+        this.width = parseInt(size.getAttribute('Width'), 10);
+        this.height = parseInt(size.getAttribute('Height'), 10);
+        this.maxLevel = Math.ceil(Math.log2(Math.max(this.width, this.height)));
+    };
+
+    TileViewer.prototype._setup = function () {
+        const self = this;
+        this.container.style.position = 'relative';
+        this.container.style.overflow = 'hidden';
+        this.container.style.cursor = 'grab';
+        this.container.style.touchAction = 'none';
+
+        let dragging = null;
+        this._on(this.container, 'pointerdown', function (e) {
+            dragging = { x: e.clientX, y: e.clientY };
+            self.container.setPointerCapture(e.pointerId);
+            self.container.style.cursor = 'grabbing';
+        });
+        this._on(this.container, 'pointermove', function (e) {
+            if (!dragging) {
+                return;
+            }
+            self.offsetX += e.clientX - dragging.x;
+            self.offsetY += e.clientY - dragging.y;
+            dragging = { x: e.clientX, y: e.clientY };
+            self.requestRender();
+        });
+        const endDrag = function () {
+            dragging = null;
+            self.container.style.cursor = 'grab';
+        };
+        this._on(this.container, 'pointerup', endDrag);
+        this._on(this.container, 'pointercancel', endDrag);
+        this._on(this.container, 'wheel', function (e) {
+            e.preventDefault();
+            const point = self._localPoint(e);
+            self.zoomAt(e.deltaY < 0 ? WHEEL_STEP : 1 / WHEEL_STEP, point.x, point.y);
+        }, { passive: false });
+        this._on(this.container, 'dblclick', function (e) {
+            const point = self._localPoint(e);
+            self.zoomAt(2, point.x, point.y);
+        });
+        this._on(window, 'resize', function () {
+            self.requestRender();
+        });
+    };
+
+    TileViewer.prototype._on = function (target, type, handler, options) {
+        target.addEventListener(type, handler, options);
+        this.handlers.push([target, type, handler, options]);
+    };
+
+    TileViewer.prototype._localPoint = function (e) {
+        const rect = this.container.getBoundingClientRect();
+        return { x: e.clientX - rect.left, y: e.clientY - rect.top };
+    };
+
+    TileViewer.prototype.fit = function () {
+        const viewWidth = this.container.clientWidth;
+        const viewHeight = this.container.clientHeight;
+        this.minScale = Math.min(viewWidth / this.width, viewHeight / this.height, 1);
+        this.scale = this.minScale;
+        this.offsetX = (viewWidth - this.width * this.scale) / 2;
+        this.offsetY = (viewHeight - this.height * this.scale) / 2;
+        this.requestRender();
+    };
+
+    TileViewer.prototype.zoomAt = function (factor, x, y) {
+        const scale = Math.max(this.minScale, Math.min(MAX_ZOOM, this.scale * factor));
+        const ratio = scale / this.scale;
+        // 以鼠标位置为中心缩放
+        this.offsetX = x - (x - this.offsetX) * ratio;
+        this.offsetY = y - (y - this.offsetY) * ratio;
+        this.scale = scale;
+        this.requestRender();
+    };
+
+    TileViewer.prototype.requestRender = function () {
+        const self = this;
+        if (this.renderQueued) {
+            return;
+        }
+        this.renderQueued = true;
+        window.requestAnimationFrame(function () {
+            self.renderQueued = false;
+            self.render();
+        });
+    };
+
+    TileViewer.prototype._levelFor = function (scale) {
+        const level = this.maxLevel + Math.ceil(Math.log2(scale));
+        return Math.max(0, Math.min(this.maxLevel, level));
+    };
+
+    TileViewer.prototype._layer = function (level) {
+        let layer = this.layers[level];
+        if (!layer) {
+            const el = document.createElement('div');
+            el.style.position = 'absolute';
+            el.style.left = '0';
+            el.style.top = '0';
+            el.style.zIndex = String(level);
+            this.container.appendChild(el);
+            layer = { el: el, tiles: {}, pending: 0 };
+            this.layers[level] = layer;
+        }
+        return layer;
+    };
+
+    TileViewer.prototype._visibleRange = function (level) {
+        // 该层相对原图的缩小倍数及单个瓦片覆盖的原图像素
+        const levelScale = Math.pow(2, this.maxLevel - level);
+        const span = this.tileSize * levelScale;
+        const viewWidth = this.container.clientWidth;
+        const viewHeight = this.container.clientHeight;
+        const cols = Math.ceil(this.width / span);
+        const rows = Math.ceil(this.height / span);
+        return {
+            levelScale: levelScale,
+            span: span,
+            colStart: Math.max(0, Math.floor(-this.offsetX / this.scale / span)),
+            colEnd: Math.min(cols - 1, Math.floor((viewWidth - this.offsetX) / this.scale / span)),
+            rowStart: Math.max(0, Math.floor(-this.offsetY / this.scale / span)),
+            rowEnd: Math.min(rows - 1, Math.floor((viewHeight - this.offsetY) / this.scale / span))
+        };
+    };
+
+    TileViewer.prototype._placeTile = function (img, range, col, row) {
+        const left = this.offsetX + col * range.span * this.scale;
+        const top = this.offsetY + row * range.span * this.scale;
+        const right = this.offsetX + Math.min((col + 1) * range.span, this.width) * this.scale;
+        const bottom = this.offsetY + Math.min((row + 1) * range.span, this.height) * this.scale;
+        // 取整到像素边界，避免相邻瓦片之间出现缝隙
+        img.style.left = Math.floor(left) + 'px';
+        img.style.top = Math.floor(top) + 'px';
+        img.style.width = (Math.ceil(right) - Math.floor(left)) + 'px';
+        img.style.height = (Math.ceil(bottom) - Math.floor(top)) + 'px';
+    };
+
+    TileViewer.prototype.render = function () {
+        const self = this;
+        const level = this._levelFor(this.scale);
+        const layer = this._layer(level);
+        const range = this._visibleRange(level);
+        const wanted = {};
+
+        for (let col = range.colStart; col <= range.colEnd; col++) {
+            for (let row = range.rowStart; row <= range.rowEnd; row++) {
+                const key = col + '_' + row;
+                wanted[key] = true;
+                let img = layer.tiles[key];
+                if (!img) {
+                    img = document.createElement('img');
+                    img.draggable = false;
+                    img.alt = '';
+                    img.style.position = 'absolute';
+                    img.style.maxWidth = 'none';
+                    img.style.userSelect = 'none';
+                    layer.pending += 1;
+                    img.onload = img.onerror = function () {
+                        layer.pending -= 1;
+                        self.requestRender();
+                    };
+                    img.src = this.tilesBase + level + '/' + key + '.' + this.format;
+                    layer.el.appendChild(img);
+                    layer.tiles[key] = img;
+                }
+                this._placeTile(img, range, col, row);
+            }
+        }
+
+        // 移除当前层视口外的瓦片
+        Object.keys(layer.tiles).forEach(function (key) {
+            if (!wanted[key]) {
+                layer.el.removeChild(layer.tiles[key]);
+                delete layer.tiles[key];
+            }
+        });
+
+        // 其他层：当前层加载完成前保留为底图并跟随平移缩放，完成后移除
+        Object.keys(this.layers).forEach(function (key) {
+            const otherLevel = parseInt(key, 10);
+            if (otherLevel === level) {
+                return;
+            }
+            const other = self.layers[otherLevel];
+            if (layer.pending === 0) {
+                self.container.removeChild(other.el);
+                delete self.layers[otherLevel];
+                return;
+            }
+            const otherRange = self._visibleRange(otherLevel);
+            Object.keys(other.tiles).forEach(function (tileKey) {
+                const parts = tileKey.split('_');
+                self._placeTile(other.tiles[tileKey], otherRange,
+                    parseInt(parts[0], 10), parseInt(parts[1], 10));
+            });
+        });
+    };
+
+    TileViewer.prototype.destroy = function () {
+        this.handlers.forEach(function (entry) {
+            entry[0].removeEventListener(entry[1], entry[2], entry[3]);
+        });
+        this.handlers = [];
+        this.layers = {};
+        this.container.innerHTML = '';
+    };
+
+    window.TileViewer = TileViewer;
+})(window);
@@ -0,0 +1,285 @@
+"""
+智谱AI API客户端模块
+
+复用连接池（keep-alive）的 requests.Session，所有请求经过全局令牌桶限流；
+429/5xx/网络错误按指数退避重试（优先使用 Retry-After），重试耗尽仍失败的
+请求连续达到阈值后熔断一段时间，期间直接返回失败，不再占用请求线程。
+
+base_url 可配置（ZHIPU_API_BASE），便于指向本地桩服务器调试。
+"""
+
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_api_key_cache: dict[str, object] = {}
+_api_key_lock = threading.Lock()
+
+
+def get_api_key() -> str | None:
+    """
+    获取智谱AI API Key
+
+    优先读取环境变量 ZHIPU_API_KEY；否则读取 zhipukey.txt，
+    按文件修改时间缓存，文件未变化时不重复读盘。
+    """
+    env_key = os.environ.get("ZHIPU_API_KEY")
+    if env_key:
+        return env_key.strip()
+
+    key_file = os.path.join(os.path.dirname(__file__), "..", "zhipukey.txt")
+    try:
+        mtime = os.path.getmtime(key_file)
+    except OSError:
+        return None
+
+    with _api_key_lock:
+        if _api_key_cache.get("mtime") != mtime:
+            try:
+                with open(key_file, "r", encoding="utf-8") as f:
+                    _api_key_cache["key"] = f.read().strip() or None
+            except OSError:
+                return None
+            _api_key_cache["mtime"] = mtime
+        return _api_key_cache.get("key")
+
+
+class ZhipuAPIError(Exception):
+    """智谱AI API调用失败"""
+
+
+class CircuitOpenError(ZhipuAPIError):
+    """熔断中，拒绝调用"""
+
+
+class TokenBucket:
+    """令牌桶限流器（线程安全）"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """获取一个令牌，令牌不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败 failure_threshold 次后打开，reset_timeout 秒后进入半开状态，
+    只放行一个试探请求：成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """是否允许发起请求"""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class ZhipuClient:
+    """智谱AI对话接口客户端（线程安全，建议进程内共享一个实例）"""
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str = Config.ZHIPU_API_BASE,
+        model: str = Config.ZHIPU_MODEL,
+        connect_timeout: float = Config.ZHIPU_CONNECT_TIMEOUT,
+        read_timeout: float = Config.ZHIPU_READ_TIMEOUT,
+        max_retries: int = Config.ZHIPU_MAX_RETRIES,
+        backoff_base: float = Config.ZHIPU_BACKOFF_BASE,
+        backoff_max: float = Config.ZHIPU_BACKOFF_MAX,
+        pool_size: int = Config.ZHIPU_POOL_SIZE,
+        rate_limiter: TokenBucket | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+    ):
+        self._api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = max(1, pool_size)
+        self.rate_limiter = rate_limiter or TokenBucket(
+            Config.ZHIPU_RATE_PER_SECOND, Config.ZHIPU_RATE_BURST
+        )
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            Config.ZHIPU_CIRCUIT_THRESHOLD, Config.ZHIPU_CIRCUIT_RESET
+        )
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @property
+    def api_key(self) -> str | None:
+        return self._api_key or get_api_key()
+
+    def chat(
+        self, prompt: str, max_tokens: int = 500, temperature: float = 0.7
+    ) -> str:
+        """
+        发送单轮对话请求
+
+        Returns:
+            回复文本
+
+        Raises:
+            ZhipuAPIError: 未配置Key、熔断中、重试耗尽或响应无法解析
+        """
+        api_key = self.api_key
+        if not api_key:
+            raise ZhipuAPIError("未配置智谱AI API Key")
+
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        response = self._post("/chat/completions", payload, api_key)
+
+        try:
+            result = response.json()
+            if result.get("choices") and len(result["choices"]) > 0:
+                return result["choices"][0]["message"]["content"].strip()
+        except (KeyError, TypeError, ValueError) as e:
+            raise ZhipuAPIError(f"响应解析失败: {e}") from e
+        raise ZhipuAPIError("响应中没有结果")
+
+    def _post(self, path: str, payload: dict, api_key: str) -> requests.Response:
+        """带限流、重试和熔断的POST请求"""
+        url = self.base_url + path
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+
+        # 熔断按逻辑请求计数：只在首次尝试前检查，重试耗尽后记一次失败
+        if not self.circuit_breaker.allow():
+            raise CircuitOpenError("智谱AI API熔断中，暂停调用")
+
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            retry_after = None
+            try:
+                response = self.session.post(
+                    url, headers=headers, json=payload, timeout=self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = ZhipuAPIError(f"网络错误: {e}")
+            else:
+                if response.status_code < 400:
+                    self.circuit_breaker.record_success()
+                    return response
+                error = ZhipuAPIError(f"HTTP {response.status_code}: {response.text[:200]}")
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    # 4xx（鉴权、参数错误）不是服务端故障，不计入熔断
+                    self.circuit_breaker.record_success()
+                    raise error
+                retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+
+            if attempt >= self.max_retries:
+                self.circuit_breaker.record_failure()
+                raise error
+            time.sleep(self._backoff_delay(attempt, retry_after))
+            attempt += 1
+
+    def _backoff_delay(self, attempt: int, retry_after: float | None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # 指数退避 + 随机抖动，避免多个线程同时重试
+        delay = self.backoff_base * (2**attempt)
+        return min(delay * random.uniform(0.5, 1.0), self.backoff_max)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+_client: ZhipuClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> ZhipuClient:
+    """获取进程内共享的客户端"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ZhipuClient()
+    return _client
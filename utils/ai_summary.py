@@ -2,80 +2,129 @@
 AI摘要工具模块
 
 集成智谱AI (GLM-4) API，自动生成公文内容摘要。
+相同提示词的结果缓存在 content_cache 表中，重复请求不再调用API。
+长文档按段落切分为多个片段并发摘要（map），再合并为最终摘要（reduce）。
 """
 
-import os
-import requests
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
 
+from flask import current_app, has_app_context
 
-def get_api_key() -> str | None:
-    """获取智谱AI API Key"""
-    env_key = os.environ.get("ZHIPU_API_KEY")
-    if env_key:
-        return env_key.strip()
+from config import Config
+from utils.ai_client import ZhipuAPIError, get_client
+from utils.content_cache import (
+    CACHE_TYPE_SUMMARY,
+    get_cached_content,
+    set_cached_content,
+    summary_cache_key,
+)
 
-    key_file = os.path.join(os.path.dirname(__file__), "..", "zhipukey.txt")
-    try:
-        with open(key_file, "r", encoding="utf-8") as f:
-            return f.read().strip()
-    except FileNotFoundError:
-        return None
 
+def build_summary_prompt(content: str) -> str:
+    """构建公文摘要提示词"""
+    return f"""请对以下公文内容进行摘要，要求：
+1. 提取关键信息（发文单位、收文单位、主要事项、时间节点等）
+2. 摘要简洁明了，不超过200字
+3. 使用规范公文语言
 
-def generate_summary(content: str, max_tokens: int = 500) -> str | None:
-    """
-    使用智谱AI生成公文内容摘要
+公文内容：
+{content}
 
-    Args:
-        content: 公文原始内容
-        max_tokens: 最大token数量
+请直接输出摘要，无需额外说明。"""
 
-    Returns:
-        摘要文本，失败返回None
-    """
-    api_key = get_api_key()
-    if not api_key:
-        return None
 
-    # 构建提示词
-    prompt = f"""请对以下公文内容进行摘要，要求：
-1. 提取关键信息（发文单位、收文单位、主要事项、时间节点等）
-2. 摘要简洁明了，不超过200字
+def build_context_summary_prompt(
+    content: str, project_name: str = "", tuban_code: str = ""
+) -> str:
+    """构建带项目上下文的公文摘要提示词"""
+    context = ""
+    if project_name:
+        context += f"项目名称：{project_name}\n"
+    if tuban_code:
+        context += f"关联图斑：{tuban_code}\n"
+
+    return f"""{context}请对以下公文内容进行摘要，要求：
+1. 提取关键信息（发文单位、收文单位、主要事项、时间节点、需要采取的行动等）
+2. 摘要简洁明了，150-200字
 3. 使用规范公文语言
+4. 如有关联项目或图斑，请一并说明
 
 公文内容：
 {content}
 
 请直接输出摘要，无需额外说明。"""
 
-    try:
-        url = "https://open.bigmodel.cn/api/paas/v4/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        }
-        data = {
-            "model": "glm-4",
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": max_tokens,
-            "temperature": 0.7,
-        }
-
-        response = requests.post(url, headers=headers, json=data, timeout=30)
-        response.raise_for_status()
-
-        result = response.json()
-        if result.get("choices") and len(result["choices"]) > 0:
-            return result["choices"][0]["message"]["content"].strip()
 
-        return None
+def build_chunk_prompt(content: str, index: int, total: int) -> str:
+    """构建长文档片段摘要提示词（map阶段）"""
+    return f"""以下是一份公文的第{index}/{total}部分，请提取该部分的关键信息，要求：
+1. 保留发文单位、收文单位、主要事项、时间节点、需要采取的行动等
+2. 不超过200字，使用规范公文语言
+3. 不要推测其他部分的内容
+
+公文片段：
+{content}
+
+请直接输出要点，无需额外说明。"""
+
+
+def build_reduce_prompt(partial_summaries: list[str]) -> str:
+    """构建合并摘要提示词（reduce阶段）"""
+    parts = "\n\n".join(
+        f"第{index}部分要点：\n{summary}"
+        for index, summary in enumerate(partial_summaries, 1)
+    )
+    return f"""以下是同一份公文按顺序分段提取的要点，请合并为完整的公文摘要，要求：
+1. 提取关键信息（发文单位、收文单位、主要事项、时间节点等）
+2. 覆盖全部分段的要点，去除重复内容
+3. 摘要简洁明了，不超过300字
+4. 使用规范公文语言
+
+分段要点：
+{parts}
+
+请直接输出摘要，无需额外说明。"""
 
-    except requests.exceptions.RequestException as e:
+
+def _call_zhipu(prompt: str, max_tokens: int) -> str | None:
+    """调用智谱AI对话接口（限流、重试、熔断由客户端处理），失败返回None"""
+    try:
+        return get_client().chat(prompt, max_tokens)
+    except ZhipuAPIError as e:
         print(f"智谱AI API请求失败: {e}")
         return None
-    except (KeyError, ValueError) as e:
-        print(f"智谱AI API响应解析失败: {e}")
-        return None
+
+
+def complete_prompt(prompt: str, max_tokens: int = 500) -> str | None:
+    """
+    获取提示词的AI回复（带内容缓存）
+
+    相同的规范化提示词、模型和参数直接返回缓存结果，不再调用API。
+    """
+    cache_key = summary_cache_key(prompt, get_client().model, max_tokens)
+    cached = get_cached_content(CACHE_TYPE_SUMMARY, cache_key)
+    if cached is not None:
+        return cached
+
+    result = _call_zhipu(prompt, max_tokens)
+    if result:
+        set_cached_content(CACHE_TYPE_SUMMARY, cache_key, result)
+    return result
+
+
+def generate_summary(content: str, max_tokens: int = 500) -> str | None:
+    """
+    使用智谱AI生成公文内容摘要
+
+    Args:
+        content: 公文原始内容
+        max_tokens: 最大token数量
+
+    Returns:
+        摘要文本，失败返回None
+    """
+    return complete_prompt(build_summary_prompt(content), max_tokens)
 
 
 def generate_summary_with_context(
@@ -92,53 +141,175 @@ def generate_summary_with_context(
     Returns:
         摘要文本，失败返回None
     """
-    api_key = get_api_key()
-    if not api_key:
-        return None
+    return complete_prompt(
+        build_context_summary_prompt(content, project_name, tuban_code), 500
+    )
 
-    # 构建提示词（带上下文）
-    context = ""
-    if project_name:
-        context += f"项目名称：{project_name}\n"
-    if tuban_code:
-        context += f"关联图斑：{tuban_code}\n"
 
-    prompt = f"""{context}请对以下公文内容进行摘要，要求：
-1. 提取关键信息（发文单位、收文单位、主要事项、时间节点、需要采取的行动等）
-2. 摘要简洁明了，150-200字
-3. 使用规范公文语言
-4. 如有关联项目或图斑，请一并说明
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uff00-\uffef]")
+_PARAGRAPH_PATTERN = re.compile(r"\n\s*\n|\n")
+_SENTENCE_PATTERN = re.compile(r"(?<=[。！？；!?;])")
 
-公文内容：
-{content}
 
-请直接输出摘要，无需额外说明。"""
+def estimate_tokens(text: str) -> int:
+    """估算token数：中文字符约1个token，其余字符约4个一个token"""
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
+def _hard_split(text: str, max_tokens: int) -> list[str]:
+    """按字符硬切，每段尽量接近 max_tokens"""
+    pieces = []
+    start = cjk_count = other_count = 0
+    for i, char in enumerate(text):
+        is_cjk = _CJK_PATTERN.match(char) is not None
+        next_cjk = cjk_count + is_cjk
+        next_other = other_count + (not is_cjk)
+        if i > start and next_cjk + (next_other + 3) // 4 > max_tokens:
+            pieces.append(text[start:i])
+            start, next_cjk, next_other = i, int(is_cjk), int(not is_cjk)
+        cjk_count, other_count = next_cjk, next_other
+    pieces.append(text[start:])
+    return pieces
+
+
+def _split_oversized(text: str, max_tokens: int) -> list[str]:
+    """超长段落切分为句子，单句仍超长时按字符硬切（不合并，由调用方装箱）"""
+    pieces = []
+    for sentence in _SENTENCE_PATTERN.split(text):
+        if not sentence:
+            continue
+        if estimate_tokens(sentence) > max_tokens:
+            pieces.extend(_hard_split(sentence, max_tokens))
+        else:
+            pieces.append(sentence)
+    return pieces
+
 
+def split_into_chunks(text: str, max_tokens: int) -> list[str]:
+    """
+    按段落边界切分文本，每个片段不超过 max_tokens
+
+    段落保持原有顺序，尽量把相邻段落合并到同一片段中。超长段落切分出的
+    句子和硬切片段同样参与合并，同一段落内的片段原样拼接，段落之间以换行分隔。
+    """
+    chunks = []
+    current = ""
+    current_tokens = 0
+
+    for paragraph in _PARAGRAPH_PATTERN.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) > max_tokens:
+            pieces = _split_oversized(paragraph, max_tokens)
+        else:
+            pieces = [paragraph]
+
+        for index, piece in enumerate(pieces):
+            separator = "\n" if current and index == 0 else ""
+            # 分隔符计入片段估算，逐段累加的估算值不小于整体估算值
+            piece_tokens = estimate_tokens(separator + piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(current)
+                current, current_tokens = piece, estimate_tokens(piece)
+            else:
+                current += separator + piece
+                current_tokens += piece_tokens
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _run_concurrently(prompts: list[str], max_tokens: int) -> list[str] | None:
+    """并发获取多个提示词的回复（保持顺序），任一失败或超时返回None"""
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def _complete(prompt):
+        if app is None:
+            return complete_prompt(prompt, max_tokens)
+        # 工作线程没有应用上下文，内容缓存需要访问数据库
+        with app.app_context():
+            return complete_prompt(prompt, max_tokens)
+
+    workers = max(1, min(Config.SUMMARY_MAX_WORKERS, len(prompts)))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-summary")
     try:
-        url = "https://open.bigmodel.cn/api/paas/v4/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        }
-        data = {
-            "model": "glm-4",
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 500,
-            "temperature": 0.7,
-        }
-
-        response = requests.post(url, headers=headers, json=data, timeout=30)
-        response.raise_for_status()
-
-        result = response.json()
-        if result.get("choices") and len(result["choices"]) > 0:
-            return result["choices"][0]["message"]["content"].strip()
+        futures = [executor.submit(_complete, prompt) for prompt in prompts]
+        done, not_done = wait(futures, timeout=Config.SUMMARY_TIMEOUT)
+        if not_done:
+            print(f"长文档摘要超时：{len(not_done)}个片段未完成")
+            return None
+        results = [future.result() for future in futures]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
+    if not all(results):
+        print("长文档摘要失败：部分片段摘要失败")
         return None
+    return results
 
-    except requests.exceptions.RequestException as e:
-        print(f"智谱AI API请求失败: {e}")
+
+def generate_summaries(contents: list[str], max_tokens: int = 500) -> list[str] | None:
+    """批量生成多份公文的摘要（并发执行，顺序与输入一致），任一失败返回None"""
+    if not contents:
+        return []
+    return _run_concurrently(
+        [build_summary_prompt(content) for content in contents], max_tokens
+    )
+
+
+def summarize_document(content: str) -> str | None:
+    """
+    生成完整文档的摘要（长文档使用map-reduce）
+
+    文档未超过 SUMMARY_CHUNK_TOKENS 时直接摘要；否则按段落切分，
+    各片段并发摘要（受全局限流器约束，片段结果单独缓存），
+    再将片段要点合并为最终摘要。片段要点过多时逐级合并。
+
+    Returns:
+        摘要文本，失败返回None
+    """
+    if not content or not content.strip():
         return None
-    except (KeyError, ValueError) as e:
-        print(f"智谱AI API响应解析失败: {e}")
+
+    chunk_tokens = Config.SUMMARY_CHUNK_TOKENS
+    if estimate_tokens(content) <= chunk_tokens:
+        return generate_summary(content)
+
+    chunks = split_into_chunks(content, chunk_tokens)
+    total = len(chunks)
+    partial_summaries = _run_concurrently(
+        [build_chunk_prompt(chunk, i, total) for i, chunk in enumerate(chunks, 1)],
+        300,
+    )
+    if partial_summaries is None:
         return None
+
+    # 合并提示词超长时分组合并，直到可以一次合并
+    while estimate_tokens(build_reduce_prompt(partial_summaries)) > chunk_tokens:
+        groups = _group_summaries(partial_summaries, chunk_tokens)
+        if len(groups) >= len(partial_summaries):
+            break
+        partial_summaries = _run_concurrently(
+            [build_reduce_prompt(group) for group in groups], 300
+        )
+        if partial_summaries is None:
+            return None
+
+    return complete_prompt(build_reduce_prompt(partial_summaries), 500)
+
+
+def _group_summaries(summaries: list[str], max_tokens: int) -> list[list[str]]:
+    """按token上限把片段要点分组"""
+    groups: list[list[str]] = []
+    current: list[str] = []
+    for summary in summaries:
+        if current and estimate_tokens(build_reduce_prompt(current + [summary])) > max_tokens:
+            groups.append(current)
+            current = []
+        current.append(summary)
+    if current:
+        groups.append(current)
+    return groups
@@ -0,0 +1,148 @@
+"""
+后台任务登记模块
+
+耗时操作（如GIS批量导入）在后台线程中执行，请求立即返回任务ID，
+前端轮询任务状态接口获取进度。任务只登记在本进程内存中：完成后保留
+BACKGROUND_JOB_RETENTION_SECONDS 供查询，进程重启后丢失。
+
+任务函数签名为 func(job, *args, **kwargs)，在应用上下文中运行，
+通过 job.update(...) 报告进度；返回值存入 job.result，异常信息存入 job.message。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from models import db
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+@dataclass
+class Job:
+    """一个后台任务的状态（各字段由任务线程更新，读取请用 to_dict）"""
+
+    id: str
+    kind: str
+    owner: str | None = None
+    status: str = JOB_PENDING
+    processed: int = 0
+    total: int | None = None
+    counts: dict[str, int] = field(default_factory=dict)
+    message: str = ""
+    result: Any = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in JOB_FINISHED_STATES
+
+    def update(
+        self,
+        processed: int | None = None,
+        total: int | None = None,
+        counts: dict[str, int] | None = None,
+        message: str | None = None,
+    ) -> None:
+        """报告进度"""
+        with self._lock:
+            if processed is not None:
+                self.processed = processed
+            if total is not None:
+                self.total = total
+            if counts is not None:
+                self.counts = dict(counts)
+            if message is not None:
+                self.message = message
+
+    def _set_status(self, status: str, message: str | None = None, result=None):
+        with self._lock:
+            self.status = status
+            if message is not None:
+                self.message = message
+            if result is not None:
+                self.result = result
+            if status in JOB_FINISHED_STATES:
+                self.finished_at = time.time()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            percent = None
+            if self.status == JOB_SUCCEEDED:
+                percent = 100.0
+            elif self.total:
+                percent = round(min(self.processed / self.total, 1.0) * 100, 1)
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "processed": self.processed,
+                "total": self.total,
+                "percent": percent,
+                "counts": dict(self.counts),
+                "message": self.message,
+                "result": self.result,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+
+_jobs: dict[str, Job] = {}
+_jobs_lock = threading.Lock()
+
+
+def _prune_jobs(retention_seconds: float) -> None:
+    """删除完成已久的任务（调用方持有 _jobs_lock）"""
+    cutoff = time.time() - retention_seconds
+    expired = [
+        job_id
+        for job_id, job in _jobs.items()
+        if job.finished_at is not None and job.finished_at < cutoff
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+def start_job(
+    app, kind: str, func: Callable[..., Any], *args, owner: str | None = None, **kwargs
+) -> Job:
+    """登记任务并在后台线程中执行，立即返回 Job"""
+    job = Job(id=uuid.uuid4().hex, kind=kind, owner=owner)
+    with _jobs_lock:
+        _prune_jobs(app.config.get("BACKGROUND_JOB_RETENTION_SECONDS", 3600))
+        _jobs[job.id] = job
+    thread = threading.Thread(
+        target=_run_job,
+        args=(app, job, func, args, kwargs),
+        name=f"job-{kind}-{job.id[:8]}",
+        daemon=True,
+    )
+    thread.start()
+    return job
+
+
+def _run_job(app, job: Job, func, args, kwargs) -> None:
+    job._set_status(JOB_RUNNING)
+    with app.app_context():
+        try:
+            result = func(job, *args, **kwargs)
+        except Exception as e:
+            db.session.rollback()
+            job._set_status(JOB_FAILED, message=str(e))
+        else:
+            job._set_status(JOB_SUCCEEDED, result=result)
+
+
+def get_job(job_id: str) -> Job | None:
+    with _jobs_lock:
+        return _jobs.get(job_id)
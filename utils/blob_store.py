@@ -0,0 +1,333 @@
+"""
+内容寻址附件存储模块
+
+上传文件按内容 SHA-256 存放在分片目录中，相同内容只存一份：
+    UPLOAD_FOLDER/blobs/<前2位>/<3-4位>/<sha256>
+
+写入时先边复制边计算摘要写到 blobs/.tmp 下的临时文件，再原子 rename 到
+最终路径；目标已存在（重复上传）时直接丢弃临时文件。
+
+数据库中的引用仍是字符串，保持原有字段格式：
+- 附件/公文/时间线附件：blobs/<aa>/<bb>/<sha256>/<原文件名>
+  （最后一段是下载文件名，不对应磁盘上的目录）
+- 图斑图片（TubanImage.filename）：<sha256>.<扩展名>，
+  派生图与瓦片仍按文件名主干存放在 uploads/images 下，重复图片共用
+旧格式的引用（attachment_xxx、projects/<id>/xxx、图片随机文件名）继续按原路径访问。
+
+Blob.ref_count 记录未删除图斑的 Tuban.attachments、ProjectDocument.doc_file、
+ProjectTimeline.attachments 和未删除图斑下未删除 TubanImage.filename 对该内容的引用数，
+随业务写入增减；recount_blob_refs() 按全部引用重新统计，以其结果为准。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+from flask import current_app
+from models import db
+from models.blob import Blob
+from utils.db_dialect import insert_ignore
+
+BLOBS_DIRNAME = "blobs"
+TMP_DIRNAME = ".tmp"
+COPY_CHUNK_SIZE = 1024 * 1024
+
+_ATTACHMENT_REF_RE = re.compile(
+    r"^blobs/[0-9a-f]{2}/[0-9a-f]{2}/(?P<sha256>[0-9a-f]{64})/(?P<name>[^/]+)$"
+)
+_IMAGE_REF_RE = re.compile(r"^(?P<sha256>[0-9a-f]{64})\.(?P<ext>[A-Za-z0-9]+)$")
+
+
+def blob_relative_path(sha256: str) -> str:
+    """blob 相对上传目录的路径"""
+    return f"{BLOBS_DIRNAME}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def blob_path(upload_root: str, sha256: str) -> Path:
+    return Path(upload_root) / blob_relative_path(sha256)
+
+
+def make_attachment_ref(sha256: str, name: str) -> str:
+    """附件引用：blobs/<aa>/<bb>/<sha256>/<文件名>"""
+    return f"{blob_relative_path(sha256)}/{name}"
+
+
+def make_image_ref(sha256: str, ext: str) -> str:
+    """图片引用（TubanImage.filename）：<sha256>.<扩展名>"""
+    return f"{sha256}.{ext.lower()}"
+
+
+def parse_blob_ref(ref: str | None) -> str | None:
+    """从引用中取出 sha256，旧格式引用返回None"""
+    if not ref:
+        return None
+    ref = ref.strip()
+    match = _ATTACHMENT_REF_RE.match(ref) or _IMAGE_REF_RE.match(ref)
+    return match.group("sha256") if match else None
+
+
+def ref_display_name(ref: str) -> str:
+    """引用对应的下载/显示文件名"""
+    return ref.strip().rsplit("/", 1)[-1]
+
+
+def resolve_upload_path(upload_root: str, ref: str | None) -> Path | None:
+    """
+    把附件引用解析为磁盘路径
+
+    blob 引用指向 blobs 目录中的内容文件；旧格式按上传目录内相对路径处理，
+    越出上传目录的路径返回None。
+    """
+    from utils.helpers import safe_join_upload
+
+    if not ref:
+        return None
+    match = _ATTACHMENT_REF_RE.match(ref.strip())
+    if match:
+        return blob_path(upload_root, match.group("sha256"))
+    return safe_join_upload(upload_root, ref.strip())
+
+
+def image_source_path(images_folder: str, filename: str) -> str:
+    """图斑图片原图路径（blob 命名的图片存放在 blobs 目录）"""
+    match = _IMAGE_REF_RE.match(filename)
+    if match:
+        upload_root = os.path.dirname(os.path.normpath(images_folder))
+        return str(blob_path(upload_root, match.group("sha256")))
+    return os.path.join(images_folder, filename)
+
+
+def _copy_and_hash(reader, writer) -> tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: reader.read(COPY_CHUNK_SIZE), b""):
+        digest.update(chunk)
+        writer.write(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _commit_temp(upload_root: str, tmp_path: str, sha256: str) -> None:
+    """把临时文件原子地放到最终位置，内容已存在时丢弃临时文件"""
+    final_path = blob_path(upload_root, sha256)
+    if final_path.exists():
+        os.remove(tmp_path)
+        # 刷新修改时间，避免正在被回收扫描的旧blob在重新引用前被隔离
+        os.utime(final_path)
+        return
+    final_path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, final_path)
+
+
+def _temp_file(upload_root: str):
+    tmp_dir = os.path.join(upload_root, BLOBS_DIRNAME, TMP_DIRNAME)
+    os.makedirs(tmp_dir, exist_ok=True)
+    return tempfile.mkstemp(dir=tmp_dir)
+
+
+def store_upload(file_storage) -> tuple[str, int]:
+    """
+    保存上传文件到blob存储（读取后恢复文件流位置，便于后续提取文本）
+
+    Returns:
+        (sha256, 文件大小)
+    """
+    upload_root = current_app.config["UPLOAD_FOLDER"]
+    stream = file_storage.stream
+    position = stream.tell()
+    stream.seek(0)
+
+    fd, tmp_path = _temp_file(upload_root)
+    try:
+        with os.fdopen(fd, "wb") as writer:
+            sha256, size = _copy_and_hash(stream, writer)
+        _commit_temp(upload_root, tmp_path, sha256)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        stream.seek(position)
+
+    ensure_blob(sha256, size)
+    return sha256, size
+
+
+def store_file(path: str, move: bool = False) -> tuple[str, int]:
+    """
+    保存磁盘上的文件到blob存储
+
+    Args:
+        move: 为True时移动源文件（同一文件系统内为 rename，不复制内容）
+    """
+    upload_root = current_app.config["UPLOAD_FOLDER"]
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    sha256 = digest.hexdigest()
+
+    if move:
+        fd, tmp_path = _temp_file(upload_root)
+        os.close(fd)
+        shutil.move(path, tmp_path)
+    else:
+        fd, tmp_path = _temp_file(upload_root)
+        try:
+            with os.fdopen(fd, "wb") as writer, open(path, "rb") as reader:
+                shutil.copyfileobj(reader, writer, COPY_CHUNK_SIZE)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+    _commit_temp(upload_root, tmp_path, sha256)
+
+    ensure_blob(sha256, size)
+    return sha256, size
+
+
+def _ensure_blob_row(sha256: str, size: int) -> None:
+    """登记blob记录，已存在（含并发上传相同内容）时忽略，不提交"""
+    db.session.execute(
+        insert_ignore(
+            Blob.__table__,
+            db.engine.dialect.name,
+            sha256=sha256,
+            size=size,
+            ref_count=0,
+        )
+    )
+
+
+def ensure_blob(sha256: str, size: int) -> None:
+    """
+    确保blob记录存在（新内容引用数为0，由引用方增加）
+
+    启用写入队列时由写入线程登记；否则在调用方的事务中登记，随调用方一起提交，
+    不会提交或回滚调用方会话中尚未完成的修改。
+    """
+    if current_app.config.get("WRITE_QUEUE_ENABLED"):
+        from utils.write_queue import run_write
+
+        run_write(_ensure_blob_row, sha256, size)
+    else:
+        _ensure_blob_row(sha256, size)
+
+
+def collect_refs(value: str | None, separator: str | None = ",") -> list[str]:
+    """
+    从引用字段中取出全部引用
+
+    Args:
+        separator: 多值分隔符；"json" 表示JSON数组，None 表示单值
+    """
+    if not value:
+        return []
+    if separator == "json":
+        try:
+            items = json.loads(value)
+        except (TypeError, ValueError):
+            return []
+        return [item for item in items if isinstance(item, str) and item.strip()]
+    if separator is None:
+        return [value.strip()] if value.strip() else []
+    return [item.strip() for item in value.split(separator) if item.strip()]
+
+
+def adjust_blob_refs(added=(), removed=()) -> None:
+    """
+    按引用变化增减引用计数（在调用方的会话中执行，由调用方提交）
+
+    Args:
+        added: 新增的引用
+        removed: 移除的引用
+    """
+    delta = Counter()
+    for ref in added:
+        sha256 = parse_blob_ref(ref)
+        if sha256:
+            delta[sha256] += 1
+    for ref in removed:
+        sha256 = parse_blob_ref(ref)
+        if sha256:
+            delta[sha256] -= 1
+
+    for sha256, change in delta.items():
+        if change == 0:
+            continue
+        new_count = Blob.ref_count + change
+        db.session.execute(
+            db.update(Blob)
+            .where(Blob.sha256 == sha256)
+            .values(ref_count=db.case((new_count < 0, 0), else_=new_count))
+        )
+
+
+def iter_all_refs():
+    """遍历数据库中的全部上传文件引用（流式，按批读取）"""
+    from models.project import ProjectDocument, ProjectTimeline
+    from models.tuban import Tuban
+    from models.tuban_image import TubanImage
+
+    sources = [
+        (
+            db.select(Tuban.attachments).where(
+                Tuban.attachments.isnot(None), Tuban.is_deleted == 0
+            ),
+            ",",
+        ),
+        (
+            db.select(ProjectDocument.doc_file).where(
+                ProjectDocument.doc_file.isnot(None)
+            ),
+            None,
+        ),
+        (
+            db.select(ProjectTimeline.attachments).where(
+                ProjectTimeline.attachments.isnot(None)
+            ),
+            "json",
+        ),
+        (
+            db.select(TubanImage.filename)
+            .join(Tuban, Tuban.id == TubanImage.tuban_id)
+            .where(TubanImage.is_deleted == 0, Tuban.is_deleted == 0),
+            None,
+        ),
+    ]
+    for statement, separator in sources:
+        result = db.session.execute(statement.execution_options(yield_per=1000))
+        for (value,) in result:
+            yield from collect_refs(value, separator)
+
+
+def recount_blob_refs() -> dict[str, int]:
+    """按数据库中的全部引用重新统计引用计数，返回 {状态: 数量}"""
+    counts = Counter()
+    for ref in iter_all_refs():
+        sha256 = parse_blob_ref(ref)
+        if sha256:
+            counts[sha256] += 1
+
+    changes = [
+        {"id": blob_id, "ref_count": counts.get(sha256, 0)}
+        for blob_id, sha256, ref_count in db.session.execute(
+            db.select(Blob.id, Blob.sha256, Blob.ref_count).execution_options(
+                yield_per=1000
+            )
+        )
+        if ref_count != counts.get(sha256, 0)
+    ]
+    for start in range(0, len(changes), 1000):
+        db.session.bulk_update_mappings(Blob, changes[start : start + 1000])
+    db.session.commit()
+    updated = len(changes)
+    return {"referenced": len(counts), "updated": updated}
@@ -0,0 +1,458 @@
+"""
+功能区边界与点面判定模块
+
+管理员上传地质公园边界/功能区面图层（GeoJSON/KML/Shapefile/GeoPackage，
+读取复用 gis_import），坐标转换到 TUBAN_COORDINATE_CRS 后保存为 BoundaryZone。
+图斑和项目的功能区按坐标落在哪个面内判定：
+
+    - 保存单个图斑/项目时（ZONE_AUTO_ASSIGN）判定并覆盖手填的功能区
+    - reclassify_tubans 对全部图斑批量判定，报告与已填功能区不一致的图斑，
+      可选写回
+
+判定使用 ZoneIndex：每个面的边按纬度分带索引，点只与所在纬带内的边做
+射线相交计数（奇偶规则，内环即洞），点-边对的计算全部用 NumPy 向量化。
+多个面重叠时按 ZONE_PRECEDENCE 取最严格的功能区（核心区 > 缓冲区 > 实验区），
+公园边界面（功能区为空）只说明点在公园内。索引在进程内缓存，
+面的数量或最大ID变化时重建。
+"""
+
+from __future__ import annotations
+
+import json
+import tempfile
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable
+
+from flask import current_app
+from sqlalchemy import func, update
+
+from models import db
+from models.boundary_zone import BoundaryZone
+from models.tuban import Tuban
+from utils.gis_import import GISImportError, open_gis_source, polygon_rings
+from utils.write_queue import run_write
+
+# 未指定功能区字段时依次尝试的属性名（不区分大小写）
+ZONE_FIELD_CANDIDATES = ("func_zone", "功能区", "所在功能区", "GNQ", "GNFQ", "ZONE")
+MAX_REPORTED_MISMATCHES = 500
+RECLASSIFY_UPDATE_BATCH = 1000
+# 每带平均边数，以及一次计算的点-边对数上限（控制临时数组内存）
+_EDGES_PER_BAND = 2
+_MAX_BANDS = 1 << 16
+_PAIR_CHUNK = 1 << 21
+# 环坐标保存精度（约1厘米）
+_RING_DECIMALS = 7
+
+
+@dataclass(frozen=True)
+class ZoneInfo:
+    id: int
+    park_name: str
+    func_zone: str | None
+
+
+def zone_precedence() -> list[str]:
+    """功能区判定优先级（重叠时靠前者优先）"""
+    text = current_app.config.get("ZONE_PRECEDENCE", "")
+    return [name.strip() for name in text.split(",") if name.strip()]
+
+
+def normalize_zone_name(value) -> str | None:
+    """属性值规范为功能区名称：含“核心区”等已知名称时取该名称，否则原样"""
+    text = str(value).strip() if value is not None else ""
+    if not text:
+        return None
+    for name in zone_precedence():
+        if name in text:
+            return name
+    return text
+
+
+# ==================== 点面判定索引 ====================
+
+
+class _EdgeBands:
+    """一个面的边，按纬度分带：带内的边 ID 连续存放，offsets 为每带起点"""
+
+    def __init__(self, rings):
+        import numpy as np
+
+        rings = [np.asarray(ring, dtype=np.float64) for ring in rings if len(ring) >= 3]
+        points = np.concatenate(rings)
+        self.min_lon, self.min_lat = points.min(axis=0)
+        self.max_lon, self.max_lat = points.max(axis=0)
+
+        starts = points
+        ends = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+        # 水平边（含闭合环首尾重复点形成的零长度边）不与水平射线相交
+        keep = starts[:, 1] != ends[:, 1]
+        self.x1, self.y1 = starts[keep, 0], starts[keep, 1]
+        x2, self.y2 = ends[keep, 0], ends[keep, 1]
+        self.slope = (x2 - self.x1) / (self.y2 - self.y1)
+
+        edge_count = len(self.x1)
+        self.n_bands = int(min(max(edge_count // _EDGES_PER_BAND, 1), _MAX_BANDS))
+        self.band_height = (self.max_lat - self.min_lat) / self.n_bands or 1.0
+        first = self._band(np.minimum(self.y1, self.y2))
+        last = self._band(np.maximum(self.y1, self.y2))
+        spans = last - first + 1
+        edge_ids = np.repeat(np.arange(edge_count), spans)
+        band_ids = np.repeat(first, spans) + _ramp(spans)
+        order = np.argsort(band_ids, kind="stable")
+        self.edges = edge_ids[order]
+        self.offsets = np.searchsorted(band_ids[order], np.arange(self.n_bands + 1))
+
+    def _band(self, lat):
+        import numpy as np
+
+        band = ((lat - self.min_lat) / self.band_height).astype(np.int64)
+        return np.clip(band, 0, self.n_bands - 1)
+
+    def contains(self, lon, lat):
+        """点是否在面内（奇偶规则），返回 bool 数组"""
+        import numpy as np
+
+        inside = np.zeros(len(lon), dtype=bool)
+        candidates = np.flatnonzero(
+            (lon >= self.min_lon)
+            & (lon <= self.max_lon)
+            & (lat >= self.min_lat)
+            & (lat <= self.max_lat)
+        )
+        if not candidates.size:
+            return inside
+        px, py = lon[candidates], lat[candidates]
+        band = self._band(py)
+        start = self.offsets[band]
+        count = self.offsets[band + 1] - start
+
+        # 按点-边对数量分块，每块展开为 (点, 边) 对后一次计算相交
+        cumulative = np.cumsum(count)
+        splits = np.searchsorted(
+            cumulative, np.arange(_PAIR_CHUNK, cumulative[-1], _PAIR_CHUNK)
+        )
+        bounds = np.unique(np.concatenate(([0], splits, [len(count)])))
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            chunk_count = count[lo:hi]
+            point = np.repeat(np.arange(hi - lo), chunk_count)
+            edge = self.edges[np.repeat(start[lo:hi], chunk_count) + _ramp(chunk_count)]
+            y = py[lo:hi][point]
+            y1 = self.y1[edge]
+            crosses = (y1 > y) != (self.y2[edge] > y)
+            hit = crosses & (
+                px[lo:hi][point] < self.x1[edge] + (y - y1) * self.slope[edge]
+            )
+            odd = np.bincount(point, weights=hit, minlength=hi - lo) % 2 == 1
+            inside[candidates[lo:hi]] = odd
+        return inside
+
+
+def _ramp(counts):
+    """[2, 3] -> [0, 1, 0, 1, 2]：每段从0开始的序号"""
+    import numpy as np
+
+    total = int(counts.sum())
+    return np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+class ZoneIndex:
+    """全部边界面的点面判定索引，zones 按判定优先级排序"""
+
+    def __init__(self, zones: list[tuple[ZoneInfo, list]]):
+        precedence = zone_precedence()
+
+        def rank(item):
+            info = item[0]
+            if info.func_zone is None:
+                return (len(precedence) + 1, info.id)
+            if info.func_zone in precedence:
+                return (precedence.index(info.func_zone), info.id)
+            return (len(precedence), info.id)
+
+        zones = sorted(zones, key=rank)
+        self.zones = [info for info, _ in zones]
+        self._bands = [_EdgeBands(rings) for _, rings in zones]
+
+    def locate(self, lons, lats):
+        """每个点所在面在 self.zones 中的下标（不在任何面内为 -1）"""
+        import numpy as np
+
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        result = np.full(len(lons), -1, dtype=np.int64)
+        for index, bands in enumerate(self._bands):
+            pending = np.flatnonzero(result < 0)
+            if not pending.size:
+                break
+            result[pending[bands.contains(lons[pending], lats[pending])]] = index
+        return result
+
+
+_index_lock = threading.Lock()
+_index_cache: tuple[tuple, ZoneIndex] | None = None
+
+
+def get_zone_index() -> ZoneIndex | None:
+    """当前边界面的判定索引，没有边界面时返回 None"""
+    global _index_cache
+    count, max_id = db.session.query(
+        func.count(BoundaryZone.id), func.max(BoundaryZone.id)
+    ).one()
+    if not count:
+        return None
+    key = (str(db.engine.url), count, max_id)
+    with _index_lock:
+        if _index_cache is None or _index_cache[0] != key:
+            zones = [
+                (ZoneInfo(z.id, z.park_name, z.func_zone), z.get_rings())
+                for z in BoundaryZone.query.all()
+            ]
+            _index_cache = (key, ZoneIndex(zones))
+        return _index_cache[1]
+
+
+def locate_zone(longitude, latitude) -> ZoneInfo | None:
+    """单个坐标所在的边界面"""
+    index = get_zone_index()
+    if index is None or longitude is None or latitude is None:
+        return None
+    found = int(index.locate([float(longitude)], [float(latitude)])[0])
+    return index.zones[found] if found >= 0 else None
+
+
+def assign_func_zone(obj) -> tuple[str | None, str] | None:
+    """
+    按坐标判定并设置图斑/项目的功能区
+
+    Returns:
+        功能区被判定时返回 (原填写值, 判定值)，未启用、无坐标或不在任何功能区内返回 None
+    """
+    if not current_app.config.get("ZONE_AUTO_ASSIGN"):
+        return None
+    zone = locate_zone(obj.longitude, obj.latitude)
+    if zone is None or zone.func_zone is None:
+        return None
+    previous = obj.func_zone or None
+    obj.func_zone = zone.func_zone
+    return previous, zone.func_zone
+
+
+# ==================== 边界图层导入 ====================
+
+
+def _zone_value(properties: dict, zone_field: str | None):
+    lowered = {str(k).lower(): v for k, v in properties.items()}
+    fields = (zone_field,) if zone_field else ZONE_FIELD_CANDIDATES
+    for field in fields:
+        if field in properties:
+            return properties[field]
+        if field.lower() in lowered:
+            return lowered[field.lower()]
+    return None
+
+
+def _transform_rings(rings: list, source_crs, target_crs) -> list:
+    """批量转换全部环的坐标并保留 _RING_DECIMALS 位小数"""
+    from utils.crs import same_coordinates, transform
+
+    lons = [float(point[0]) for ring in rings for point in ring]
+    lats = [float(point[1]) for ring in rings for point in ring]
+    if not same_coordinates(source_crs, target_crs):
+        lons, lats = (v.tolist() for v in transform(lons, lats, source_crs, target_crs))
+    result, offset = [], 0
+    for ring in rings:
+        result.append(
+            [
+                [round(lon, _RING_DECIMALS), round(lat, _RING_DECIMALS)]
+                for lon, lat in zip(
+                    lons[offset : offset + len(ring)], lats[offset : offset + len(ring)]
+                )
+            ]
+        )
+        offset += len(ring)
+    return result
+
+
+def load_boundary_file(
+    path: str,
+    park_name: str,
+    zone_field: str | None = None,
+    default_zone: str | None = None,
+    crs=None,
+    replace: bool = False,
+    created_by: str | None = None,
+    source_name: str | None = None,
+) -> dict:
+    """
+    导入边界面图层
+
+    Args:
+        park_name: 图层所属地质公园
+        zone_field: 功能区属性列名，为空时按 ZONE_FIELD_CANDIDATES 查找
+        default_zone: 整个文件都属于该功能区（忽略属性）；都没有时作为公园边界
+        crs: 源坐标系，为空时按文件声明识别，默认 WGS84
+        replace: 先删除该公园已有的边界面
+
+    Returns:
+        {"zones": 新增面数, "skipped": 非面要素数, "replaced": 删除的旧面数}
+    """
+    from utils.crs import CRS_WGS84, CRSError, normalize_crs
+
+    rows, skipped = [], 0
+    with tempfile.TemporaryDirectory(prefix="zone_import_") as work_dir:
+        source = open_gis_source(path, work_dir)
+        try:
+            source_crs = normalize_crs(crs or source.crs or CRS_WGS84)
+            target_crs = normalize_crs(current_app.config["TUBAN_COORDINATE_CRS"])
+        except CRSError as e:
+            raise GISImportError(str(e))
+        for properties, geometry in source.features:
+            rings = polygon_rings(geometry) if geometry else None
+            rings = [ring for ring, _ in rings or () if len(ring) >= 3]
+            if not rings:
+                skipped += 1
+                continue
+            rings = _transform_rings(rings, source_crs, target_crs)
+            lons = [p[0] for ring in rings for p in ring]
+            lats = [p[1] for ring in rings for p in ring]
+            rows.append(
+                {
+                    "park_name": park_name,
+                    "func_zone": normalize_zone_name(
+                        default_zone or _zone_value(properties, zone_field)
+                    ),
+                    "source_name": source_name,
+                    "rings": json.dumps(rings, separators=(",", ":")),
+                    "vertex_count": len(lons),
+                    "min_lon": min(lons),
+                    "min_lat": min(lats),
+                    "max_lon": max(lons),
+                    "max_lat": max(lats),
+                    "created_by": created_by,
+                }
+            )
+    if not rows:
+        raise GISImportError("文件中没有面要素")
+    replaced = run_write(_save_boundary_zones, park_name, rows, replace)
+    return {"zones": len(rows), "skipped": skipped, "replaced": replaced}
+
+
+def _save_boundary_zones(park_name: str, rows: list[dict], replace: bool) -> int:
+    """保存边界面（写入线程中执行），返回删除的旧面数"""
+    replaced = 0
+    if replace:
+        replaced = BoundaryZone.query.filter_by(park_name=park_name).delete(
+            synchronize_session=False
+        )
+    db.session.add_all(BoundaryZone(**row) for row in rows)
+    return replaced
+
+
+# ==================== 批量判定 ====================
+
+
+def reclassify_tubans(
+    apply: bool = False,
+    park_name: str | None = None,
+    progress: Callable[..., None] | None = None,
+) -> dict:
+    """
+    按边界面批量判定全部图斑的功能区
+
+    Args:
+        apply: 把不一致的功能区写回图斑
+        park_name: 只检查该公园的图斑
+        progress: 判定和写回后调用 progress(processed=, total=, counts=)
+
+    Returns:
+        {"checked", "matched", "mismatched", "outside", "no_layer", "updated",
+         "mismatches": [前 MAX_REPORTED_MISMATCHES 条不一致/不在功能区内的图斑]}
+        outside 为所属公园有边界图层、但坐标不在任何功能区内的图斑数
+    """
+    import numpy as np
+
+    index = get_zone_index()
+    if index is None:
+        raise ValueError("尚未上传功能区边界图层")
+
+    query = db.session.query(
+        Tuban.id,
+        Tuban.tuban_code,
+        Tuban.park_name,
+        Tuban.func_zone,
+        Tuban.longitude,
+        Tuban.latitude,
+    ).filter(
+        Tuban.is_deleted == 0, Tuban.longitude.isnot(None), Tuban.latitude.isnot(None)
+    )
+    if park_name:
+        query = query.filter(Tuban.park_name == park_name)
+    rows = query.all()
+
+    lons = np.fromiter((float(r.longitude) for r in rows), np.float64, len(rows))
+    lats = np.fromiter((float(r.latitude) for r in rows), np.float64, len(rows))
+    located = index.locate(lons, lats).tolist()
+
+    parks_with_layers = {zone.park_name for zone in index.zones}
+    counts = Counter(
+        {
+            "checked": len(rows),
+            "matched": 0,
+            "mismatched": 0,
+            "outside": 0,
+            "no_layer": 0,
+            "updated": 0,
+        }
+    )
+    mismatches, updates = [], []
+    for row, found in zip(rows, located):
+        detected = index.zones[found].func_zone if found >= 0 else None
+        if detected is None:
+            if row.park_name not in parks_with_layers:
+                counts["no_layer"] += 1
+                continue
+            status = "outside"
+        elif detected == (row.func_zone or "").strip():
+            counts["matched"] += 1
+            continue
+        else:
+            status = "mismatched"
+            updates.append({"id": row.id, "func_zone": detected})
+        counts[status] += 1
+        if len(mismatches) < MAX_REPORTED_MISMATCHES:
+            mismatches.append(
+                {
+                    "id": row.id,
+                    "tuban_code": row.tuban_code,
+                    "park_name": row.park_name,
+                    "func_zone": row.func_zone,
+                    "detected": detected,
+                    "status": status,
+                }
+            )
+    if progress is not None:
+        progress(processed=len(rows), total=len(rows), counts=dict(counts))
+
+    if apply and updates:
+        for start in range(0, len(updates), RECLASSIFY_UPDATE_BATCH):
+            batch = updates[start : start + RECLASSIFY_UPDATE_BATCH]
+            run_write(_update_func_zones, batch)
+            counts["updated"] += len(batch)
+            if progress is not None:
+                progress(counts=dict(counts))
+    return dict(counts, mismatches=mismatches)
+
+
+def _update_func_zones(batch: list[dict]) -> None:
+    """按主键批量更新功能区（写入线程中执行）"""
+    db.session.execute(update(Tuban), batch)
+
+
+def zone_change_message(change: tuple[str | None, str] | None) -> str | None:
+    """assign_func_zone 改变了填写值时给用户的提示"""
+    if change is None or change[0] == change[1]:
+        return None
+    previous, detected = change
+    return f"功能区已按边界图层判定为“{detected}”（填写为“{previous or '空'}”）"
@@ -0,0 +1,269 @@
+"""
+分块断点续传模块
+
+大文件（卫片、扫描档案）按固定大小分块上传，每块单独请求并校验SHA-256，
+校验通过后按偏移写入磁盘上的预分配文件，不经过 Werkzeug 的整请求缓冲：
+    1. init：登记文件名、大小和用途，返回 upload_id、分块大小和分块数
+    2. 上传分块：PUT 原始字节，可乱序、可并发、可重传
+    3. 查询状态：返回已收到的分块序号，客户端断线后只补传缺失分块
+    4. complete：确认分块齐全（可选整体SHA-256校验），返回组装好的文件路径，
+       由调用方移动到最终位置并登记到数据库
+
+会话目录：UPLOAD_FOLDER/.chunks/<upload_id>/
+    meta.json       会话信息
+    data.part       预分配的目标文件
+    received/<序号>  已校验分块的标记（内容为分块SHA-256）
+    <序号>.<随机>.tmp 正在接收的分块（校验通过后复制到 data.part）
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+from flask import current_app
+
+CHUNKS_DIRNAME = ".chunks"
+META_FILENAME = "meta.json"
+DATA_FILENAME = "data.part"
+RECEIVED_DIRNAME = "received"
+STREAM_BLOCK_SIZE = 64 * 1024
+
+_UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ChunkUploadError(Exception):
+    """分块上传失败（消息可直接返回给前端）"""
+
+
+def _chunks_root() -> str:
+    return os.path.join(current_app.config["UPLOAD_FOLDER"], CHUNKS_DIRNAME)
+
+
+def _session_dir(upload_id: str) -> str:
+    if not upload_id or not _UPLOAD_ID_RE.match(upload_id):
+        raise ChunkUploadError("上传会话不存在")
+    path = os.path.join(_chunks_root(), upload_id)
+    if not os.path.isdir(path):
+        raise ChunkUploadError("上传会话不存在或已过期")
+    return path
+
+
+def _normalize_sha256(value: str | None) -> str | None:
+    if not value:
+        return None
+    value = value.strip().lower()
+    if not _SHA256_RE.match(value):
+        raise ChunkUploadError("SHA-256校验值格式错误")
+    return value
+
+
+def init_upload(
+    filename: str, total_size: int, metadata: dict, file_sha256: str | None = None
+) -> dict:
+    """
+    创建上传会话
+
+    Args:
+        filename: 已清洗的原始文件名
+        total_size: 文件总字节数
+        metadata: 调用方自定义信息（用途、关联图斑等），complete 时原样返回
+        file_sha256: 整个文件的SHA-256（可选，complete 时校验）
+    """
+    max_size = current_app.config["CHUNK_UPLOAD_MAX_SIZE"]
+    if total_size <= 0:
+        raise ChunkUploadError("文件为空")
+    if total_size > max_size:
+        raise ChunkUploadError(f"文件大小不能超过{max_size // (1024 * 1024)}MB")
+
+    # 顺带清理过期会话，避免断点续传残留长期占用磁盘
+    cleanup_stale_uploads()
+
+    chunk_size = current_app.config["CHUNK_UPLOAD_CHUNK_SIZE"]
+    upload_id = uuid.uuid4().hex
+    session_dir = os.path.join(_chunks_root(), upload_id)
+    os.makedirs(os.path.join(session_dir, RECEIVED_DIRNAME))
+
+    # 预分配目标文件（稀疏文件），分块按偏移直接写入
+    with open(os.path.join(session_dir, DATA_FILENAME), "wb") as f:
+        f.truncate(total_size)
+
+    meta = {
+        "upload_id": upload_id,
+        "filename": filename,
+        "total_size": total_size,
+        "chunk_size": chunk_size,
+        "total_chunks": -(-total_size // chunk_size),
+        "sha256": _normalize_sha256(file_sha256),
+        "metadata": metadata,
+        "created_at": time.time(),
+    }
+    tmp_path = os.path.join(session_dir, f"{META_FILENAME}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(session_dir, META_FILENAME))
+
+    return upload_status(upload_id)
+
+
+def load_upload(upload_id: str) -> dict:
+    """读取会话信息"""
+    session_dir = _session_dir(upload_id)
+    try:
+        with open(os.path.join(session_dir, META_FILENAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise ChunkUploadError("上传会话已损坏") from e
+
+
+def _received_chunks(session_dir: str) -> list[int]:
+    with os.scandir(os.path.join(session_dir, RECEIVED_DIRNAME)) as entries:
+        return sorted(int(entry.name) for entry in entries if entry.name.isdigit())
+
+
+def upload_status(upload_id: str) -> dict:
+    """会话状态：分块信息与已收到的分块序号"""
+    meta = load_upload(upload_id)
+    return {
+        "upload_id": upload_id,
+        "filename": meta["filename"],
+        "total_size": meta["total_size"],
+        "chunk_size": meta["chunk_size"],
+        "total_chunks": meta["total_chunks"],
+        "received": _received_chunks(_session_dir(upload_id)),
+    }
+
+
+def write_chunk(upload_id: str, index: int, stream, chunk_sha256: str | None) -> int:
+    """
+    流式写入一个分块
+
+    Args:
+        stream: 请求体流（只读取该分块应有的字节数）
+        chunk_sha256: 分块SHA-256（可选；不匹配时该分块作废，需要重传）
+
+    Returns:
+        写入的字节数
+    """
+    meta = load_upload(upload_id)
+    session_dir = _session_dir(upload_id)
+    expected_sha256 = _normalize_sha256(chunk_sha256)
+
+    if index < 0 or index >= meta["total_chunks"]:
+        raise ChunkUploadError("分块序号超出范围")
+    offset = index * meta["chunk_size"]
+    expected_length = min(meta["chunk_size"], meta["total_size"] - offset)
+
+    # 重传的分块先作废旧标记：校验失败时该分块显示为未收到，需要再次重传
+    marker = os.path.join(session_dir, RECEIVED_DIRNAME, str(index))
+    try:
+        os.remove(marker)
+    except FileNotFoundError:
+        pass
+
+    # 先写入分块临时文件，校验通过后才复制到目标文件，失败的重传不会破坏已收到的数据
+    tmp_path = os.path.join(session_dir, f"{index}.{uuid.uuid4().hex}.tmp")
+    try:
+        digest = hashlib.sha256()
+        written = 0
+        with open(tmp_path, "w+b") as tmp:
+            while True:
+                # 多读1字节用于发现超长分块
+                block = stream.read(
+                    min(STREAM_BLOCK_SIZE, expected_length - written + 1)
+                )
+                if not block:
+                    break
+                written += len(block)
+                if written > expected_length:
+                    raise ChunkUploadError("分块长度不符")
+                digest.update(block)
+                tmp.write(block)
+
+            if written != expected_length:
+                raise ChunkUploadError("分块长度不符")
+            actual_sha256 = digest.hexdigest()
+            if expected_sha256 and actual_sha256 != expected_sha256:
+                raise ChunkUploadError("分块校验失败")
+
+            tmp.seek(0)
+            with open(os.path.join(session_dir, DATA_FILENAME), "r+b") as f:
+                f.seek(offset)
+                shutil.copyfileobj(tmp, f, STREAM_BLOCK_SIZE)
+    finally:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write(actual_sha256)
+    return written
+
+
+def complete_upload(upload_id: str) -> tuple[str, dict]:
+    """
+    确认分块齐全并校验整体SHA-256
+
+    Returns:
+        (组装好的文件路径, 会话信息)；调用方移动文件后应调用 discard_upload
+    """
+    meta = load_upload(upload_id)
+    session_dir = _session_dir(upload_id)
+
+    missing = meta["total_chunks"] - len(_received_chunks(session_dir))
+    if missing > 0:
+        raise ChunkUploadError(f"还有{missing}个分块未上传")
+
+    data_path = os.path.join(session_dir, DATA_FILENAME)
+    if meta.get("sha256"):
+        digest = hashlib.sha256()
+        with open(data_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        if digest.hexdigest() != meta["sha256"]:
+            raise ChunkUploadError("文件校验失败，请重新上传")
+    return data_path, meta
+
+
+def discard_upload(upload_id: str) -> None:
+    """删除上传会话"""
+    try:
+        session_dir = _session_dir(upload_id)
+    except ChunkUploadError:
+        return
+    shutil.rmtree(session_dir, ignore_errors=True)
+
+
+def cleanup_stale_uploads(max_age_seconds: float | None = None) -> int:
+    """删除超过有效期的上传会话，返回删除数量"""
+    root = _chunks_root()
+    if not os.path.isdir(root):
+        return 0
+    if max_age_seconds is None:
+        max_age_seconds = current_app.config["CHUNK_UPLOAD_EXPIRE_HOURS"] * 3600
+    cutoff = time.time() - max_age_seconds
+
+    removed = 0
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if not entry.is_dir() or not _UPLOAD_ID_RE.match(entry.name):
+                continue
+            try:
+                # 以最近收到分块的时间为准，正在续传的会话不会被清理
+                last_active = max(
+                    entry.stat().st_mtime,
+                    os.stat(os.path.join(entry.path, RECEIVED_DIRNAME)).st_mtime,
+                )
+            except OSError:
+                last_active = 0
+            if last_active < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+    return removed
@@ -0,0 +1,188 @@
+"""
+内容寻址缓存模块
+
+以SHA-256为键缓存文档提取文本和AI摘要，持久化到 content_cache 表，
+总大小超过 CONTENT_CACHE_MAX_BYTES 时按最近访问时间淘汰。
+重复上传的文档无需再次解析/OCR，相同内容的摘要无需再次调用智谱AI。
+
+缓存读取使用独立连接；写入不阻塞调用方，SQLite下经写入队列串行执行，
+不影响调用方会话中尚未提交的数据。
+"""
+
+import hashlib
+import re
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import func, select
+
+from models import db
+from models.content_cache import ContentCache
+from utils.write_queue import submit_write
+
+CACHE_TYPE_EXTRACT = "extract"
+CACHE_TYPE_SUMMARY = "summary"
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_table = ContentCache.__table__
+
+
+def sha256_text(text: str) -> str:
+    """计算文本的SHA-256"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def sha256_file_storage(file_storage) -> str:
+    """分块计算上传文件内容的SHA-256（不改变文件指针位置）"""
+    digest = hashlib.sha256()
+    original_position = file_storage.tell()
+    file_storage.seek(0)
+    try:
+        while True:
+            chunk = file_storage.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    finally:
+        file_storage.seek(original_position)
+    return digest.hexdigest()
+
+
+def normalize_prompt(prompt: str) -> str:
+    """规范化提示词：去除首尾空白，合并连续空白"""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def summary_cache_key(prompt: str, model: str, max_tokens: int) -> str:
+    """摘要缓存键：模型 + 参数 + 规范化提示词"""
+    return sha256_text(f"{model}\n{max_tokens}\n{normalize_prompt(prompt)}")
+
+
+def is_cache_enabled() -> bool:
+    return has_app_context() and current_app.config.get("CONTENT_CACHE_ENABLED", True)
+
+
+def _run_cache_write(func, *args) -> None:
+    """
+    执行缓存写入（不阻塞调用方）
+
+    启用写入队列时交给写入线程异步执行，避免多个线程同时写SQLite互相锁冲突；
+    否则在独立的短事务中执行，不影响调用方会话。
+    """
+    app = current_app._get_current_object()
+    if app.config.get("WRITE_QUEUE_ENABLED"):
+        future = submit_write(_with_session_connection, func, *args)
+        future.add_done_callback(_report_write_error)
+        return
+
+    try:
+        with db.engine.begin() as conn:
+            func(conn, *args)
+    except Exception as e:
+        print(f"缓存写入失败: {e}")
+
+
+def _with_session_connection(func, *args):
+    return func(db.session.connection(), *args)
+
+
+def _report_write_error(future) -> None:
+    error = future.exception()
+    if error is not None:
+        print(f"缓存写入失败: {error}")
+
+
+def get_cached_content(cache_type: str, cache_key: str) -> str | None:
+    """读取缓存，命中时异步更新访问时间"""
+    if not is_cache_enabled():
+        return None
+
+    try:
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                select(_table.c.id, _table.c.content).where(
+                    _table.c.cache_type == cache_type, _table.c.cache_key == cache_key
+                )
+            ).first()
+    except Exception as e:
+        print(f"缓存读取失败: {e}")
+        return None
+
+    if row is None:
+        return None
+    _run_cache_write(_touch_entry, row.id, datetime.now())
+    return row.content
+
+
+def set_cached_content(cache_type: str, cache_key: str, content: str) -> None:
+    """异步写入缓存并执行容量淘汰"""
+    if not is_cache_enabled() or not content:
+        return
+
+    _run_cache_write(
+        _store_entry,
+        cache_type,
+        cache_key,
+        content,
+        datetime.now(),
+        current_app.config.get("CONTENT_CACHE_MAX_BYTES", 0),
+    )
+
+
+def _touch_entry(conn, entry_id: int, accessed_at: datetime) -> None:
+    conn.execute(
+        _table.update()
+        .where(_table.c.id == entry_id)
+        .values(hit_count=_table.c.hit_count + 1, last_accessed_at=accessed_at)
+    )
+
+
+def _store_entry(
+    conn, cache_type: str, cache_key: str, content: str, now: datetime, max_bytes: int
+) -> None:
+    exists = conn.execute(
+        select(_table.c.id).where(
+            _table.c.cache_type == cache_type, _table.c.cache_key == cache_key
+        )
+    ).first()
+    if exists is not None:
+        return
+    conn.execute(
+        _table.insert().values(
+            cache_type=cache_type,
+            cache_key=cache_key,
+            content=content,
+            content_size=len(content.encode("utf-8")),
+            hit_count=0,
+            created_at=now,
+            last_accessed_at=now,
+        )
+    )
+    _evict(conn, max_bytes)
+
+
+def _evict(conn, max_bytes: int) -> None:
+    """总大小超限时删除最久未访问的条目"""
+    if not max_bytes:
+        return
+    total = conn.execute(select(func.coalesce(func.sum(_table.c.content_size), 0)))
+    excess = total.scalar() - max_bytes
+    if excess <= 0:
+        return
+
+    evict_ids = []
+    rows = conn.execute(
+        select(_table.c.id, _table.c.content_size).order_by(
+            _table.c.last_accessed_at, _table.c.id
+        )
+    )
+    for row in rows:
+        evict_ids.append(row.id)
+        excess -= row.content_size or 0
+        if excess <= 0:
+            break
+    rows.close()
+
+    if evict_ids:
+        conn.execute(_table.delete().where(_table.c.id.in_(evict_ids)))
@@ -0,0 +1,70 @@
+"""
+数据库方言兼容模块
+
+统一SQLite与PostgreSQL在日期分组、不区分大小写模糊匹配、冲突时忽略的插入上的写法，
+使 DATABASE_URL 切换到服务器数据库时业务查询无需修改。
+"""
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import String
+
+
+class month_bucket(FunctionElement):
+    """按月分组表达式，结果为 'YYYY-MM' 字符串"""
+
+    type = String()
+    name = "month_bucket"
+    inherit_cache = True
+
+
+@compiles(month_bucket)
+def _month_bucket_default(element, compiler, **kw):
+    return "strftime('%%Y-%%m', %s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(month_bucket, "postgresql")
+def _month_bucket_postgresql(element, compiler, **kw):
+    return "to_char(%s, 'YYYY-MM')" % compiler.process(element.clauses, **kw)
+
+
+@compiles(month_bucket, "mysql")
+def _month_bucket_mysql(element, compiler, **kw):
+    return "DATE_FORMAT(%s, '%%%%Y-%%%%m')" % compiler.process(element.clauses, **kw)
+
+
+def escape_like(value: str, escape_char: str = "\\") -> str:
+    """转义LIKE通配符"""
+    return (
+        value.replace(escape_char, escape_char * 2)
+        .replace("%", escape_char + "%")
+        .replace("_", escape_char + "_")
+    )
+
+
+def icontains(column, keyword: str):
+    """
+    不区分大小写的包含匹配
+
+    SQLite编译为 lower(x) LIKE lower(y)，PostgreSQL编译为 ILIKE。
+    """
+    return column.ilike(f"%{escape_like(keyword)}%", escape="\\")
+
+
+def insert_ignore(table, dialect_name: str, **values):
+    """
+    插入一行，唯一约束冲突时忽略（不抛出 IntegrityError，不中断所在事务）
+
+    SQLite/PostgreSQL编译为 ON CONFLICT DO NOTHING，MySQL编译为 INSERT IGNORE。
+    """
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+
+        return insert(table).values(**values).on_conflict_do_nothing()
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+
+        return insert(table).values(**values).on_conflict_do_nothing()
+    if dialect_name == "mysql":
+        return table.insert().values(**values).prefix_with("IGNORE")
+    raise ValueError(f"不支持的数据库: {dialect_name}")
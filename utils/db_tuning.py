@@ -0,0 +1,125 @@
+"""
+数据库调优模块
+
+根据数据库类型生成连接池参数，并为SQLite连接设置生产环境PRAGMA
+（WAL、synchronous、mmap、cache、temp_store、busy_timeout）。
+"""
+
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+# 线程级事务模式：写入线程使用 BEGIN IMMEDIATE 预先获取写锁
+_transaction_mode = threading.local()
+
+
+def is_sqlite_uri(uri: str) -> bool:
+    """判断是否为SQLite数据库"""
+    return make_url(uri).get_backend_name() == "sqlite"
+
+
+def is_sqlite_memory_uri(uri: str) -> bool:
+    """判断是否为SQLite内存数据库"""
+    url = make_url(uri)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def get_engine_options(config) -> dict:
+    """
+    生成 SQLALCHEMY_ENGINE_OPTIONS
+
+    SQLite文件库使用连接池复用已完成PRAGMA设置的连接；
+    服务器数据库使用同等的连接池参数并开启连接预检。
+    """
+    uri = config["SQLALCHEMY_DATABASE_URI"]
+
+    if is_sqlite_memory_uri(uri):
+        # 内存库由SQLAlchemy使用单连接池，不做调整
+        return {}
+
+    pool_options = {
+        "pool_size": config.get("DB_POOL_SIZE", 10),
+        "max_overflow": config.get("DB_MAX_OVERFLOW", 20),
+        "pool_timeout": config.get("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": config.get("DB_POOL_RECYCLE", 1800),
+    }
+
+    if is_sqlite_uri(uri):
+        busy_timeout_ms = config.get("SQLITE_BUSY_TIMEOUT_MS", 5000)
+        return {
+            **pool_options,
+            # 本地文件无需预检；连接可能被不同请求线程复用
+            "pool_pre_ping": False,
+            "connect_args": {
+                "check_same_thread": False,
+                "timeout": busy_timeout_ms / 1000,
+            },
+        }
+
+    return {**pool_options, "pool_pre_ping": True}
+
+
+def get_sqlite_pragmas(config) -> list[tuple[str, object]]:
+    """获取需要在每个SQLite连接上执行的PRAGMA列表"""
+    return [
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("mmap_size", config.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        # 负数表示以KiB为单位
+        ("cache_size", -int(config.get("SQLITE_CACHE_SIZE_KB", 64 * 1024))),
+        ("temp_store", "MEMORY"),
+        ("busy_timeout", config.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    ]
+
+
+def register_sqlite_pragmas(engine: Engine, config) -> None:
+    """为SQLite引擎注册连接事件，在每个新连接上执行PRAGMA"""
+    if engine.dialect.name != "sqlite":
+        return
+    if is_sqlite_memory_uri(str(engine.url)):
+        # 内存库不支持WAL
+        return
+
+    pragmas = get_sqlite_pragmas(config)
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _do_begin(conn):
+        dbapi_connection = conn.connection.dbapi_connection
+        if getattr(_transaction_mode, "immediate", False):
+            # 写入线程：关闭pysqlite的隐式事务管理，显式 BEGIN IMMEDIATE 预先
+            # 获取写锁，并使SAVEPOINT（begin_nested）能够正常工作
+            dbapi_connection.isolation_level = None
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            # 其他线程（连接在池中复用，需恢复）：保持pysqlite默认的隐式事务，
+            # 读操作不开启事务，首条写语句前才 BEGIN，获取写锁时按 busy_timeout
+            # 等待，而不是在已读数据的事务中升级写锁失败（SQLITE_BUSY）
+            dbapi_connection.isolation_level = ""
+
+
+def set_immediate_transactions(enabled: bool) -> None:
+    """设置当前线程的SQLite事务是否以 BEGIN IMMEDIATE 开启"""
+    _transaction_mode.immediate = enabled
+
+
+def init_db_tuning(app, db) -> None:
+    """初始化数据库调优（需在 db.init_app 之前配置连接池参数）"""
+    app.config.setdefault(
+        "SQLALCHEMY_ENGINE_OPTIONS", get_engine_options(app.config)
+    )
+    db.init_app(app)
+
+    with app.app_context():
+        # 主库及所有绑定（如只读副本）
+        for engine in db.engines.values():
+            register_sqlite_pragmas(engine, app.config)
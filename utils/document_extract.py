@@ -2,17 +2,37 @@
 文档文本提取工具模块
 
 支持PDF、Word、TXT、Markdown等格式的文本提取。
+PyMuPDF、python-docx 在首次解析对应格式时才导入，避免拖慢应用启动。
+
+PDF只打开一次并逐页提取（生成器），大文件以文件方式打开而不整体读入内存；
+扫描件判断只采样前 PDF_SAMPLE_PAGES 页。
 """
 
 import os
-import fitz  # PyMuPDF
-from docx import Document
-from io import BytesIO
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+from config import Config
+from utils.content_cache import (
+    CACHE_TYPE_EXTRACT,
+    get_cached_content,
+    set_cached_content,
+    sha256_file_storage,
+)
+
+COPY_CHUNK_SIZE = 1024 * 1024
 
 
-def extract_text_from_file(file_path: str) -> str | None:
-    """根据文件类型提取文本（本地文件路径）"""
-    ext = os.path.splitext(file_path)[1].lower()
+def extract_text_from_file(file_path: str, filename: str | None = None) -> str | None:
+    """
+    根据文件类型提取文本（本地文件路径）
+
+    Args:
+        filename: 用于判断类型的文件名（内容寻址存储的文件路径没有扩展名）
+    """
+    ext = os.path.splitext(filename or file_path)[1].lower()
 
     if ext == ".pdf":
         return extract_from_pdf(file_path)
@@ -24,15 +44,98 @@ def extract_text_from_file(file_path: str) -> str | None:
         return None
 
 
+def open_pdf(file_path: str):
+    """打开本地PDF文件"""
+    import fitz  # PyMuPDF
+
+    return fitz.open(file_path)
+
+
+def _upload_file_path(file_storage) -> str | None:
+    """上传文件已落盘时返回其路径（无需复制）"""
+    name = getattr(getattr(file_storage, "stream", None), "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    return None
+
+
+@contextmanager
+def open_pdf_upload(file_storage):
+    """
+    打开上传的PDF（只打开一次，用完自动关闭并恢复文件指针）
+
+    小文件直接从内存打开；超过 PDF_MEMORY_LIMIT 的文件复制到临时文件后
+    按路径打开，PyMuPDF按需读取页面，避免整个文件常驻内存。
+    """
+    import fitz  # PyMuPDF
+
+    original_position = file_storage.tell()
+    temp_path = None
+    try:
+        path = _upload_file_path(file_storage)
+        if path is None:
+            file_storage.seek(0, os.SEEK_END)
+            size = file_storage.tell()
+            file_storage.seek(0)
+            if size <= Config.PDF_MEMORY_LIMIT:
+                doc = fitz.open(stream=file_storage.read(), filetype="pdf")
+            else:
+                fd, temp_path = tempfile.mkstemp(suffix=".pdf")
+                with os.fdopen(fd, "wb") as out:
+                    shutil.copyfileobj(file_storage.stream, out, COPY_CHUNK_SIZE)
+                doc = fitz.open(temp_path)
+        else:
+            doc = fitz.open(path)
+
+        try:
+            yield doc
+        finally:
+            doc.close()
+    finally:
+        file_storage.seek(original_position)
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def iter_pdf_pages(
+    doc, page_numbers: Iterable[int] | None = None
+) -> Iterator[tuple[int, str]]:
+    """逐页提取文本，生成 (页码, 文本)"""
+    if page_numbers is None:
+        page_numbers = range(doc.page_count)
+    for page_num in page_numbers:
+        yield page_num, doc.load_page(page_num).get_text()
+
+
+def page_needs_ocr(text: str) -> bool:
+    """页面可提取文字过少时认为是扫描页"""
+    return len(text.strip()) < Config.PDF_MIN_PAGE_CHARS
+
+
+def is_scanned_document(doc, sample_pages: int | None = None) -> bool:
+    """采样前N页判断是否为扫描件（采样页平均文字数低于阈值）"""
+    if sample_pages is None:
+        sample_pages = Config.PDF_SAMPLE_PAGES
+    sampled = range(min(doc.page_count, max(1, sample_pages)))
+    if not sampled:
+        return True
+    total_chars = sum(len(text.strip()) for _, text in iter_pdf_pages(doc, sampled))
+    return total_chars / len(sampled) < Config.PDF_MIN_PAGE_CHARS
+
+
+def extract_pdf_document_text(doc) -> str:
+    """逐页提取整个PDF文档的文本"""
+    return "".join(text for _, text in iter_pdf_pages(doc)).strip()
+
+
 def extract_from_pdf(file_path: str) -> str | None:
     """从PDF提取文本（本地文件）"""
     try:
-        text_parts = []
-        doc = fitz.open(file_path)
-        for page in doc:
-            text_parts.append(page.get_text())
-        doc.close()
-        return "".join(map(str, text_parts)).strip()
+        doc = open_pdf(file_path)
+        try:
+            return extract_pdf_document_text(doc)
+        finally:
+            doc.close()
     except Exception as e:
         print(f"PDF解析失败: {e}")
         return None
@@ -41,6 +144,8 @@ def extract_from_pdf(file_path: str) -> str | None:
 def extract_from_word(file_path: str) -> str | None:
     """从Word文档提取文本（本地文件）"""
     try:
+        from docx import Document
+
         doc = Document(file_path)
         text = "\n".join([para.text for para in doc.paragraphs])
         # 提取表格内容
@@ -91,34 +196,39 @@ def extract_from_upload(file_storage) -> str | None:
         return None
 
 
+def extract_from_upload_cached(file_storage) -> str | None:
+    """
+    从上传的文件对象提取文本（按文件内容SHA-256缓存）
+
+    同一文件重复上传时直接返回缓存的提取结果，跳过解析/OCR。
+    """
+    cache_key = sha256_file_storage(file_storage)
+    cached = get_cached_content(CACHE_TYPE_EXTRACT, cache_key)
+    if cached is not None:
+        return cached
+
+    file_storage.seek(0)
+    text = extract_from_upload(file_storage)
+    if text:
+        set_cached_content(CACHE_TYPE_EXTRACT, cache_key, text)
+    return text
+
+
 def extract_from_pdf_memory(file_storage) -> str | None:
-    """从内存PDF提取文本"""
+    """从上传的PDF提取文本（逐页提取）"""
     try:
-        # 保存原始位置
-        original_position = file_storage.tell()
-        file_storage.seek(0)
-        content = file_storage.read()
-        file_storage.seek(original_position)  # 恢复原始位置
-
-        text_parts = []
-        doc = fitz.open(stream=content, filetype="pdf")
-        for page in doc:
-            text_parts.append(page.get_text())
-        doc.close()
-        return "".join(map(str, text_parts)).strip()
+        with open_pdf_upload(file_storage) as doc:
+            return extract_pdf_document_text(doc)
     except Exception as e:
         print(f"PDF解析失败: {e}")
-        # 尝试恢复指针
-        try:
-            file_storage.seek(0)
-        except:
-            pass
         return None
 
 
 def extract_from_word_memory(file_storage) -> str | None:
     """从内存Word文档提取文本"""
     try:
+        from docx import Document
+
         original_position = file_storage.tell()
         file_storage.seek(0)
         doc = Document(file_storage)
@@ -156,21 +266,10 @@ def count_text_words(text: str) -> int:
 
 
 def is_scanned_pdf(file_storage) -> bool:
-    """判断PDF是否为扫描件（通过检测是否有可提取文本）"""
+    """判断PDF是否为扫描件（只采样前几页的可提取文本）"""
     try:
-        file_storage.seek(0)
-        content = file_storage.read()
-        file_storage.seek(0)
-
-        doc = fitz.open(stream=content, filetype="pdf")
-        text_parts = []
-        for page in doc:
-            text_parts.append(page.get_text())
-        doc.close()
-
-        text = "".join(map(str, text_parts))
-        # 如果提取的文本很少，可能是扫描件
-        return len(text.strip()) < 50
+        with open_pdf_upload(file_storage) as doc:
+            return is_scanned_document(doc)
     except Exception:
         return True
 
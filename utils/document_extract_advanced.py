@@ -3,40 +3,64 @@
 
 支持OCR识别扫描件PDF和图片中的文字。
 需要安装: pip install paddlepaddle paddleocr
+
+PyMuPDF、PaddleOCR 在首次使用时才导入；OCR_WARMUP=1 时应用启动后在后台线程
+预加载OCR模型，避免第一次识别时长时间等待。
 """
 
+import atexit
+import multiprocessing
 import os
 import tempfile
+import threading
 import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from typing import Optional
 
-# 尝试导入，失败时提供友好的错误信息
-try:
-    import fitz
-except ImportError:
-    fitz = None
-    print("提示: 请安装 PyMuPDF: pip install pymupdf")
-
-try:
-    from paddleocr import PaddleOCR
-except ImportError:
-    PaddleOCR = None
-    print("提示: 请安装 PaddleOCR: pip install paddlepaddle paddleocr")
+from config import Config
+from utils.document_extract import (
+    iter_pdf_pages,
+    open_pdf,
+    open_pdf_upload,
+    page_needs_ocr,
+)
 
 
 # OCR缓存（避免重复初始化）
 _ocr_cache = None
+# 整页OCR进程池（每个工作进程持有一个OCR模型）
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
 OCR_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "ocr_cache")
 TEMP_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "temp")
 
 
-def get_ocr():
-    """单例获取PaddleOCR对象"""
-    global _ocr_cache
-    if PaddleOCR is None:
-        raise ImportError("PaddleOCR未安装，请运行: pip install paddlepaddle paddleocr")
+def _import_fitz():
+    """延迟导入PyMuPDF，未安装时给出友好的错误信息"""
+    try:
+        import fitz
+    except ImportError as e:
+        raise ImportError("PyMuPDF未安装，请运行: pip install pymupdf") from e
+    return fitz
+
 
+def _import_paddle_ocr():
+    """延迟导入PaddleOCR（导入paddle本身就需要数秒）"""
+    try:
+        from paddleocr import PaddleOCR
+    except ImportError as e:
+        raise ImportError(
+            "PaddleOCR未安装，请运行: pip install paddlepaddle paddleocr"
+        ) from e
+    return PaddleOCR
+
+
+def get_ocr(**kwargs):
+    """单例获取PaddleOCR对象（kwargs仅在首次创建时生效）"""
+    global _ocr_cache
     if _ocr_cache is None:
+        PaddleOCR = _import_paddle_ocr()
         # 确保缓存目录存在
         os.makedirs(OCR_CACHE_DIR, exist_ok=True)
         _ocr_cache = PaddleOCR(
@@ -45,10 +69,85 @@ def get_ocr():
             rec_model_dir=os.path.join(OCR_CACHE_DIR, "rec_model"),
             det_model_dir=os.path.join(OCR_CACHE_DIR, "det_model"),
             cls_model_dir=os.path.join(OCR_CACHE_DIR, "cls_model"),
+            **kwargs,
         )
     return _ocr_cache
 
 
+def get_ocr_workers() -> int:
+    """整页OCR工作进程数（0或1表示在当前进程内串行识别）"""
+    if Config.OCR_WORKERS > 0:
+        return Config.OCR_WORKERS
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def _init_ocr_worker(cpu_threads: int) -> None:
+    """工作进程初始化：加载本进程的OCR模型"""
+    get_ocr(cpu_threads=cpu_threads)
+
+
+def _ocr_page_image(page_num: int, png_bytes: bytes) -> tuple[int, list[str]]:
+    """识别单页图片（PNG字节），返回 (页码, 文本行)"""
+    result = get_ocr().ocr(png_bytes, cls=True)
+    lines = []
+    if result and result[0]:
+        for line in result[0]:
+            if line and len(line) >= 2:
+                lines.append(line[1][0])
+    return page_num, lines
+
+
+def _get_ocr_pool(workers: int) -> ProcessPoolExecutor:
+    """获取整页OCR进程池（进程内单例，模型只在工作进程启动时加载一次）"""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+            # spawn：避免在多线程的Web进程中fork
+            _ocr_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_ocr_worker,
+                initargs=(cpu_threads,),
+            )
+            atexit.register(shutdown_ocr_pool)
+        return _ocr_pool
+
+
+def _warmup_noop() -> None:
+    """空任务：促使进程池启动工作进程并加载模型"""
+
+
+def warmup_ocr() -> None:
+    """预加载OCR模型（当前进程及OCR进程池的全部工作进程）"""
+    try:
+        workers = get_ocr_workers()
+        if workers <= 1:
+            get_ocr()
+        else:
+            pool = _get_ocr_pool(workers)
+            wait([pool.submit(_warmup_noop) for _ in range(workers)])
+        print("OCR模型预加载完成")
+    except Exception as e:
+        print(f"OCR模型预加载失败: {e}")
+
+
+def start_ocr_warmup() -> threading.Thread:
+    """在后台线程中预加载OCR模型，不阻塞应用启动"""
+    thread = threading.Thread(target=warmup_ocr, name="ocr-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def shutdown_ocr_pool() -> None:
+    """关闭整页OCR进程池"""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is not None:
+            _ocr_pool.shutdown(wait=False, cancel_futures=True)
+            _ocr_pool = None
+
+
 def cleanup_temp_file(file_path: str):
     """清理临时文件"""
     try:
@@ -69,8 +168,7 @@ def save_temp_file(file_storage, suffix: str = "") -> str:
 
 def extract_text_with_ocr(image_path: str) -> str | None:
     """使用PaddleOCR从图片提取文字"""
-    if PaddleOCR is None:
-        raise ImportError("PaddleOCR未安装")
+    _import_paddle_ocr()
 
     try:
         ocr = get_ocr()
@@ -102,88 +200,204 @@ def extract_text_from_image(image_path: str) -> str | None:
     return extract_text_with_ocr(image_path)
 
 
-def extract_text_from_pdf_with_ocr(pdf_path: str) -> str | None:
-    """PDF转图片后OCR识别（扫描件PDF专用）"""
-    if fitz is None:
-        raise ImportError("PyMuPDF未安装，请运行: pip install pymupdf")
+def _render_page_png(doc, page_num: int) -> bytes:
+    """将PDF页面渲染为PNG字节（2倍分辨率）"""
+    page = doc.load_page(page_num)
+    pix = page.get_pixmap(matrix=_import_fitz().Matrix(2, 2))  # 提高分辨率
+    return pix.tobytes("png")
+
+
+def ocr_pdf_pages(
+    doc, page_numbers: list[int], cancel_event: threading.Event | None = None
+) -> dict[int, list[str]] | None:
+    """
+    OCR识别已打开PDF的指定页面
+
+    页面在内存中渲染为PNG后交给OCR进程池并行识别，同时在途的页面数有上限
+    （OCR_MAX_IN_FLIGHT）。
+
+    Returns:
+        {页码: 文本行}，被取消返回None
+    """
+    _import_paddle_ocr()
+    workers = get_ocr_workers()
+    if workers <= 1 or len(page_numbers) <= 1:
+        return _ocr_pages_serial(doc, page_numbers, cancel_event)
+    return _ocr_pages_parallel(doc, page_numbers, workers, cancel_event)
+
+
+def extract_text_from_pdf_with_ocr(
+    pdf_path: str,
+    max_pages: int | None = None,
+    cancel_event: threading.Event | None = None,
+) -> str | None:
+    """
+    PDF转图片后OCR识别（扫描件PDF专用），结果按页码顺序拼接
+
+    Args:
+        pdf_path: PDF文件路径
+        max_pages: 最多识别的页数，默认 OCR_MAX_PAGES
+        cancel_event: 置位后停止提交新页面并取消未开始的页面
+
+    Returns:
+        识别文本，失败或被取消返回None
+    """
+    _import_paddle_ocr()
+    if max_pages is None:
+        max_pages = Config.OCR_MAX_PAGES
 
     try:
-        ocr = get_ocr()
+        doc = open_pdf(pdf_path)
+        try:
+            page_count = doc.page_count
+            if max_pages and page_count > max_pages:
+                print(f"PDF共{page_count}页，仅识别前{max_pages}页")
+                page_count = max_pages
+            page_numbers = list(range(page_count))
+            page_lines = ocr_pdf_pages(doc, page_numbers, cancel_event)
+        finally:
+            doc.close()
+
+        if page_lines is None:
+            print("PDF OCR识别已取消")
+            return None
 
         text_lines = []
-        doc = fitz.open(pdf_path)
-        temp_images = []
-        page_count = int(getattr(doc, "page_count", 0))
-
-        for page_num in range(page_count):
-            page = doc.load_page(page_num)
-            # 将PDF页面转为图片
-            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 提高分辨率
-            img_filename = f"ocr_page_{page_num}_{uuid.uuid4().hex}.png"
-            img_path = os.path.join(TEMP_DIR, img_filename)
-            pix.save(img_path)
-            temp_images.append(img_path)
-
-            # OCR识别
-            result = ocr.ocr(img_path, cls=True)
-            if result and result[0]:
-                for line in result[0]:
-                    if line and len(line) >= 2:
-                        text_lines.append(line[1][0])
-
-        doc.close()
-
-        # 清理临时图片
-        for img_path in temp_images:
-            cleanup_temp_file(img_path)
-
+        for page_num in page_numbers:
+            text_lines.extend(page_lines.get(page_num, []))
         return "\n".join(map(str, text_lines)).strip()
     except Exception as e:
         print(f"PDF OCR识别失败: {e}")
         return None
 
 
-def smart_extract_from_pdf(pdf_path: str) -> dict[str, object]:
+def _ocr_pages_serial(doc, page_numbers, cancel_event) -> dict[int, list[str]] | None:
+    """在当前进程内逐页识别"""
+    get_ocr()
+    page_lines = {}
+    for page_num in page_numbers:
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        _, lines = _ocr_page_image(page_num, _render_page_png(doc, page_num))
+        page_lines[page_num] = lines
+    return page_lines
+
+
+def _ocr_pages_parallel(
+    doc, page_numbers, workers, cancel_event
+) -> dict[int, list[str]] | None:
+    """渲染页面并提交到OCR进程池，限制在途页面数"""
+    pool = _get_ocr_pool(workers)
+    max_in_flight = max(workers, Config.OCR_MAX_IN_FLIGHT)
+    page_lines: dict[int, list[str]] = {}
+    pending = set()
+
+    def _collect(done):
+        for future in done:
+            page_num, lines = future.result()
+            page_lines[page_num] = lines
+
+    try:
+        for page_num in page_numbers:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(done)
+            pending.add(
+                pool.submit(_ocr_page_image, page_num, _render_page_png(doc, page_num))
+            )
+
+        while pending:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+            _collect(done)
+        return page_lines
+    except BrokenProcessPool:
+        # 工作进程异常退出，丢弃进程池，下次调用时重建
+        shutdown_ocr_pool()
+        raise
+    finally:
+        # 取消或出错时丢弃本文档尚未开始的页面
+        for future in pending:
+            future.cancel()
+
+
+def smart_extract_from_document(
+    doc, cancel_event: threading.Event | None = None
+) -> dict[str, object]:
     """
-    智能PDF提取：自动判断是否需要OCR
+    智能提取已打开的PDF：逐页提取文本，文字过少的页面再OCR
+
+    文档只解析一次；文字型页面与扫描页面混排时只OCR扫描页，
+    最多OCR OCR_MAX_PAGES 页。
 
     Returns:
         {
-            'text': str,  # 提取的文本
-            'method': str,  # 'text' 或 'ocr'
-            'is_scanned': bool  # 是否为扫描件
+            'text': str,  # 提取的文本（按页码顺序）
+            'method': str,  # 'text' / 'ocr' / 'mixed' / 'failed'
+            'is_scanned': bool  # 前 PDF_SAMPLE_PAGES 页是否为扫描件
         }
     """
-    if fitz is None:
-        raise ImportError("PyMuPDF未安装")
+    page_texts: list[str] = []
+    ocr_candidates: list[int] = []
+    sample_chars = 0
+    sample_count = 0
+    for page_num, text in iter_pdf_pages(doc):
+        page_texts.append(text)
+        if page_num < Config.PDF_SAMPLE_PAGES:
+            sample_chars += len(text.strip())
+            sample_count += 1
+        if page_needs_ocr(text):
+            ocr_candidates.append(page_num)
+
+    is_scanned = (
+        not sample_count or sample_chars / sample_count < Config.PDF_MIN_PAGE_CHARS
+    )
+
+    page_lines: dict[int, list[str]] = {}
+    if ocr_candidates:
+        if Config.OCR_MAX_PAGES and len(ocr_candidates) > Config.OCR_MAX_PAGES:
+            print(f"扫描页共{len(ocr_candidates)}页，仅识别前{Config.OCR_MAX_PAGES}页")
+            ocr_candidates = ocr_candidates[: Config.OCR_MAX_PAGES]
+        print(f"检测到{len(ocr_candidates)}个扫描页，使用OCR识别...")
+        try:
+            page_lines = ocr_pdf_pages(doc, ocr_candidates, cancel_event) or {}
+        except Exception as e:
+            print(f"PDF OCR识别失败: {e}")
+
+    parts = []
+    for page_num, text in enumerate(page_texts):
+        lines = page_lines.get(page_num)
+        parts.append("\n".join(map(str, lines)) + "\n" if lines else text)
+    full_text = "".join(parts).strip()
+
+    ocr_pages = sum(1 for lines in page_lines.values() if lines)
+    if not full_text:
+        method = "failed"
+    elif not ocr_pages:
+        method = "text"
+    elif ocr_pages == len(page_texts):
+        method = "ocr"
+    else:
+        method = "mixed"
+    return {"text": full_text or None, "method": method, "is_scanned": is_scanned}
 
-    try:
-        # 1. 先尝试直接提取文本（针对文字型PDF）
-        doc = fitz.open(pdf_path)
-        text_parts = []
-        for page in doc:
-            text_parts.append(page.get_text())
-        doc.close()
-        text = "".join(map(str, text_parts))
-
-        # 判断是否为扫描件：如果提取的文本少于50字符，认为是扫描件
-        if len(text.strip()) > 50:
-            return {"text": text.strip(), "method": "text", "is_scanned": False}
-
-        # 2. 扫描件PDF，使用OCR
-        print("检测到扫描件PDF，使用OCR识别...")
-        ocr_text = extract_text_from_pdf_with_ocr(pdf_path)
-
-        if ocr_text:
-            return {"text": ocr_text, "method": "ocr", "is_scanned": True}
-
-        # OCR也失败了
-        return {
-            "text": text.strip(),
-            "method": "text" if text.strip() else "failed",
-            "is_scanned": True,
-        }
 
+def smart_extract_from_pdf(pdf_path: str) -> dict[str, object]:
+    """
+    智能PDF提取：自动判断是否需要OCR
+
+    Returns:
+        见 smart_extract_from_document
+    """
+    try:
+        doc = open_pdf(pdf_path)
+        try:
+            return smart_extract_from_document(doc)
+        finally:
+            doc.close()
     except Exception as e:
         print(f"智能PDF提取失败: {e}")
         return {"text": None, "method": "failed", "is_scanned": False}
@@ -199,7 +413,7 @@ def smart_extract_from_upload(file_storage) -> dict[str, object]:
     Returns:
         {
             'text': str,  # 提取的文本
-            'method': str,  # 'text' / 'ocr' / 'failed' / 'unsupported'
+            'method': str,  # 'text' / 'ocr' / 'mixed' / 'failed' / 'unsupported'
             'is_scanned': bool,  # 是否为扫描件
             'word_count': int  # 字数
         }
@@ -222,23 +436,9 @@ def smart_extract_from_upload(file_storage) -> dict[str, object]:
     try:
         # 根据文件类型选择提取方式
         if ext == ".pdf":
-            # 先尝试普通文本提取
-            from .document_extract import extract_from_pdf_memory
-
-            file_storage.seek(0)
-            text = extract_from_pdf_memory(file_storage)
-
-            if text and len(text.strip()) > 50:
-                return {
-                    "text": text,
-                    "method": "text",
-                    "is_scanned": False,
-                    "word_count": len(text),
-                }
-
-            # 扫描件，使用OCR
-            temp_path = save_temp_file(file_storage, ".pdf")
-            result = smart_extract_from_pdf(temp_path)
+            # 只打开一次：逐页提取文本，扫描页再OCR
+            with open_pdf_upload(file_storage) as doc:
+                result = smart_extract_from_document(doc)
             text_value = result.get("text")
             result["word_count"] = len(text_value) if isinstance(text_value, str) else 0
             return result
@@ -298,6 +498,7 @@ def get_ocr_status_label(method: str) -> str:
     labels = {
         "text": "文本提取",
         "ocr": "OCR识别",
+        "mixed": "文本+OCR",
         "failed": "提取失败",
         "unsupported": "不支持",
         "pending": "待处理",
@@ -310,26 +511,12 @@ if __name__ == "__main__":
     import sys
 
     if len(sys.argv) > 1:
-        # 模拟文件上传测试
-        class MockFile:
-            def __init__(self, path):
-                self.path = path
-                self.filename = os.path.basename(path)
-
-            def save(self, p):
-                import shutil
-
-                shutil.copy(self.path, p)
-
-            def read(self, n=-1):
-                with open(self.path, "rb") as f:
-                    return f.read()
-
-            def seek(self, n=0):
-                pass
+        # 模拟文件上传测试（与请求中的 FileStorage 相同）
+        from werkzeug.datastructures import FileStorage
 
-        mock_file = MockFile(sys.argv[1])
-        result = smart_extract_from_upload(mock_file)
+        with open(sys.argv[1], "rb") as f:
+            upload = FileStorage(stream=f, filename=os.path.basename(sys.argv[1]))
+            result = smart_extract_from_upload(upload)
         print(f"提取方式: {result.get('method')}")
         print(f"是否为扫描件: {result.get('is_scanned')}")
         print(f"字数: {result.get('word_count')}")
@@ -0,0 +1,477 @@
+"""
+疑似重复图斑检测模块
+
+重复的卫片批次和巡查上报会把同一地块以不同图斑编号录入。候选重复对按
+三项相似度加权打分，达到 DEDUP_MIN_SCORE 的记为待审核的 DuplicateCandidate：
+
+    - 距离：DEDUP_DISTANCE_METERS 以内，越近越高
+    - 面积：小/大之比，任一方未填时不计入
+    - 文本：活动/设施名称与建设单位的字符二元组 MinHash 签名估计的 Jaccard
+      相似度，任一方都未填时不计入
+
+分块避免两两比较：坐标按边长不小于检测距离的经纬度网格分块，每个点只与
+本格和相邻格中的点比较（同一格点数超过 DEDUP_MAX_BLOCK 时截断）。
+点对展开、距离、签名比对全部用 NumPy 向量化计算。
+
+检测时机：保存单个图斑后（DEDUP_ON_SAVE，只查其周边）、批量导入后
+（DEDUP_ON_IMPORT，只比较本次新增/更新的图斑）、以及审核页的全量扫描。
+已审核（确认重复/不是重复）的图斑对不会被重新标记。
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from flask import current_app
+from sqlalchemy import or_, update
+
+from models import db
+from models.duplicate_candidate import DUPLICATE_PENDING, DuplicateCandidate
+from models.tuban import Tuban
+from utils.write_queue import run_write
+
+# 综合评分权重：距离、面积、文本
+SCORE_WEIGHTS = (0.4, 0.2, 0.4)
+MINHASH_PERMUTATIONS = 64
+SAVE_BATCH_SIZE = 1000
+_METERS_PER_DEGREE_LAT = 110574.0
+_METERS_PER_DEGREE_LON = 111320.0
+# 一次展开的点对数上限（控制临时数组内存）
+_PAIR_CHUNK = 1 << 21
+_SHINGLE_CHUNK = 1 << 16
+_KEY_STRIDE = 1 << 32
+_NON_WORD = re.compile(r"[\W_]+")
+_MAX_HASH = (1 << 32) - 1
+
+
+@dataclass
+class _Records:
+    """参与比较的图斑（按列存放）"""
+
+    ids: object
+    lon: object
+    lat: object
+    area: object
+    signatures: object
+    has_text: object
+
+    def __len__(self):
+        return len(self.ids)
+
+
+# ==================== 文本签名 ====================
+
+
+def _shingles(*texts) -> set[int]:
+    """去掉空白和标点后的字符二元组（单字时取单字），CRC32 作为整数编码"""
+    result = set()
+    for text in texts:
+        text = _NON_WORD.sub("", str(text or "")).lower()
+        grams = (
+            [text]
+            if len(text) == 1
+            else [text[i : i + 2] for i in range(len(text) - 1)]
+        )
+        result.update(zlib.crc32(gram.encode("utf-8")) for gram in grams)
+    return result
+
+
+def _minhash_params():
+    import numpy as np
+
+    rng = np.random.default_rng(20240501)
+    a = rng.integers(1, 1 << 63, MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signatures(shingle_sets: list[set[int]]):
+    """
+    每条记录的 MinHash 签名，返回 (n, MINHASH_PERMUTATIONS) uint32 数组
+
+    哈希族为乘移位 (a*x + b) mod 2^64 的高32位；空集合的签名全为最大值。
+    """
+    import numpy as np
+
+    a, b = _minhash_params()
+    signatures = np.full(
+        (len(shingle_sets), MINHASH_PERMUTATIONS), _MAX_HASH, np.uint32
+    )
+    lengths = np.fromiter((len(s) for s in shingle_sets), np.int64, len(shingle_sets))
+    owners = np.flatnonzero(lengths)
+    if not owners.size:
+        return signatures
+    values = np.fromiter(
+        (value for s in shingle_sets for value in s), np.uint64, int(lengths.sum())
+    )
+    starts = np.concatenate(([0], np.cumsum(lengths[owners])[:-1]))
+
+    # 按记录分块，每块一次算出全部哈希后按记录取最小值
+    position = 0
+    while position < len(owners):
+        end = int(np.searchsorted(starts, starts[position] + _SHINGLE_CHUNK, "left"))
+        end = max(end, position + 1)
+        lo = starts[position]
+        hi = starts[end] if end < len(owners) else len(values)
+        hashed = values[lo:hi, None] * a
+        hashed += b
+        hashed >>= np.uint64(32)
+        signatures[owners[position:end]] = np.minimum.reduceat(
+            hashed.astype(np.uint32), starts[position:end] - lo, axis=0
+        )
+        position = end
+    return signatures
+
+
+# ==================== 候选对 ====================
+
+
+def _ramp(counts):
+    """[2, 3] -> [0, 1, 0, 1, 2]：每段从0开始的序号"""
+    import numpy as np
+
+    total = int(counts.sum())
+    return np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def _distances(lon_a, lat_a, lon_b, lat_b):
+    """近距离点对的距离（米），按两点平均纬度的等距圆柱近似"""
+    import numpy as np
+
+    mean_lat = np.radians((lat_a + lat_b) / 2)
+    dx = (lon_a - lon_b) * _METERS_PER_DEGREE_LON * np.cos(mean_lat)
+    dy = (lat_a - lat_b) * _METERS_PER_DEGREE_LAT
+    return np.hypot(dx, dy)
+
+
+def _grid_cell_size(lat, radius: float) -> tuple[float, float]:
+    """网格边长（度）：经向按数据中最高纬度取，保证任何位置的格宽都不小于 radius"""
+    import numpy as np
+
+    max_lat = min(float(np.abs(lat).max()), 89.0) if len(lat) else 0.0
+    cos_lat = math.cos(math.radians(max_lat))
+    return (
+        radius / (_METERS_PER_DEGREE_LON * cos_lat),
+        radius / _METERS_PER_DEGREE_LAT,
+    )
+
+
+def candidate_pairs(records: _Records, radius: float, max_block: int, focus=None):
+    """
+    网格分块找出距离不超过 radius 的点对
+
+    Args:
+        focus: 布尔数组，只保留至少一端为 True 的点对（增量检测）
+
+    Returns:
+        (i, j, 距离, 截断的点数)，i/j 为 records 中的下标，每对只出现一次
+    """
+    import numpy as np
+
+    n = len(records)
+    empty = np.zeros(0, np.int64)
+    if n < 2:
+        return empty, empty, np.zeros(0), 0
+    cell_lon, cell_lat = _grid_cell_size(records.lat, radius)
+    cx = np.floor(records.lon / cell_lon).astype(np.int64)
+    cy = np.floor(records.lat / cell_lat).astype(np.int64)
+    key = cx * _KEY_STRIDE + cy
+    order = np.argsort(key, kind="stable")
+    sorted_key = key[order]
+    position = np.empty(n, np.int64)
+    position[order] = np.arange(n)
+
+    pairs_i, pairs_j, pairs_d = [], [], []
+    truncated = 0
+    # 本格取排在自己之后的点，相邻格只取一半方向，每对只比较一次
+    for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+        target = key + dx * _KEY_STRIDE + dy
+        if (dx, dy) == (0, 0):
+            lo = position + 1
+        else:
+            lo = np.searchsorted(sorted_key, target, "left")
+        hi = np.searchsorted(sorted_key, target, "right")
+        count = np.clip(hi - lo, 0, None)
+        truncated += int(np.count_nonzero(count > max_block))
+        count = np.minimum(count, max_block)
+
+        cumulative = np.cumsum(count)
+        if not cumulative.size or not cumulative[-1]:
+            continue
+        splits = np.searchsorted(
+            cumulative, np.arange(_PAIR_CHUNK, cumulative[-1], _PAIR_CHUNK)
+        )
+        bounds = np.unique(np.concatenate(([0], splits, [n])))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            chunk = count[start:end]
+            i = np.repeat(np.arange(start, end), chunk)
+            j = order[np.repeat(lo[start:end], chunk) + _ramp(chunk)]
+            if focus is not None:
+                keep = focus[i] | focus[j]
+                i, j = i[keep], j[keep]
+            distance = _distances(
+                records.lon[i], records.lat[i], records.lon[j], records.lat[j]
+            )
+            near = distance <= radius
+            pairs_i.append(i[near])
+            pairs_j.append(j[near])
+            pairs_d.append(distance[near])
+    if not pairs_i:
+        return empty, empty, np.zeros(0), truncated
+    return (
+        np.concatenate(pairs_i),
+        np.concatenate(pairs_j),
+        np.concatenate(pairs_d),
+        truncated,
+    )
+
+
+def score_pairs(records: _Records, i, j, distance, radius: float):
+    """点对的综合相似度，返回 (score, area_ratio, text_similarity)，缺项为 NaN"""
+    import numpy as np
+
+    distance_score = 1.0 - distance / radius
+
+    area_i, area_j = records.area[i], records.area[j]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        area_ratio = np.minimum(area_i, area_j) / np.maximum(area_i, area_j)
+    area_ratio[~(area_i > 0) | ~(area_j > 0)] = np.nan
+
+    text = np.full(len(i), np.nan)
+    has_text = records.has_text[i] & records.has_text[j]
+    for start in range(0, len(i), _PAIR_CHUNK // MINHASH_PERMUTATIONS):
+        stop = start + _PAIR_CHUNK // MINHASH_PERMUTATIONS
+        ci, cj = i[start:stop], j[start:stop]
+        text[start:stop] = (records.signatures[ci] == records.signatures[cj]).mean(
+            axis=1
+        )
+    text[~has_text] = np.nan
+
+    components = np.stack([distance_score, area_ratio, text])
+    weights = np.asarray(SCORE_WEIGHTS)[:, None] * ~np.isnan(components)
+    score = np.nansum(components * weights, axis=0) / weights.sum(axis=0)
+    return score, area_ratio, text
+
+
+# ==================== 检测入口 ====================
+
+
+def _load_records(query) -> _Records:
+    import numpy as np
+
+    rows = query.with_entities(
+        Tuban.id,
+        Tuban.longitude,
+        Tuban.latitude,
+        Tuban.area,
+        Tuban.facility_name,
+        Tuban.build_unit,
+    ).all()
+    shingle_sets = [_shingles(r.facility_name, r.build_unit) for r in rows]
+    return _Records(
+        ids=np.fromiter((r.id for r in rows), np.int64, len(rows)),
+        lon=np.fromiter((float(r.longitude) for r in rows), np.float64, len(rows)),
+        lat=np.fromiter((float(r.latitude) for r in rows), np.float64, len(rows)),
+        area=np.fromiter(
+            (float(r.area) if r.area is not None else np.nan for r in rows),
+            np.float64,
+            len(rows),
+        ),
+        signatures=minhash_signatures(shingle_sets),
+        has_text=np.fromiter((bool(s) for s in shingle_sets), bool, len(rows)),
+    )
+
+
+def _located_tubans():
+    return Tuban.query.filter(
+        Tuban.is_deleted == 0, Tuban.longitude.isnot(None), Tuban.latitude.isnot(None)
+    )
+
+
+def _detect(records: _Records, focus=None) -> tuple[list[dict], dict]:
+    """返回达到阈值的候选对及统计"""
+    config = current_app.config
+    radius = float(config["DEDUP_DISTANCE_METERS"])
+    i, j, distance, truncated = candidate_pairs(
+        records, radius, config["DEDUP_MAX_BLOCK"], focus
+    )
+    score, area_ratio, text = score_pairs(records, i, j, distance, radius)
+    keep = score >= config["DEDUP_MIN_SCORE"]
+    ids_i, ids_j = records.ids[i[keep]], records.ids[j[keep]]
+    rows = [
+        {
+            "tuban_id": min(a, b),
+            "other_id": max(a, b),
+            "score": round(s, 4),
+            "distance": round(d, 2),
+            "area_ratio": None if r != r else round(r, 4),
+            "text_similarity": None if t != t else round(t, 4),
+        }
+        for a, b, s, d, r, t in zip(
+            ids_i.tolist(),
+            ids_j.tolist(),
+            score[keep].tolist(),
+            distance[keep].tolist(),
+            area_ratio[keep].tolist(),
+            text[keep].tolist(),
+        )
+    ]
+    stats = {"scanned": len(records), "nearby": len(i), "truncated": truncated}
+    return rows, stats
+
+
+def scan_duplicates(
+    changed_since: datetime | None = None,
+    progress: Callable[..., None] | None = None,
+) -> dict:
+    """
+    批量检测疑似重复图斑
+
+    Args:
+        changed_since: 只检测该时间之后新增/更新的图斑（与全部图斑比较），
+            为空时全量检测
+        progress: 检测和保存后调用 progress(processed=, total=, counts=)
+
+    Returns:
+        {"scanned", "nearby", "truncated", "candidates", "new"}
+    """
+    import numpy as np
+
+    records = _load_records(_located_tubans())
+    focus = None
+    if changed_since is not None:
+        changed = (
+            _located_tubans()
+            .filter(Tuban.updated_at >= changed_since)
+            .with_entities(Tuban.id)
+            .all()
+        )
+        focus = np.isin(records.ids, [row.id for row in changed])
+        if not focus.any():
+            return {
+                "scanned": 0,
+                "nearby": 0,
+                "truncated": 0,
+                "candidates": 0,
+                "new": 0,
+            }
+    rows, stats = _detect(records, focus)
+    counts = Counter(dict(stats, candidates=len(rows), new=0))
+    if progress is not None:
+        progress(processed=len(records), total=len(records), counts=dict(counts))
+    for start in range(0, len(rows), SAVE_BATCH_SIZE):
+        counts["new"] += run_write(
+            _save_candidates, rows[start : start + SAVE_BATCH_SIZE]
+        )
+    if progress is not None:
+        progress(counts=dict(counts))
+    return dict(counts)
+
+
+def check_tuban_duplicates(tuban_id: int) -> int:
+    """
+    检测单个图斑与周边图斑是否重复（保存图斑后调用）
+
+    该图斑已不再满足条件的待审核候选对会被删除。返回该图斑当前待审核的候选对数。
+    """
+    # 结束当前读事务，才能读到写入线程刚提交的图斑
+    db.session.commit()
+    tuban = db.session.get(Tuban, tuban_id)
+    if tuban is None:
+        return 0
+    rows = []
+    if (
+        tuban.is_deleted == 0
+        and tuban.longitude is not None
+        and tuban.latitude is not None
+    ):
+        radius = float(current_app.config["DEDUP_DISTANCE_METERS"])
+        lon, lat = float(tuban.longitude), float(tuban.latitude)
+        cell_lon, cell_lat = _grid_cell_size([lat], radius)
+        nearby = _located_tubans().filter(
+            Tuban.longitude.between(lon - cell_lon, lon + cell_lon),
+            Tuban.latitude.between(lat - cell_lat, lat + cell_lat),
+        )
+        records = _load_records(nearby)
+        rows, _ = _detect(records, records.ids == tuban_id)
+    return run_write(_refresh_tuban_candidates, rows, tuban_id)
+
+
+def _refresh_tuban_candidates(rows: list[dict], tuban_id: int) -> int:
+    """保存单个图斑的候选对（写入线程中执行），返回其待审核对数"""
+    _save_candidates(rows, refresh_tuban_id=tuban_id)
+    return DuplicateCandidate.query.filter(
+        DuplicateCandidate.status == DUPLICATE_PENDING,
+        or_(
+            DuplicateCandidate.tuban_id == tuban_id,
+            DuplicateCandidate.other_id == tuban_id,
+        ),
+    ).count()
+
+
+def _save_candidates(rows: list[dict], refresh_tuban_id: int | None = None) -> int:
+    """
+    保存候选对（写入线程中执行），返回新增数
+
+    已有的待审核对更新分数，已审核的对保持不变；指定 refresh_tuban_id 时
+    删除该图斑不在 rows 中的待审核对。
+    """
+    pairs = {(row["tuban_id"], row["other_id"]) for row in rows}
+    ids = {tuban_id for pair in pairs for tuban_id in pair}
+    if refresh_tuban_id is not None:
+        ids.add(refresh_tuban_id)
+    existing = {}
+    id_list = sorted(ids)
+    for start in range(0, len(id_list), SAVE_BATCH_SIZE):
+        chunk = id_list[start : start + SAVE_BATCH_SIZE]
+        for candidate_id, a, b, status in db.session.query(
+            DuplicateCandidate.id,
+            DuplicateCandidate.tuban_id,
+            DuplicateCandidate.other_id,
+            DuplicateCandidate.status,
+        ).filter(DuplicateCandidate.tuban_id.in_(chunk)):
+            existing[(a, b)] = (candidate_id, status)
+
+    now = datetime.now()
+    inserts, updates = [], []
+    for row in rows:
+        found = existing.get((row["tuban_id"], row["other_id"]))
+        if found is None:
+            inserts.append(
+                dict(row, status=DUPLICATE_PENDING, created_at=now, updated_at=now)
+            )
+        elif found[1] == DUPLICATE_PENDING:
+            updates.append(dict(row, id=found[0], updated_at=now))
+    if inserts:
+        db.session.execute(DuplicateCandidate.__table__.insert(), inserts)
+    if updates:
+        db.session.execute(update(DuplicateCandidate), updates)
+
+    if refresh_tuban_id is not None:
+        stale = (
+            DuplicateCandidate.query.filter(
+                DuplicateCandidate.status == DUPLICATE_PENDING,
+                or_(
+                    DuplicateCandidate.tuban_id == refresh_tuban_id,
+                    DuplicateCandidate.other_id == refresh_tuban_id,
+                ),
+            )
+            .with_entities(
+                DuplicateCandidate.id,
+                DuplicateCandidate.tuban_id,
+                DuplicateCandidate.other_id,
+            )
+            .all()
+        )
+        stale_ids = [c.id for c in stale if (c.tuban_id, c.other_id) not in pairs]
+        if stale_ids:
+            DuplicateCandidate.query.filter(
+                DuplicateCandidate.id.in_(stale_ids)
+            ).delete(synchronize_session=False)
+    return len(inserts)
@@ -1,15 +1,102 @@
-import pandas as pd
 from flask import send_file
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
 from io import BytesIO
 from typing import IO, Any, cast
+import hashlib
+import json
 from models import db
 from models.tuban import Tuban
+from models.tuban_event import tuban_events
 from utils.helpers import parse_date
+from utils.write_queue import run_write
 
+IMPORT_MODE_INSERT = "insert"
+IMPORT_MODE_UPSERT = "upsert"
+IMPORT_MODES = (IMPORT_MODE_INSERT, IMPORT_MODE_UPSERT)
+IMPORT_BATCH_SIZE = 1000
+
+# Excel列名 -> 图斑字段
+IMPORT_COLUMN_MAPPING = {
+    "图斑编号": "tuban_code",
+    "所属地质公园名称": "park_name",
+    "所在功能区": "func_zone",
+    "活动/设施名称": "facility_name",
+    "经度": "longitude",
+    "纬度": "latitude",
+    "占地面积": "area",
+    "影像时相": "image_date",
+    "建设单位": "build_unit",
+    "建设时间": "build_time",
+    "是否有审批手续": "has_approval",
+    "审批文号": "approval_no",
+    "发现时间": "discover_time",
+    "发现方式": "discover_method",
+    "现场核查时间": "check_time",
+    "核查人员": "check_person",
+    "核查结论": "check_result",
+    "问题类型": "problem_type",
+    "问题描述": "problem_desc",
+    "涉及地质遗迹类型": "geo_heritage_type",
+    "影响程度": "impact_level",
+    "是否上级重点关注": "is_superior_focus",
+    "是否违法违规": "is_illegal",
+    "违反法规条款": "violated_law",
+    "整改措施": "rectify_measure",
+    "整改时限": "rectify_deadline",
+    "整改进展": "rectify_status",
+    "整改验收时间": "rectify_verify_time",
+    "验收人员": "verify_person",
+    "是否销号": "is_closed",
+    "是否处罚": "is_punished",
+    "处罚形式": "punish_type",
+    "罚款金额": "fine_amount",
+    "处罚文书编号": "punish_doc_no",
+    "台账来源": "data_source",
+    "是否为巡查点": "is_patrol_point",
+    "责任部门/责任人": "responsible_dept",
+    "附件材料": "attachments",
+    "备注": "remark",
+}
+IMPORT_FIELDS = frozenset(IMPORT_COLUMN_MAPPING.values())
+IMPORT_DATE_COLUMNS = (
+    "image_date",
+    "build_time",
+    "discover_time",
+    "check_time",
+    "rectify_deadline",
+    "rectify_verify_time",
+)
+# 数值列及其小数位（与字段精度一致，保证行哈希稳定）
+IMPORT_NUMERIC_SCALES = {"longitude": 6, "latitude": 6, "area": 2, "fine_amount": 2}
+# 未填写时的默认值（文件中没有该列时只用于新增的图斑）
+IMPORT_DEFAULTS = {
+    "rectify_status": "未整改",
+    "is_closed": "否",
+    "is_punished": "否",
+    "is_patrol_point": "否",
+    "has_approval": "否",
+    "is_illegal": "待定",
+}
+
+
+def import_tubans_from_excel(filepath, mode=IMPORT_MODE_INSERT):
+    """
+    从Excel文件导入图斑数据
+
+    Args:
+        mode: "insert" 跳过已存在的图斑编号；
+              "upsert" 按行哈希比较，只更新内容有变化的已有图斑
+
+    Returns:
+        {"inserted": 新增, "updated": 更新, "unchanged": 未变化, "skipped": 跳过}
+    """
+    # pandas 导入较慢，仅在导入/导出时加载
+    import pandas as pd
+
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"不支持的导入模式: {mode}")
 
-def import_tubans_from_excel(filepath):
-    """从Excel文件导入图斑数据"""
     try:
         # 读取Excel文件
         df = pd.read_excel(filepath)
@@ -17,72 +104,22 @@ def import_tubans_from_excel(filepath):
         # 标准化列名
         df.columns = df.columns.str.strip()
 
-        # 必要的列映射
-        column_mapping = {
-            "图斑编号": "tuban_code",
-            "所属地质公园名称": "park_name",
-            "所在功能区": "func_zone",
-            "活动/设施名称": "facility_name",
-            "经度": "longitude",
-            "纬度": "latitude",
-            "占地面积": "area",
-            "影像时相": "image_date",
-            "建设单位": "build_unit",
-            "建设时间": "build_time",
-            "是否有审批手续": "has_approval",
-            "审批文号": "approval_no",
-            "发现时间": "discover_time",
-            "发现方式": "discover_method",
-            "现场核查时间": "check_time",
-            "核查人员": "check_person",
-            "核查结论": "check_result",
-            "问题类型": "problem_type",
-            "问题描述": "problem_desc",
-            "涉及地质遗迹类型": "geo_heritage_type",
-            "影响程度": "impact_level",
-            "是否上级重点关注": "is_superior_focus",
-            "是否违法违规": "is_illegal",
-            "违反法规条款": "violated_law",
-            "整改措施": "rectify_measure",
-            "整改时限": "rectify_deadline",
-            "整改进展": "rectify_status",
-            "整改验收时间": "rectify_verify_time",
-            "验收人员": "verify_person",
-            "是否销号": "is_closed",
-            "是否处罚": "is_punished",
-            "处罚形式": "punish_type",
-            "罚款金额": "fine_amount",
-            "处罚文书编号": "punish_doc_no",
-            "台账来源": "data_source",
-            "是否为巡查点": "is_patrol_point",
-            "责任部门/责任人": "responsible_dept",
-            "附件材料": "attachments",
-            "备注": "remark",
-        }
-
         # 重命名列
-        df = df.rename(columns=column_mapping)
+        df = df.rename(columns=IMPORT_COLUMN_MAPPING)
 
         # 只保留存在的列
-        existing_columns = [col for col in column_mapping.values() if col in df.columns]
+        existing_columns = [
+            col for col in IMPORT_COLUMN_MAPPING.values() if col in df.columns
+        ]
         df = df[existing_columns]
 
         # 处理日期列
-        date_columns = [
-            "image_date",
-            "build_time",
-            "discover_time",
-            "check_time",
-            "rectify_deadline",
-            "rectify_verify_time",
-        ]
-        for col in date_columns:
+        for col in IMPORT_DATE_COLUMNS:
             if col in df.columns:
                 df[col] = pd.to_datetime(df[col], errors="coerce")
 
         # 处理数值列
-        numeric_columns = ["longitude", "latitude", "area", "fine_amount"]
-        for col in numeric_columns:
+        for col in IMPORT_NUMERIC_SCALES:
             if col in df.columns:
                 df[col] = pd.to_numeric(df[col], errors="coerce")
 
@@ -90,49 +127,204 @@ def import_tubans_from_excel(filepath):
         required_fields = ["tuban_code", "park_name"]
         df = cast(Any, df).dropna(subset=list(required_fields))
 
-        # 导入数据
-        count = 0
-        for _, row in df.iterrows():
-            # 检查是否已存在
-            if Tuban.query.filter_by(tuban_code=row["tuban_code"]).first():
-                continue
-
-            # 创建图斑对象
-            tuban = Tuban()
-
-            # 设置字段值
-            for col in df.columns:
-                if hasattr(tuban, col) and bool(pd.notna(row[col])):
-                    setattr(tuban, col, row[col])
-
-            # 设置默认值
-            if not tuban.rectify_status:
-                tuban.rectify_status = "未整改"
-            if not tuban.is_closed:
-                tuban.is_closed = "否"
-            if not tuban.is_punished:
-                tuban.is_punished = "否"
-            if not tuban.is_patrol_point:
-                tuban.is_patrol_point = "否"
-            if not tuban.has_approval:
-                tuban.has_approval = "否"
-            if not tuban.is_illegal:
-                tuban.is_illegal = "待定"
-
-            # 保存到数据库
-            db.session.add(tuban)
-            count += 1
-
-        db.session.commit()
-        return count
+        records = normalize_import_rows(df)
+
+        # 写入数据库（经写入队列串行提交）
+        return save_import_records(records, mode)
 
     except Exception as e:
         db.session.rollback()
         raise Exception(f"Excel导入失败: {str(e)}")
 
 
+def normalize_import_value(col, value):
+    """
+    单元格值规范化：空值为None，日期为date，数值为按字段精度取整的Decimal，
+    文本去空白。Excel/CSV/Parquet 导入共用，同一内容得到相同的行哈希。
+    """
+    import pandas as pd
+
+    if value is None or (not isinstance(value, str) and bool(pd.isna(value))):
+        return None
+    if col in IMPORT_DATE_COLUMNS:
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        try:
+            return date.fromisoformat(str(value).strip()[:10])
+        except ValueError:
+            return None
+    if col in IMPORT_NUMERIC_SCALES:
+        try:
+            number = Decimal(str(value).strip())
+            return number.quantize(Decimal(1).scaleb(-IMPORT_NUMERIC_SCALES[col]))
+        except InvalidOperation:
+            return None
+    if isinstance(value, float) and value.is_integer():
+        # 纯数字的编号/文号被 Excel 读成浮点数
+        value = int(value)
+    text = str(value).strip()
+    return text or None
+
+
+def row_hash(record):
+    """规范化行内容的SHA-256，用于增量导入时判断行是否变化"""
+    payload = json.dumps(
+        sorted(record.items()), ensure_ascii=False, default=str, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def normalize_import_record(row):
+    """
+    把一行 {字段: 原始值} 规范化并附带 row_hash
+
+    只包含源文件中有的列（空单元格按 IMPORT_DEFAULTS 补默认值），行哈希也只
+    覆盖这些列；文件中没有的列在新增时才补默认值，更新时不写入。
+    """
+    record = {
+        col: normalize_import_value(col, value)
+        for col, value in row.items()
+        if col in IMPORT_FIELDS
+    }
+    for col, default in IMPORT_DEFAULTS.items():
+        if col in record and not record[col]:
+            record[col] = default
+    record["row_hash"] = row_hash(record)
+    return record
+
+
+def normalize_import_rows(df):
+    """把导入表格转为规范化的字段字典列表，并附带 row_hash"""
+    columns = list(df.columns)
+    return [
+        normalize_import_record(dict(zip(columns, values)))
+        for values in df.itertuples(index=False, name=None)
+    ]
+
+
+def save_import_records(records, mode=IMPORT_MODE_INSERT, event_id=None):
+    """
+    经写入队列保存一批规范化后的导入记录，返回各类计数
+
+    指定 event_id 时，本批次中有效编号对应的图斑在同一事务中关联到该事件
+    （计数中的 "linked" 为新增的关联数）。
+    """
+    return run_write(_save_imported_tubans, records, mode, event_id)
+
+
+def _load_existing_tubans(codes):
+    """按图斑编号分批查询已有图斑，返回 {编号: (id, row_hash, is_deleted)}"""
+    existing = {}
+    for start in range(0, len(codes), IMPORT_BATCH_SIZE):
+        rows = db.session.execute(
+            db.select(
+                Tuban.tuban_code, Tuban.id, Tuban.row_hash, Tuban.is_deleted
+            ).where(Tuban.tuban_code.in_(codes[start : start + IMPORT_BATCH_SIZE]))
+        )
+        for code, tuban_id, stored_hash, is_deleted in rows:
+            existing[code] = (tuban_id, stored_hash, is_deleted)
+    return existing
+
+
+def _save_imported_tubans(records, mode=IMPORT_MODE_INSERT, event_id=None):
+    """
+    保存导入的图斑数据（写入线程中执行，不提交）
+
+    新增与更新分别按批执行 executemany；upsert 模式下行哈希与上次导入相同的
+    图斑不做任何写入，导入后在系统中手工修改过的字段也不会被未变化的行覆盖。
+    更新只写入文件中有的列，文件中没有的列（如整改进展、是否销号）保持不变。
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+    codes = list({record["tuban_code"] for record in records if record.get("tuban_code")})
+    existing = _load_existing_tubans(codes)
+
+    now = datetime.now()
+    inserts, updates = [], []
+    seen = set()
+    for record in records:
+        code = record.get("tuban_code")
+        # 缺少必填字段，或同一文件中重复的编号（只取第一行）
+        if not code or not record.get("park_name") or code in seen:
+            counts["skipped"] += 1
+            continue
+        seen.add(code)
+
+        if code not in existing:
+            # 保留空值键，各行字段一致才能合并为一条 executemany
+            inserts.append(
+                dict(
+                    IMPORT_DEFAULTS,
+                    **record,
+                    created_at=now,
+                    updated_at=now,
+                    is_deleted=0,
+                )
+            )
+            continue
+
+        tuban_id, stored_hash, is_deleted = existing[code]
+        if mode != IMPORT_MODE_UPSERT or is_deleted:
+            counts["skipped"] += 1
+        elif stored_hash == record["row_hash"]:
+            counts["unchanged"] += 1
+        else:
+            updates.append(dict(record, id=tuban_id, updated_at=now))
+
+    for start in range(0, len(inserts), IMPORT_BATCH_SIZE):
+        db.session.bulk_insert_mappings(
+            Tuban, inserts[start : start + IMPORT_BATCH_SIZE]
+        )
+    for start in range(0, len(updates), IMPORT_BATCH_SIZE):
+        db.session.bulk_update_mappings(
+            Tuban, updates[start : start + IMPORT_BATCH_SIZE]
+        )
+    counts["inserted"] = len(inserts)
+    counts["updated"] = len(updates)
+    if event_id is not None:
+        counts["linked"] = _link_tubans_to_event(list(seen), event_id, now)
+    return counts
+
+
+def _link_tubans_to_event(codes, event_id, now):
+    """把编号对应的未删除图斑关联到事件，已关联的跳过，新关联一次 executemany 插入"""
+    tuban_ids = []
+    for start in range(0, len(codes), IMPORT_BATCH_SIZE):
+        tuban_ids.extend(
+            db.session.scalars(
+                db.select(Tuban.id).where(
+                    Tuban.tuban_code.in_(codes[start : start + IMPORT_BATCH_SIZE]),
+                    Tuban.is_deleted == 0,
+                )
+            )
+        )
+    linked = set()
+    for start in range(0, len(tuban_ids), IMPORT_BATCH_SIZE):
+        linked.update(
+            db.session.scalars(
+                db.select(tuban_events.c.tuban_id).where(
+                    tuban_events.c.event_id == event_id,
+                    tuban_events.c.tuban_id.in_(
+                        tuban_ids[start : start + IMPORT_BATCH_SIZE]
+                    ),
+                )
+            )
+        )
+    rows = [
+        {"tuban_id": tuban_id, "event_id": event_id, "added_at": now}
+        for tuban_id in tuban_ids
+        if tuban_id not in linked
+    ]
+    if rows:
+        db.session.execute(tuban_events.insert(), rows)
+    return len(rows)
+
+
 def export_tubans_to_excel(tubans):
     """导出图斑数据到Excel"""
+    import pandas as pd
+
     try:
         # 准备数据
         data = []
@@ -0,0 +1,179 @@
+"""
+上传文件下发模块
+
+为附件、公文和图斑图片提供带缓存语义的下载响应：
+- 强 ETag：文件内容的 SHA-256（按 路径+修改时间+大小 缓存，不重复读盘）
+- 条件请求与 Range：If-None-Match 返回304，Range 返回206，支持断点续传
+- 版本化URL：模板生成的链接带 ?v=<ETag>，与当前文件一致时下发一年有效的
+  immutable 缓存头；文件变化后链接随之变化，无需手动失效
+- 卸载字节传输：USE_X_SENDFILE（Apache/lighttpd）或 X_ACCEL_REDIRECT_PREFIX
+  （nginx internal location）开启后由前端服务器发送文件内容
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import quote
+
+from flask import current_app, request, send_file, url_for
+
+from utils.blob_store import image_source_path, resolve_upload_path
+from utils.helpers import safe_join_upload
+from utils.image_derivatives import resolve_variant
+from utils.image_tiles import has_tiles, manifest_relative_path
+
+HASH_CHUNK_SIZE = 1024 * 1024
+ETAG_CACHE_SIZE = 4096
+BLOB_PATH_MARKER = f"{os.sep}blobs{os.sep}"
+
+_etag_cache: "OrderedDict[tuple[str, int, int], str]" = OrderedDict()
+_etag_lock = threading.Lock()
+
+
+def file_etag(path: str | Path) -> str:
+    """文件内容的强ETag（SHA-256前32位十六进制）"""
+    path = str(path)
+    # blob 文件名即内容SHA-256，无需读盘计算
+    name = os.path.basename(path)
+    if len(name) == 64 and BLOB_PATH_MARKER in path:
+        return name[:32]
+
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _etag_lock:
+        etag = _etag_cache.get(key)
+        if etag is not None:
+            _etag_cache.move_to_end(key)
+            return etag
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    etag = digest.hexdigest()[:32]
+
+    with _etag_lock:
+        _etag_cache[key] = etag
+        while len(_etag_cache) > ETAG_CACHE_SIZE:
+            _etag_cache.popitem(last=False)
+    return etag
+
+
+def versioned_url(endpoint: str, path: str | Path | None, **values) -> str:
+    """生成带内容版本号（?v=）的URL，文件不存在时不带版本号"""
+    if path is not None and os.path.isfile(path):
+        values["v"] = file_etag(path)
+    return url_for(endpoint, **values)
+
+
+def upload_url(endpoint: str, filename: str) -> str:
+    """上传目录下文件的版本化URL（模板全局函数）"""
+    path = resolve_upload_path(current_app.config["UPLOAD_FOLDER"], filename)
+    return versioned_url(endpoint, path, filename=filename)
+
+
+def image_path(filename: str, variant: str | None = None) -> Path | None:
+    """图斑图片文件路径，指定的派生图不存在时回退原图"""
+    upload_root = current_app.config["UPLOAD_FOLDER"]
+    if variant:
+        path = safe_join_upload(upload_root, os.path.join("images", variant))
+        if path is not None and path.exists():
+            return path
+    images_folder = os.path.join(upload_root, "images")
+    if safe_join_upload(images_folder, filename) is None:
+        return None
+    return Path(image_source_path(images_folder, filename))
+
+
+def image_url(image, size: str = "full") -> str:
+    """图斑图片的版本化URL（模板全局函数），版本号取实际下发文件的ETag"""
+    path = image_path(image.filename, resolve_variant(image, size))
+    values = {"filename": image.filename}
+    if size != "full":
+        values["size"] = size
+    return versioned_url("tuban.serve_image", path, **values)
+
+
+def tile_manifest_url(image) -> str | None:
+    """卫片瓦片清单URL（模板全局函数），瓦片未生成时返回None"""
+    images_folder = os.path.join(current_app.config["UPLOAD_FOLDER"], "images")
+    if not has_tiles(images_folder, image.filename):
+        return None
+    path = os.path.join(images_folder, manifest_relative_path(image.filename))
+    return versioned_url("tuban.serve_tile_manifest", path, filename=image.filename)
+
+
+def _cache_control(etag: str, immutable: bool = False) -> str:
+    if immutable or request.args.get("v") == etag:
+        max_age = current_app.config.get("FILE_CACHE_MAX_AGE", 31536000)
+        return f"private, max-age={max_age}, immutable"
+    # 未带版本号的链接每次向服务器确认，文件未变化时返回304
+    return "private, no-cache"
+
+
+def _accel_redirect_response(
+    path: Path, etag: str, as_attachment: bool, download_name: str | None
+):
+    """nginx X-Accel-Redirect 响应（文件内容与Range由nginx处理）"""
+    upload_root = Path(current_app.config["UPLOAD_FOLDER"]).resolve()
+    relative = path.resolve().relative_to(upload_root).as_posix()
+    prefix = current_app.config["X_ACCEL_REDIRECT_PREFIX"].rstrip("/")
+
+    response = current_app.response_class()
+    response.headers["X-Accel-Redirect"] = f"{prefix}/{quote(relative)}"
+    response.mimetype = (
+        mimetypes.guess_type(download_name or path.name)[0]
+        or "application/octet-stream"
+    )
+    if as_attachment:
+        name = download_name or path.name
+        response.headers["Content-Disposition"] = (
+            f"attachment; filename*=UTF-8''{quote(name)}"
+        )
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def send_upload_file(
+    path: str | Path,
+    as_attachment: bool = False,
+    download_name: str | None = None,
+    mimetype: str | None = None,
+    immutable: bool = False,
+):
+    """
+    下发上传目录中的文件（强ETag、条件请求、Range、缓存头）
+
+    Args:
+        path: 已通过 safe_join_upload / resolve_upload_path 校验的文件路径
+        as_attachment: 是否作为附件下载
+        download_name: 下载文件名
+        mimetype: 内容类型，默认按文件名推断
+        immutable: 文件内容永不变化（如瓦片），不带版本号也长期缓存
+    """
+    path = Path(path)
+    etag = file_etag(path)
+
+    if current_app.config.get("X_ACCEL_REDIRECT_PREFIX"):
+        response = _accel_redirect_response(path, etag, as_attachment, download_name)
+        if mimetype:
+            response.mimetype = mimetype
+    else:
+        # USE_X_SENDFILE 开启时 send_file 只返回 X-Sendfile 头
+        response = send_file(
+            path,
+            as_attachment=as_attachment,
+            download_name=download_name,
+            mimetype=mimetype,
+            conditional=True,
+            etag=etag,
+        )
+
+    response.headers["Cache-Control"] = _cache_control(etag, immutable)
+    response.headers.pop("Expires", None)
+    return response
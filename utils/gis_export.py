@@ -0,0 +1,436 @@
+"""
+图斑GIS导出模块
+
+按列表页筛选条件导出有坐标的图斑（点要素），属性字段与 CSV/Parquet 导出相同。
+点坐标从 TUBAN_COORDINATE_CRS 按批转换到导出坐标系：wgs84（EPSG:4326，默认）、
+cgcs2000（EPSG:4490）或 gcj02（无 EPSG 代码，按 4326 标注，供高德/腾讯地图使用）。数据用服务端游标（yield_per）分批读取，
+要素逐批写出，内存占用与要素数量无关：
+    - geojson   FeatureCollection，每行一个要素，边查询边输出
+    - geojsonl  GeoJSONSeq（换行分隔的要素，RFC 8142），边查询边输出
+    - kml       边查询边输出
+    - gpkg      GeoPackage（SQLite），写入临时文件后发送
+    - shp       Shapefile（.shp/.shx/.dbf/.prj/.cpg 打包为zip），写入临时目录后发送
+
+GeoPackage 与 Shapefile 直接按格式规范写出，不依赖 GDAL/Fiona。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from flask import Response, current_app, send_file, stream_with_context
+
+from models import db
+from models.tuban import Tuban
+from utils.tuban_interchange import (
+    EXPORT_FIELDS,
+    content_disposition,
+    iter_tuban_batches,
+)
+
+GIS_EXPORT_FORMATS = {
+    "geojson": ("geojson", "application/geo+json"),
+    "geojsonl": ("geojsonl", "application/geo+json-seq"),
+    "kml": ("kml", "application/vnd.google-earth.kml+xml"),
+    "gpkg": ("gpkg", "application/geopackage+sqlite3"),
+    "shp": ("zip", "application/zip"),
+}
+GIS_EXPORT_CRS = ("wgs84", "cgcs2000", "gcj02")
+LAYER_NAME = "tubans"
+WGS84_WKT = (
+    'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563]],'
+    'PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433]]'
+)
+CGCS2000_WKT = (
+    'GEOGCS["China Geodetic Coordinate System 2000",DATUM["China_2000",'
+    'SPHEROID["CGCS2000",6378137,298.257222101]],PRIMEM["Greenwich",0],'
+    'UNIT["degree",0.0174532925199433]]'
+)
+# 导出坐标系 -> (srs_id, 名称, WKT)
+_SPATIAL_REFS = {
+    "wgs84": (4326, "WGS 84", WGS84_WKT),
+    "cgcs2000": (4490, "China Geodetic Coordinate System 2000", CGCS2000_WKT),
+    "gcj02": (4326, "WGS 84", WGS84_WKT),
+}
+_LON = EXPORT_FIELDS.index("longitude")
+_LAT = EXPORT_FIELDS.index("latitude")
+
+
+def _located(query):
+    return query.filter(Tuban.longitude.isnot(None), Tuban.latitude.isnot(None))
+
+
+def iter_features(query, crs: str = "wgs84"):
+    """按批产出 [(经度, 纬度, 属性行元组)]，坐标按批转换到 crs"""
+    from utils.crs import same_coordinates, transform
+
+    source_crs = current_app.config["TUBAN_COORDINATE_CRS"]
+    convert = not same_coordinates(source_crs, crs)
+    for batch in iter_tuban_batches(_located(query)):
+        lons = [float(row[_LON]) for row in batch]
+        lats = [float(row[_LAT]) for row in batch]
+        if convert:
+            lons, lats = (v.tolist() for v in transform(lons, lats, source_crs, crs))
+        yield list(zip(lons, lats, batch))
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _geojson_feature(lon, lat, row) -> str:
+    feature = {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        "properties": {
+            field: _json_value(value) for field, value in zip(EXPORT_FIELDS, row)
+        },
+    }
+    return json.dumps(feature, ensure_ascii=False, separators=(",", ":"))
+
+
+def _generate_geojson(query, crs):
+    yield '{"type":"FeatureCollection","name":"tubans","features":[\n'
+    first = True
+    for batch in iter_features(query, crs):
+        lines = [_geojson_feature(*feature) for feature in batch]
+        prefix = "" if first else ",\n"
+        first = False
+        yield prefix + ",\n".join(lines)
+    yield "\n]}\n"
+
+
+def _generate_geojsonl(query, crs):
+    for batch in iter_features(query, crs):
+        yield "".join(_geojson_feature(*feature) + "\n" for feature in batch)
+
+
+def _kml_placemark(lon, lat, row) -> str:
+    data = "".join(
+        f'<Data name="{field}"><value>{escape(str(_json_value(value)))}</value></Data>'
+        for field, value in zip(EXPORT_FIELDS, row)
+        if value is not None
+    )
+    name = escape(str(row[0]))
+    return (
+        f"<Placemark><name>{name}</name><ExtendedData>{data}</ExtendedData>"
+        f"<Point><coordinates>{lon},{lat}</coordinates></Point></Placemark>\n"
+    )
+
+
+def _generate_kml(query, crs):
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<kml xmlns="http://www.opengis.net/kml/2.2"><Document>'
+        f"<name>{LAYER_NAME}</name>\n"
+    )
+    for batch in iter_features(query, crs):
+        yield "".join(_kml_placemark(*feature) for feature in batch)
+    yield "</Document></kml>\n"
+
+
+class _Bounds:
+    def __init__(self):
+        self.min_x = self.min_y = float("inf")
+        self.max_x = self.max_y = float("-inf")
+
+    def add(self, x: float, y: float) -> None:
+        self.min_x, self.max_x = min(self.min_x, x), max(self.max_x, x)
+        self.min_y, self.max_y = min(self.min_y, y), max(self.max_y, y)
+
+    def as_tuple(self) -> tuple[float, float, float, float]:
+        if self.min_x == float("inf"):
+            return 0.0, 0.0, 0.0, 0.0
+        return self.min_x, self.min_y, self.max_x, self.max_y
+
+
+# ==================== GeoPackage ====================
+
+
+def _gpkg_column_type(field: str) -> str:
+    column_type = Tuban.__table__.c[field].type
+    if isinstance(column_type, db.Numeric):
+        return "REAL"
+    if isinstance(column_type, db.DateTime):
+        return "DATETIME"
+    if isinstance(column_type, db.Date):
+        return "DATE"
+    return "TEXT"
+
+
+def _gpkg_point(x: float, y: float, srs_id: int) -> bytes:
+    """GeoPackage几何：GP头（小端、无外包框）+ WKB点"""
+    return b"GP" + struct.pack("<BBi", 0, 1, srs_id) + struct.pack("<BIdd", 1, 1, x, y)
+
+
+def write_gpkg(query, path: str, crs: str = "wgs84") -> int:
+    """写出GeoPackage文件，返回要素数"""
+    srs_id, srs_name, srs_wkt = _SPATIAL_REFS[crs]
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA application_id = 1196444487")  # 'GPKG'
+        conn.execute("PRAGMA user_version = 10200")
+        conn.executescript("""
+            CREATE TABLE gpkg_spatial_ref_sys (
+                srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY,
+                organization TEXT NOT NULL, organization_coordsys_id INTEGER NOT NULL,
+                definition TEXT NOT NULL, description TEXT);
+            CREATE TABLE gpkg_contents (
+                table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL,
+                identifier TEXT UNIQUE, description TEXT DEFAULT '',
+                last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+                min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+                srs_id INTEGER REFERENCES gpkg_spatial_ref_sys(srs_id));
+            CREATE TABLE gpkg_geometry_columns (
+                table_name TEXT NOT NULL, column_name TEXT NOT NULL,
+                geometry_type_name TEXT NOT NULL, srs_id INTEGER NOT NULL,
+                z TINYINT NOT NULL, m TINYINT NOT NULL,
+                CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name));
+            """)
+        conn.executemany(
+            "INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", None),
+                ("Undefined geographic SRS", 0, "NONE", 0, "undefined", None),
+                (srs_name, srs_id, "EPSG", srs_id, srs_wkt, None),
+            ],
+        )
+        columns = ", ".join(f'"{f}" {_gpkg_column_type(f)}' for f in EXPORT_FIELDS)
+        conn.execute(
+            f'CREATE TABLE "{LAYER_NAME}" (fid INTEGER PRIMARY KEY AUTOINCREMENT, '
+            f"geom POINT, {columns})"
+        )
+        conn.execute(
+            "INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', 'POINT', ?, 0, 0)",
+            (LAYER_NAME, srs_id),
+        )
+
+        insert = (
+            f'INSERT INTO "{LAYER_NAME}" (geom, '
+            + ", ".join(f'"{f}"' for f in EXPORT_FIELDS)
+            + ") VALUES (?"
+            + ", ?" * len(EXPORT_FIELDS)
+            + ")"
+        )
+        bounds = _Bounds()
+        total = 0
+        for batch in iter_features(query, crs):
+            rows = []
+            for lon, lat, row in batch:
+                bounds.add(lon, lat)
+                rows.append((_gpkg_point(lon, lat, srs_id), *map(_json_value, row)))
+            conn.executemany(insert, rows)
+            total += len(rows)
+
+        conn.execute(
+            "INSERT INTO gpkg_contents (table_name, data_type, identifier, "
+            "min_x, min_y, max_x, max_y, srs_id) VALUES (?, 'features', ?, ?, ?, ?, ?, ?)",
+            (LAYER_NAME, LAYER_NAME, *bounds.as_tuple(), srs_id),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return total
+
+
+# ==================== Shapefile ====================
+
+
+def _dbf_fields() -> list[tuple[str, str, str, int, int]]:
+    """[(字段, DBF字段名, 类型, 宽度, 小数位)]，DBF字段名最长10个字符"""
+    specs = []
+    used = set()
+    for field in EXPORT_FIELDS:
+        name = field[:10]
+        suffix = 1
+        while name.upper() in used:
+            name = f"{field[: 10 - len(str(suffix))]}{suffix}"
+            suffix += 1
+        used.add(name.upper())
+
+        column_type = Tuban.__table__.c[field].type
+        if isinstance(column_type, db.Numeric):
+            specs.append(
+                (field, name, "N", column_type.precision + 2, column_type.scale)
+            )
+        elif isinstance(column_type, db.DateTime):
+            specs.append((field, name, "C", 19, 0))
+        elif isinstance(column_type, db.Date):
+            specs.append((field, name, "D", 8, 0))
+        else:
+            # UTF-8 中文每字3字节，DBF字符字段最长254字节
+            length = getattr(column_type, "length", None)
+            specs.append((field, name, "C", min(254, length * 3 if length else 254), 0))
+    return specs
+
+
+def _dbf_value(value, field_type: str, width: int, decimals: int) -> bytes:
+    if value is None:
+        return b" " * width
+    if field_type == "N":
+        return f"{float(value):.{decimals}f}".rjust(width)[:width].encode("ascii")
+    if field_type == "D":
+        return value.strftime("%Y%m%d").encode("ascii")
+    encoded = str(_json_value(value)).encode("utf-8")[:width]
+    # 截断时不保留半个多字节字符
+    encoded = encoded.decode("utf-8", errors="ignore").encode("utf-8")
+    return encoded.ljust(width, b" ")
+
+
+def _shp_header(file_length_words: int, bounds: _Bounds) -> bytes:
+    return (
+        struct.pack(">7i", 9994, 0, 0, 0, 0, 0, file_length_words)
+        + struct.pack("<2i", 1000, 1)
+        + struct.pack("<4d", *bounds.as_tuple())
+        + struct.pack("<4d", 0, 0, 0, 0)
+    )
+
+
+def _dbf_header(count: int, specs) -> bytes:
+    today = date.today()
+    record_length = 1 + sum(spec[3] for spec in specs)
+    header_length = 32 + 32 * len(specs) + 1
+    header = struct.pack(
+        "<BBBBIHH20x",
+        0x03,
+        today.year - 1900,
+        today.month,
+        today.day,
+        count,
+        header_length,
+        record_length,
+    )
+    for _, name, field_type, width, decimals in specs:
+        header += struct.pack(
+            "<11sc4xBB14x",
+            name.encode("ascii"),
+            field_type.encode("ascii"),
+            width,
+            decimals,
+        )
+    return header + b"\r"
+
+
+def write_shapefile(query, directory: str, crs: str = "wgs84") -> int:
+    """在目录中写出点Shapefile（tubans.shp/.shx/.dbf/.prj/.cpg），返回要素数"""
+    base = os.path.join(directory, LAYER_NAME)
+    specs = _dbf_fields()
+    bounds = _Bounds()
+    total = 0
+    with open(f"{base}.shp", "wb") as shp, open(f"{base}.shx", "wb") as shx, open(
+        f"{base}.dbf", "wb"
+    ) as dbf:
+        # 先写占位文件头，要素数和外包框在写完后回填
+        shp.write(b"\0" * 100)
+        shx.write(b"\0" * 100)
+        dbf.write(_dbf_header(0, specs))
+        for batch in iter_features(query, crs):
+            shp_records, shx_records, dbf_records = [], [], []
+            for lon, lat, row in batch:
+                total += 1
+                bounds.add(lon, lat)
+                offset_words = (100 + (total - 1) * 28) // 2
+                shp_records.append(
+                    struct.pack(">2i", total, 10) + struct.pack("<idd", 1, lon, lat)
+                )
+                shx_records.append(struct.pack(">2i", offset_words, 10))
+                values = dict(zip(EXPORT_FIELDS, row))
+                dbf_records.append(
+                    b" "
+                    + b"".join(
+                        _dbf_value(values[field], field_type, width, decimals)
+                        for field, _, field_type, width, decimals in specs
+                    )
+                )
+            shp.write(b"".join(shp_records))
+            shx.write(b"".join(shx_records))
+            dbf.write(b"".join(dbf_records))
+        dbf.write(b"\x1a")
+
+        shp.seek(0)
+        shp.write(_shp_header((100 + total * 28) // 2, bounds))
+        shx.seek(0)
+        shx.write(_shp_header((100 + total * 8) // 2, bounds))
+        dbf.seek(0)
+        dbf.write(_dbf_header(total, specs))
+
+    with open(f"{base}.prj", "w", encoding="ascii") as f:
+        f.write(_SPATIAL_REFS[crs][2])
+    with open(f"{base}.cpg", "w", encoding="ascii") as f:
+        f.write("UTF-8")
+    return total
+
+
+def _send_temp_file(path: str, cleanup_path: str, mimetype: str, filename: str):
+    response = send_file(
+        path, mimetype=mimetype, as_attachment=True, download_name=filename
+    )
+
+    def cleanup():
+        if os.path.isdir(cleanup_path):
+            shutil.rmtree(cleanup_path, ignore_errors=True)
+        elif os.path.exists(cleanup_path):
+            os.remove(cleanup_path)
+
+    response.call_on_close(cleanup)
+    return response
+
+
+def export_gis(query, fmt: str, filename_stem: str, crs: str = "wgs84"):
+    """
+    按格式导出GIS数据
+
+    Args:
+        fmt: GIS_EXPORT_FORMATS 中的格式名
+        filename_stem: 下载文件名（不含扩展名）
+        crs: GIS_EXPORT_CRS 中的导出坐标系
+    """
+    ext, mimetype = GIS_EXPORT_FORMATS[fmt]
+    filename = f"{filename_stem}.{ext}"
+
+    generators = {
+        "geojson": _generate_geojson,
+        "geojsonl": _generate_geojsonl,
+        "kml": _generate_kml,
+    }
+    if fmt in generators:
+        response = Response(
+            stream_with_context(generators[fmt](query, crs)),
+            mimetype=f"{mimetype}; charset=utf-8",
+        )
+        response.headers["Content-Disposition"] = content_disposition(filename)
+        return response
+
+    work_dir = tempfile.mkdtemp(prefix="gis-export-")
+    try:
+        if fmt == "gpkg":
+            path = os.path.join(work_dir, f"{LAYER_NAME}.gpkg")
+            write_gpkg(query, path, crs)
+        else:
+            shp_dir = os.path.join(work_dir, LAYER_NAME)
+            os.makedirs(shp_dir)
+            write_shapefile(query, shp_dir, crs)
+            path = os.path.join(work_dir, f"{LAYER_NAME}.zip")
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+                for name in sorted(os.listdir(shp_dir)):
+                    archive.write(os.path.join(shp_dir, name), name)
+            shutil.rmtree(shp_dir, ignore_errors=True)
+        return _send_temp_file(path, work_dir, mimetype, filename)
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
@@ -0,0 +1,894 @@
+"""
+GIS 矢量数据批量导入模块
+
+支持格式：
+    - GeoJSON（FeatureCollection，按要素流式解析，不整体载入内存）
+    - GeoJSON Lines（每行一个 Feature）
+    - KML（iterparse 逐个 Placemark 读取，属性取 ExtendedData）
+    - Shapefile（.zip 压缩包或 .shp 路径，纯 struct 解析 .shp/.dbf）
+    - GeoPackage（sqlite3 读取第一个要素表）
+
+属性列按映射转为图斑字段，优先级：本次导入指定的映射 > GIS_IMPORT_FIELD_MAPPING
+> Excel 模板中文列名 > 图斑字段名（不区分大小写，兼容DBF截断为10个字符的列名）。
+点要素直接取坐标，线/面要素取形心作为图斑经纬度；没有几何时使用属性中的经纬度。
+面要素未填写占地面积时，按高斯-克吕格投影计算面积（平方米）。
+
+源坐标系取导入时指定的值，否则按 .prj、GeoPackage srs_id 或 GeoJSON 的 crs
+成员识别，都没有时视为 WGS84；每块坐标批量转换到 TUBAN_COORDINATE_CRS 后再校验。
+
+每 GIS_IMPORT_CHUNK_ROWS 个要素为一块：规范化后批量校验坐标（缺失、超出
+GIS_IMPORT_BOUNDS、文件内编号或坐标重复），合格记录经写入队列保存，
+并在同一事务中一次性插入事件关联。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import struct
+import tempfile
+import zipfile
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date
+from itertools import islice
+from typing import Callable, Iterator
+from xml.etree import ElementTree
+
+from flask import current_app
+
+from utils.excel_handler import (
+    IMPORT_COLUMN_MAPPING,
+    IMPORT_FIELDS,
+    IMPORT_MODE_INSERT,
+    IMPORT_MODES,
+    normalize_import_record,
+    save_import_records,
+)
+
+GIS_IMPORT_FORMATS = ("geojson", "json", "geojsonl", "kml", "zip", "shp", "gpkg")
+GIS_IMPORT_CHUNK_ROWS = 2000
+MAX_REPORTED_ERRORS = 200
+READ_BLOCK_SIZE = 1024 * 1024
+# Shapefile 面要素的各环不分组，用内部几何类型保留原始环序列
+_SHAPEFILE_POLYGON = "_ShapefilePolygon"
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+class GISImportError(Exception):
+    """文件无法解析或不受支持"""
+
+
+@dataclass
+class FeatureSource:
+    """
+    要素迭代器 [(属性字典, GeoJSON几何或None)]、要素总数（未知为None）
+    及文件声明的坐标系（utils.crs 坐标系，未声明为None）
+    """
+
+    features: Iterator[tuple[dict, dict | None]]
+    total: int | None = None
+    crs: object = None
+
+
+# ==================== 几何 ====================
+
+
+def _ring_centroid(ring) -> tuple[float, float, float]:
+    """环的有向面积与形心 (area, cx, cy)，退化环面积为0"""
+    area = cx = cy = 0.0
+    if len(ring) < 3:
+        return 0.0, 0.0, 0.0
+    x0, y0 = ring[0][0], ring[0][1]
+    for (x1, y1, *_), (x2, y2, *_) in zip(ring, ring[1:] + ring[:1]):
+        # 相对首点计算，避免大坐标值相乘损失精度
+        x1, y1, x2, y2 = x1 - x0, y1 - y0, x2 - x0, y2 - y0
+        cross = x1 * y2 - x2 * y1
+        area += cross
+        cx += (x1 + x2) * cross
+        cy += (y1 + y2) * cross
+    area /= 2
+    if area == 0:
+        return 0.0, 0.0, 0.0
+    return area, cx / (6 * area) + x0, cy / (6 * area) + y0
+
+
+def _rings_centroid(rings) -> tuple[float, float] | None:
+    """多个环（已按外环为正、内环为负定向）的面积加权形心"""
+    total = sx = sy = 0.0
+    for ring, sign in rings:
+        area, cx, cy = _ring_centroid(ring)
+        area = abs(area) * sign
+        total += area
+        sx += cx * area
+        sy += cy * area
+    if total == 0:
+        return None
+    return sx / total, sy / total
+
+
+def _vertex_mean(points) -> tuple[float, float] | None:
+    if not points:
+        return None
+    return (
+        sum(p[0] for p in points) / len(points),
+        sum(p[1] for p in points) / len(points),
+    )
+
+
+def polygon_rings(geometry: dict) -> list[tuple[list, int]] | None:
+    """面几何的环及符号（外环 1、内环 -1），非面几何返回 None"""
+    kind = geometry.get("type")
+    coords = geometry.get("coordinates") or []
+    if kind == _SHAPEFILE_POLYGON:
+        # Shapefile 外环顺时针（有向面积为负）、内环逆时针
+        return [(ring, 1 if _ring_centroid(ring)[0] < 0 else -1) for ring in coords]
+    if kind == "Polygon":
+        polygons = [coords]
+    elif kind == "MultiPolygon":
+        polygons = coords
+    else:
+        return None
+    return [
+        (ring, 1 if index == 0 else -1)
+        for polygon in polygons
+        for index, ring in enumerate(polygon)
+    ]
+
+
+def polygon_area(geometry: dict | None, crs) -> float | None:
+    """面几何的面积（平方米，扣除内环），非面几何返回 None"""
+    from utils.crs import ring_areas
+
+    rings = polygon_rings(geometry) if geometry else None
+    if not rings:
+        return None
+    try:
+        areas = ring_areas([ring for ring, _ in rings], crs)
+    except (TypeError, ValueError):
+        return None
+    return max(sum(area * sign for area, (_, sign) in zip(areas, rings)), 0.0)
+
+
+def representative_point(geometry: dict | None) -> tuple[float, float] | None:
+    """几何的代表点：点取坐标，多点/线取顶点均值，面取形心（扣除内环）"""
+    if not geometry:
+        return None
+    kind = geometry.get("type")
+    coords = geometry.get("coordinates")
+    try:
+        if kind == "Point":
+            return (float(coords[0]), float(coords[1])) if coords else None
+        if kind in ("MultiPoint", "LineString"):
+            return _vertex_mean(coords)
+        if kind == "MultiLineString":
+            return _vertex_mean([p for line in coords for p in line])
+        if kind in ("Polygon", "MultiPolygon", _SHAPEFILE_POLYGON):
+            rings = polygon_rings(geometry)
+            return _rings_centroid(rings) or _vertex_mean(
+                [p for ring, sign in rings if sign > 0 for p in ring]
+            )
+        if kind == "GeometryCollection":
+            for part in geometry.get("geometries") or []:
+                point = representative_point(part)
+                if point:
+                    return point
+    except (TypeError, IndexError, ValueError):
+        return None
+    return None
+
+
+def _parse_wkb(data: bytes, offset: int = 0) -> tuple[dict | None, int]:
+    """解析 WKB（含 ISO/EWKB 的 Z/M 标志）为 GeoJSON 几何，返回 (几何, 结束偏移)"""
+    order = "<" if data[offset] == 1 else ">"
+    (code,) = struct.unpack_from(order + "I", data, offset + 1)
+    offset += 5
+    if code & 0x20000000:
+        offset += 4  # EWKB SRID
+    # EWKB 以高位标志表示 Z/M，ISO WKB 以类型码千位表示
+    has_z = bool(code & 0x80000000) or (code & 0x0FFFFFFF) // 1000 in (1, 3)
+    has_m = bool(code & 0x40000000) or (code & 0x0FFFFFFF) // 1000 in (2, 3)
+    base = (code & 0x0FFFFFFF) % 1000
+    dims = 2 + has_z + has_m
+    point_format = order + "d" * dims
+    point_size = 8 * dims
+
+    def read_points():
+        nonlocal offset
+        (count,) = struct.unpack_from(order + "I", data, offset)
+        offset += 4
+        points = [
+            list(struct.unpack_from(point_format, data, offset + i * point_size)[:2])
+            for i in range(count)
+        ]
+        offset += count * point_size
+        return points
+
+    def read_rings():
+        nonlocal offset
+        (count,) = struct.unpack_from(order + "I", data, offset)
+        offset += 4
+        return [read_points() for _ in range(count)]
+
+    if base == 1:
+        x, y = struct.unpack_from(point_format, data, offset)[:2]
+        offset += point_size
+        if x != x or y != y:  # 空点以 NaN 表示
+            return None, offset
+        return {"type": "Point", "coordinates": [x, y]}, offset
+    if base == 2:
+        return {"type": "LineString", "coordinates": read_points()}, offset
+    if base == 3:
+        return {"type": "Polygon", "coordinates": read_rings()}, offset
+    if base in (4, 5, 6, 7):
+        (count,) = struct.unpack_from(order + "I", data, offset)
+        offset += 4
+        parts = []
+        for _ in range(count):
+            part, offset = _parse_wkb(data, offset)
+            parts.append(part)
+        if base == 7:
+            return {"type": "GeometryCollection", "geometries": parts}, offset
+        kind = {4: "MultiPoint", 5: "MultiLineString", 6: "MultiPolygon"}[base]
+        return {
+            "type": kind,
+            "coordinates": [p["coordinates"] for p in parts if p],
+        }, offset
+    raise GISImportError(f"不支持的WKB几何类型: {code}")
+
+
+# ==================== GeoJSON ====================
+
+
+def _iter_geojson_features(path: str):
+    """流式读取 FeatureCollection 的 features 数组，逐个解码要素"""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8-sig") as f:
+        buffer = f.read(READ_BLOCK_SIZE)
+        eof = not buffer
+
+        def refill(keep_from: int) -> int:
+            nonlocal buffer, eof
+            block = f.read(READ_BLOCK_SIZE)
+            eof = not block
+            buffer = buffer[keep_from:] + block
+            return 0
+
+        # 定位 "features": [
+        match = None
+        while match is None:
+            match = re.search(r'"features"\s*:\s*\[', buffer)
+            if match is None:
+                if eof:
+                    break
+                refill(max(0, len(buffer) - 64))
+        if match is None:
+            # 单个 Feature 或几何对象
+            f.seek(0)
+            document = json.load(f)
+            if document.get("type") == "Feature":
+                yield document
+            elif document.get("type") in (None, "FeatureCollection"):
+                return
+            else:
+                yield {"type": "Feature", "properties": {}, "geometry": document}
+            return
+
+        pos = match.end()
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos >= len(buffer):
+                if eof:
+                    return
+                pos = refill(pos)
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                feature, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise GISImportError("GeoJSON 文件不完整或格式错误")
+                pos = refill(pos)
+                continue
+            pos = end
+            yield feature
+
+
+def _iter_geojsonl_features(path: str):
+    with open(path, encoding="utf-8-sig") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                raise GISImportError(f"第{line_no}行不是有效的 GeoJSON")
+
+
+def _geojson_declared_crs(path: str):
+    """GeoJSON 2008 规范的 crs 成员（位于 features 之前时才识别）"""
+    from utils.crs import CRS_WGS84, CRSError, crs_from_epsg
+
+    with open(path, encoding="utf-8-sig", errors="ignore") as f:
+        head = f.read(64 * 1024)
+    head = head.split('"features"', 1)[0]
+    match = re.search(r'"crs"\s*:\s*\{.*?"name"\s*:\s*"([^"]+)"', head, re.DOTALL)
+    if match is None:
+        return None
+    name = match.group(1)
+    if name.upper().endswith("CRS84"):
+        return CRS_WGS84
+    code = re.search(r"EPSG:+(\d+)", name, re.IGNORECASE)
+    try:
+        if code is None:
+            raise CRSError(f"无法识别的坐标系: {name}")
+        return crs_from_epsg(int(code.group(1)))
+    except CRSError as e:
+        raise GISImportError(str(e))
+
+
+def _geojson_source(features, crs=None) -> FeatureSource:
+    return FeatureSource(
+        (
+            (feature.get("properties") or {}, feature.get("geometry"))
+            for feature in features
+            if isinstance(feature, dict)
+        ),
+        crs=crs,
+    )
+
+
+# ==================== KML ====================
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _kml_coordinates(text: str | None) -> list[list[float]]:
+    points = []
+    for token in (text or "").split():
+        values = token.split(",")
+        if len(values) >= 2:
+            points.append([float(values[0]), float(values[1])])
+    return points
+
+
+def _kml_geometry(element) -> dict | None:
+    kind = _local_name(element.tag)
+    if kind == "Point":
+        points = _kml_coordinates(_child_text(element, "coordinates"))
+        return {"type": "Point", "coordinates": points[0]} if points else None
+    if kind == "LineString":
+        points = _kml_coordinates(_child_text(element, "coordinates"))
+        return {"type": "LineString", "coordinates": points}
+    if kind == "Polygon":
+        rings = []
+        for boundary in element:
+            if _local_name(boundary.tag) in ("outerBoundaryIs", "innerBoundaryIs"):
+                for ring in boundary.iter():
+                    if _local_name(ring.tag) == "coordinates":
+                        points = _kml_coordinates(ring.text)
+                        if _local_name(boundary.tag) == "outerBoundaryIs":
+                            rings.insert(0, points)
+                        else:
+                            rings.append(points)
+        return {"type": "Polygon", "coordinates": rings} if rings else None
+    if kind == "MultiGeometry":
+        parts = [_kml_geometry(child) for child in element]
+        return {"type": "GeometryCollection", "geometries": [p for p in parts if p]}
+    return None
+
+
+def _child_text(element, name: str) -> str | None:
+    for child in element.iter():
+        if _local_name(child.tag) == name:
+            return child.text
+    return None
+
+
+def _iter_kml_features(path: str):
+    for _, element in ElementTree.iterparse(path, events=("end",)):
+        if _local_name(element.tag) != "Placemark":
+            continue
+        properties = {}
+        geometry = None
+        for child in element:
+            name = _local_name(child.tag)
+            if name in ("name", "description") and child.text:
+                properties[name] = child.text.strip()
+            elif name == "ExtendedData":
+                for data in child.iter():
+                    data_tag = _local_name(data.tag)
+                    if data_tag == "Data" and data.get("name"):
+                        properties[data.get("name")] = _child_text(data, "value")
+                    elif data_tag == "SimpleData" and data.get("name"):
+                        properties[data.get("name")] = data.text
+            elif geometry is None:
+                geometry = _kml_geometry(child)
+        element.clear()
+        yield properties, geometry
+
+
+# ==================== Shapefile ====================
+
+
+def _dbf_encoding(dbf_path: str, ldid: int) -> str:
+    cpg_path = os.path.splitext(dbf_path)[0] + ".cpg"
+    if os.path.exists(cpg_path):
+        with open(cpg_path, encoding="ascii", errors="ignore") as f:
+            name = f.read().strip().lower()
+        if name in ("936", "cp936", "gb2312"):
+            return "gbk"
+        if name:
+            return name
+    if ldid == 0x4D:
+        return "gbk"
+    return current_app.config.get("GIS_IMPORT_DBF_ENCODING", "gbk")
+
+
+def _dbf_value(raw: bytes, field_type: str, encoding: str):
+    text = raw.decode(encoding, errors="replace").strip().rstrip("\x00")
+    if not text or text.startswith("*"):
+        return None
+    if field_type in ("N", "F"):
+        return text
+    if field_type == "D":
+        try:
+            return date(int(text[:4]), int(text[4:6]), int(text[6:8]))
+        except ValueError:
+            return None
+    if field_type == "L":
+        return {"T": "是", "Y": "是", "F": "否", "N": "否"}.get(text.upper())
+    return text
+
+
+def _iter_dbf_records(f, dbf_path: str):
+    header = f.read(32)
+    count, header_len, record_len = struct.unpack("<IHH", header[4:12])
+    encoding = _dbf_encoding(dbf_path, header[29])
+    fields = []
+    while True:
+        descriptor = f.read(32)
+        if not descriptor or descriptor[0] == 0x0D:
+            break
+        name = descriptor[:11].split(b"\x00", 1)[0].decode(encoding, errors="replace")
+        fields.append((name, chr(descriptor[11]), descriptor[16]))
+    f.seek(header_len)
+    for _ in range(count):
+        record = f.read(record_len)
+        if len(record) < record_len:
+            break
+        if record[:1] == b"*":
+            yield None  # 已删除记录，仍占一个几何位置
+            continue
+        values = {}
+        offset = 1
+        for name, field_type, length in fields:
+            values[name] = _dbf_value(
+                record[offset : offset + length], field_type, encoding
+            )
+            offset += length
+        yield values
+
+
+def _shp_geometry(content: bytes) -> dict | None:
+    (shape_type,) = struct.unpack_from("<i", content, 0)
+    base = shape_type % 10
+    if shape_type == 0:
+        return None
+    if base == 1:
+        x, y = struct.unpack_from("<2d", content, 4)
+        return {"type": "Point", "coordinates": [x, y]}
+    if base == 8:
+        (count,) = struct.unpack_from("<i", content, 36)
+        points = struct.unpack_from(f"<{count * 2}d", content, 40)
+        return {
+            "type": "MultiPoint",
+            "coordinates": [list(points[i : i + 2]) for i in range(0, len(points), 2)],
+        }
+    if base in (3, 5):
+        num_parts, num_points = struct.unpack_from("<2i", content, 36)
+        parts = list(struct.unpack_from(f"<{num_parts}i", content, 44)) + [num_points]
+        values = struct.unpack_from(f"<{num_points * 2}d", content, 44 + 4 * num_parts)
+        lines = [
+            [list(values[i * 2 : i * 2 + 2]) for i in range(start, end)]
+            for start, end in zip(parts, parts[1:])
+        ]
+        if base == 3:
+            return {"type": "MultiLineString", "coordinates": lines}
+        return {"type": _SHAPEFILE_POLYGON, "coordinates": lines}
+    raise GISImportError(f"不支持的Shapefile几何类型: {shape_type}")
+
+
+def _prj_crs(shp_path: str):
+    """按 .prj 识别坐标系，没有 .prj 时返回 None"""
+    from utils.crs import CRSError, crs_from_wkt
+
+    prj_path = os.path.splitext(shp_path)[0] + ".prj"
+    if not os.path.exists(prj_path):
+        return None
+    with open(prj_path, encoding="utf-8", errors="ignore") as f:
+        try:
+            return crs_from_wkt(f.read())
+        except CRSError as e:
+            raise GISImportError(f"Shapefile 坐标系不受支持：{e}")
+
+
+def _find_sibling(path: str, ext: str) -> str:
+    base = os.path.splitext(path)[0]
+    for candidate in (base + ext, base + ext.upper()):
+        if os.path.exists(candidate):
+            return candidate
+    raise GISImportError(f"缺少 {os.path.basename(base)}{ext} 文件")
+
+
+def _shapefile_source(shp_path: str) -> FeatureSource:
+    crs = _prj_crs(shp_path)
+    dbf_path = _find_sibling(shp_path, ".dbf")
+    with open(dbf_path, "rb") as f:
+        (total,) = struct.unpack("<I", f.read(8)[4:8])
+
+    def features():
+        with open(shp_path, "rb") as shp, open(dbf_path, "rb") as dbf:
+            shp.seek(100)
+            for properties in _iter_dbf_records(dbf, dbf_path):
+                header = shp.read(8)
+                if len(header) < 8:
+                    break
+                _, length_words = struct.unpack(">2i", header)
+                content = shp.read(length_words * 2)
+                if properties is None:
+                    continue
+                yield properties, _shp_geometry(content)
+
+    return FeatureSource(features(), total, crs)
+
+
+def _extract_shapefile(zip_path: str, directory: str) -> str:
+    """解压 zip 中的第一个 Shapefile（只解压同名的组成文件），返回 .shp 路径"""
+    try:
+        archive = zipfile.ZipFile(zip_path)
+    except zipfile.BadZipFile:
+        raise GISImportError("不是有效的 zip 压缩包")
+    with archive:
+        names = [n for n in archive.namelist() if not n.endswith("/")]
+        shp_names = [n for n in names if n.lower().endswith(".shp")]
+        if not shp_names:
+            raise GISImportError("压缩包中没有 .shp 文件")
+        stem = os.path.splitext(shp_names[0])[0]
+        for name in names:
+            if os.path.splitext(name)[0] != stem:
+                continue
+            ext = os.path.splitext(name)[1].lower()
+            target = os.path.join(directory, "layer" + ext)
+            with archive.open(name) as src, open(target, "wb") as dst:
+                while block := src.read(READ_BLOCK_SIZE):
+                    dst.write(block)
+    return os.path.join(directory, "layer.shp")
+
+
+# ==================== GeoPackage ====================
+
+
+def _gpkg_geometry(blob: bytes | None) -> dict | None:
+    if not blob or blob[:2] != b"GP":
+        return None
+    flags = blob[3]
+    if flags & 0x10:
+        return None  # 空几何
+    envelope_size = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}.get((flags >> 1) & 0x07, 0)
+    geometry, _ = _parse_wkb(blob, 8 + envelope_size)
+    return geometry
+
+
+def _gpkg_source(path: str) -> FeatureSource:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = conn.execute(
+            "SELECT c.table_name, g.column_name, g.srs_id FROM gpkg_contents c "
+            "JOIN gpkg_geometry_columns g ON g.table_name = c.table_name "
+            "WHERE c.data_type = 'features' ORDER BY c.rowid LIMIT 1"
+        ).fetchone()
+    except sqlite3.DatabaseError:
+        conn.close()
+        raise GISImportError("不是有效的 GeoPackage 文件")
+    if row is None:
+        conn.close()
+        raise GISImportError("GeoPackage 中没有要素表")
+    table, geometry_column, srs_id = row
+    crs = None
+    if srs_id and srs_id > 0:
+        from utils.crs import CRSError, crs_from_epsg
+
+        try:
+            crs = crs_from_epsg(srs_id)
+        except CRSError as e:
+            conn.close()
+            raise GISImportError(str(e))
+    table = table.replace('"', '""')
+    total = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+    def features():
+        try:
+            cursor = conn.execute(f'SELECT * FROM "{table}"')
+            columns = [d[0] for d in cursor.description]
+            geometry_index = columns.index(geometry_column)
+            while rows := cursor.fetchmany(GIS_IMPORT_CHUNK_ROWS):
+                for values in rows:
+                    properties = dict(zip(columns, values))
+                    del properties[geometry_column]
+                    yield properties, _gpkg_geometry(values[geometry_index])
+        finally:
+            conn.close()
+
+    return FeatureSource(features(), total, crs)
+
+
+# ==================== 导入 ====================
+
+
+def open_gis_source(path: str, work_dir: str) -> FeatureSource:
+    """按扩展名打开GIS文件，work_dir 用于解压 Shapefile 压缩包"""
+    ext = path.rsplit(".", 1)[-1].lower()
+    if ext in ("geojson", "json"):
+        return _geojson_source(
+            _iter_geojson_features(path), _geojson_declared_crs(path)
+        )
+    if ext == "geojsonl":
+        return _geojson_source(_iter_geojsonl_features(path))
+    if ext == "kml":
+        return FeatureSource(_iter_kml_features(path))
+    if ext == "zip":
+        return _shapefile_source(_extract_shapefile(path, work_dir))
+    if ext == "shp":
+        return _shapefile_source(path)
+    if ext == "gpkg":
+        return _gpkg_source(path)
+    raise GISImportError(f"不支持的文件格式: {ext}")
+
+
+def parse_field_mapping(text: str | None) -> dict[str, str]:
+    """
+    解析属性映射：JSON 对象 {"源列名": "图斑字段"}，
+    或每行一条 "源列名=图斑字段"
+    """
+    text = (text or "").strip()
+    if not text:
+        return {}
+    if text.startswith("{"):
+        try:
+            mapping = json.loads(text)
+        except json.JSONDecodeError:
+            raise GISImportError("属性映射不是有效的 JSON")
+    else:
+        mapping = {}
+        for line in text.splitlines():
+            if line.strip():
+                source, sep, target = line.partition("=")
+                if not sep:
+                    raise GISImportError(f"属性映射格式错误: {line.strip()}")
+                mapping[source.strip()] = target.strip()
+    unknown = [v for v in mapping.values() if v not in IMPORT_FIELDS]
+    if unknown:
+        raise GISImportError(f"未知的图斑字段: {', '.join(map(str, unknown))}")
+    return {str(k).strip(): v for k, v in mapping.items()}
+
+
+def _column_resolver(overrides: dict[str, str]) -> Callable[[str], str | None]:
+    """源列名 -> 图斑字段（按列名缓存）"""
+    configured = parse_field_mapping(
+        current_app.config.get("GIS_IMPORT_FIELD_MAPPING", "")
+    )
+    exact = {field: field for field in IMPORT_FIELDS}
+    exact.update(IMPORT_COLUMN_MAPPING)
+    exact.update(configured)
+    exact.update(overrides)
+    lowered = {field.lower(): field for field in IMPORT_FIELDS}
+    # DBF列名最长10个字符，截断后唯一的才能识别
+    truncated = Counter(field[:10].lower() for field in IMPORT_FIELDS)
+    for field in IMPORT_FIELDS:
+        if truncated[field[:10].lower()] == 1:
+            lowered.setdefault(field[:10].lower(), field)
+    cache: dict[str, str | None] = {}
+
+    def resolve(column: str) -> str | None:
+        if column not in cache:
+            key = str(column).strip()
+            cache[column] = exact.get(key) or lowered.get(key.lower())
+        return cache[column]
+
+    return resolve
+
+
+def _import_bounds() -> tuple[float, float, float, float]:
+    text = current_app.config.get("GIS_IMPORT_BOUNDS", "")
+    if not text:
+        return -180.0, -90.0, 180.0, 90.0
+    min_lon, min_lat, max_lon, max_lat = (float(v) for v in text.split(","))
+    return (
+        max(min_lon, -180.0),
+        max(min_lat, -90.0),
+        min(max_lon, 180.0),
+        min(max_lat, 90.0),
+    )
+
+
+def validate_coordinates(records, bounds, seen_codes: set, seen_points: dict):
+    """
+    批量校验一块记录，返回 (合格记录, [(记录, 原因)])
+
+    坐标缺失或超出范围、编号在文件中重复、坐标与文件中已出现的
+    其他编号完全相同（6位小数）的记录不导入。
+    """
+    import numpy as np
+
+    lons = np.array(
+        [
+            r.get("longitude") if r.get("longitude") is not None else np.nan
+            for r in records
+        ],
+        dtype=float,
+    )
+    lats = np.array(
+        [
+            r.get("latitude") if r.get("latitude") is not None else np.nan
+            for r in records
+        ],
+        dtype=float,
+    )
+    missing = np.isnan(lons) | np.isnan(lats)
+    min_lon, min_lat, max_lon, max_lat = bounds
+    with np.errstate(invalid="ignore"):
+        outside = ~missing & (
+            (lons < min_lon) | (lons > max_lon) | (lats < min_lat) | (lats > max_lat)
+        )
+
+    valid, rejected = [], []
+    for record, is_missing, is_outside in zip(records, missing, outside):
+        code = record.get("tuban_code")
+        if not code or not record.get("park_name"):
+            rejected.append((record, "缺少图斑编号或地质公园名称"))
+        elif is_missing:
+            rejected.append((record, "缺少坐标"))
+        elif is_outside:
+            rejected.append(
+                (record, f"坐标超出范围 ({record['longitude']}, {record['latitude']})")
+            )
+        elif code in seen_codes:
+            rejected.append((record, "图斑编号在文件中重复"))
+        else:
+            point = (record["longitude"], record["latitude"])
+            other = seen_points.get(point)
+            if other is not None:
+                rejected.append((record, f"坐标与图斑 {other} 重复"))
+                continue
+            seen_codes.add(code)
+            seen_points[point] = code
+            valid.append(record)
+    return valid, rejected
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _transform_rows(rows, indexes, source_crs, target_crs) -> None:
+    """把指定行的经纬度从源坐标系批量转换到存储坐标系（无法解析的坐标保持原值）"""
+    from utils.crs import transform
+
+    lons, lats = transform(
+        [_as_float(rows[i]["longitude"]) for i in indexes],
+        [_as_float(rows[i]["latitude"]) for i in indexes],
+        source_crs,
+        target_crs,
+    )
+    for index, lon, lat in zip(indexes, lons.tolist(), lats.tolist()):
+        if lon == lon and lat == lat:
+            rows[index]["longitude"], rows[index]["latitude"] = lon, lat
+
+
+def import_gis_file(
+    path: str,
+    mode: str = IMPORT_MODE_INSERT,
+    event_id: int | None = None,
+    mapping: dict[str, str] | None = None,
+    crs=None,
+    chunk_size: int = GIS_IMPORT_CHUNK_ROWS,
+    progress: Callable[..., None] | None = None,
+) -> dict:
+    """
+    分块导入GIS文件
+
+    Args:
+        mode: "insert" 跳过已存在的图斑编号；"upsert" 只更新内容有变化的图斑
+        event_id: 导入的图斑（含已存在的）关联到该事件
+        mapping: 本次导入的属性映射 {"源列名": "图斑字段"}
+        crs: 源坐标系（名称或 EPSG 代码），为空时按文件声明识别，默认 WGS84
+        progress: 每块保存后调用 progress(processed=, total=, counts=)
+
+    Returns:
+        {"inserted", "updated", "unchanged", "skipped", "rejected", "linked",
+         "errors": [前 MAX_REPORTED_ERRORS 条被拒绝要素的原因]}
+    """
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"不支持的导入模式: {mode}")
+    resolve = _column_resolver(mapping or {})
+    bounds = _import_bounds()
+
+    totals = Counter(
+        {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0, "rejected": 0}
+    )
+    if event_id is not None:
+        totals["linked"] = 0
+    errors: list[str] = []
+    seen_codes: set = set()
+    seen_points: dict = {}
+    processed = 0
+
+    from utils.crs import (
+        CRS_WGS84,
+        CRSError,
+        GaussKruger,
+        normalize_crs,
+        same_coordinates,
+    )
+
+    with tempfile.TemporaryDirectory(prefix="gis_import_") as work_dir:
+        source = open_gis_source(path, work_dir)
+        try:
+            source_crs = normalize_crs(crs or source.crs or CRS_WGS84)
+            target_crs = normalize_crs(current_app.config["TUBAN_COORDINATE_CRS"])
+        except CRSError as e:
+            raise GISImportError(str(e))
+        convert = not same_coordinates(source_crs, target_crs)
+        # 投影坐标数据中属性里的经纬度不是投影坐标，不参与转换
+        convert_attributes = not isinstance(source_crs, GaussKruger)
+
+        features = iter(source.features)
+        while chunk := list(islice(features, chunk_size)):
+            rows, located = [], []
+            for properties, geometry in chunk:
+                row = {}
+                for column, value in properties.items():
+                    field = resolve(column)
+                    if field is not None and value is not None:
+                        row[field] = value
+                point = representative_point(geometry)
+                if point is not None:
+                    row["longitude"], row["latitude"] = point
+                    located.append(len(rows))
+                elif convert_attributes and "longitude" in row and "latitude" in row:
+                    located.append(len(rows))
+                if row.get("area") is None:
+                    area = polygon_area(geometry, source_crs)
+                    if area:
+                        row["area"] = round(area, 2)
+                rows.append(row)
+            if convert and located:
+                _transform_rows(rows, located, source_crs, target_crs)
+            records = [normalize_import_record(row) for row in rows]
+
+            valid, rejected = validate_coordinates(
+                records, bounds, seen_codes, seen_points
+            )
+            for record, reason in rejected:
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"{record.get('tuban_code') or '(无编号)'}: {reason}")
+            totals["rejected"] += len(rejected)
+            if valid:
+                totals.update(save_import_records(valid, mode, event_id))
+
+            processed += len(chunk)
+            if progress is not None:
+                progress(processed=processed, total=source.total, counts=dict(totals))
+
+    return dict(totals, errors=errors)
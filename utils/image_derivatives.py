@@ -0,0 +1,215 @@
+"""
+图片派生图模块
+
+图斑图片上传后在后台线程池中生成缩略图（thumb）和预览图（medium），
+列表和详情页只加载缩略图，查看器加载预览图，原图仅在需要时下载。
+
+派生图默认编码为 WebP，Pillow 不支持 WebP 时退回 JPEG；存放在 uploads/images，
+文件名记录在 TubanImage 的 thumb_filename / medium_filename 字段。原图尺寸
+不超过目标尺寸时不生成该规格，访问时回退原图。内容相同的图片（同一blob）
+共用派生图，已存在时不再重复生成。
+
+Pillow 为可选依赖，未安装时跳过生成，图片访问始终返回原图。
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from config import Config
+from models import db
+from models.tuban_image import TubanImage
+from utils.blob_store import image_source_path
+
+DERIVATIVE_SIZES = ("thumb", "medium")
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _import_pil():
+    try:
+        from PIL import Image, ImageOps, features
+    except ImportError:
+        return None
+    return Image, ImageOps, features
+
+
+def is_available() -> bool:
+    """是否可以生成派生图（已安装Pillow）"""
+    return _import_pil() is not None
+
+
+def get_size_limits() -> dict[str, int]:
+    """各规格的最长边像素"""
+    return {
+        "thumb": Config.IMAGE_THUMB_SIZE,
+        "medium": Config.IMAGE_MEDIUM_SIZE,
+    }
+
+
+def get_output_format() -> tuple[str, str]:
+    """
+    派生图编码格式
+
+    Returns:
+        (Pillow格式名, 文件扩展名)
+    """
+    pil = _import_pil()
+    if Config.IMAGE_DERIVATIVE_FORMAT == "webp" and pil and pil[2].check("webp"):
+        return "WEBP", "webp"
+    return "JPEG", "jpg"
+
+
+def derivative_filename(filename: str, size: str, ext: str) -> str:
+    """派生图文件名：<原文件名主干>_<规格>.<扩展名>"""
+    stem = filename.rsplit(".", 1)[0]
+    return f"{stem}_{size}.{ext}"
+
+
+def _prepare_mode(img, pil_format: str):
+    """转换为目标格式可编码的颜色模式（JPEG不支持透明通道，铺白底）"""
+    Image = _import_pil()[0]
+    has_alpha = img.mode in ("RGBA", "LA") or (
+        img.mode == "P" and "transparency" in img.info
+    )
+    if pil_format == "WEBP":
+        return img.convert("RGBA" if has_alpha else "RGB")
+    if has_alpha:
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def _save_atomic(img, path: str, pil_format: str) -> None:
+    """先写临时文件再替换，避免并发访问读到半个文件"""
+    # 相同内容的图片共用派生图，可能有多个线程同时生成，临时文件按线程区分
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    options = {"quality": Config.IMAGE_DERIVATIVE_QUALITY}
+    if pil_format == "JPEG":
+        options.update(optimize=True, progressive=True)
+    else:
+        options["method"] = 4
+    try:
+        img.save(tmp_path, format=pil_format, **options)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def generate_derivatives(
+    images_folder: str, filename: str, force: bool = False
+) -> dict[str, str | None]:
+    """
+    为一张原图生成各规格派生图
+
+    Args:
+        force: 为False时各规格派生图均已存在则直接返回，不重新生成
+
+    Returns:
+        {规格: 派生图文件名}，未生成的规格为None
+    """
+    result: dict[str, str | None] = {size: None for size in DERIVATIVE_SIZES}
+    pil = _import_pil()
+    if pil is None:
+        return result
+    Image, ImageOps, _ = pil
+
+    limits = get_size_limits()
+    pil_format, ext = get_output_format()
+    existing = {
+        size: derivative_filename(filename, size, ext) for size in DERIVATIVE_SIZES
+    }
+    if not force and all(
+        os.path.exists(os.path.join(images_folder, name)) for name in existing.values()
+    ):
+        return existing
+
+    source_path = image_source_path(images_folder, filename)
+    os.makedirs(images_folder, exist_ok=True)
+
+    with Image.open(source_path) as img:
+        # JPEG 可在解码阶段直接按比例缩小，大图省去大部分解码开销
+        largest = max(limits.values())
+        img.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        img = _prepare_mode(img, pil_format)
+
+        # 从大到小依次缩放，小规格基于上一规格结果生成
+        current = img
+        for size in sorted(DERIVATIVE_SIZES, key=lambda s: limits[s], reverse=True):
+            limit = limits[size]
+            if max(img.size) <= limit:
+                continue
+            current = current.copy()
+            current.thumbnail((limit, limit), Image.Resampling.LANCZOS)
+            name = derivative_filename(filename, size, ext)
+            _save_atomic(current, os.path.join(images_folder, name), pil_format)
+            result[size] = name
+
+    return result
+
+
+def _record_derivatives(image_id: int, names: dict[str, str | None]):
+    """记录派生图文件名（写入线程中执行）"""
+    image = db.session.get(TubanImage, image_id)
+    if image is None:
+        return None
+    image.thumb_filename = names.get("thumb")
+    image.medium_filename = names.get("medium")
+    return image.id
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, Config.IMAGE_DERIVATIVE_WORKERS),
+                    thread_name_prefix="image-derivative",
+                )
+    return _executor
+
+
+def _build_and_record(app, image_id: int, filename: str) -> None:
+    from utils.write_queue import run_write
+
+    with app.app_context():
+        images_folder = os.path.join(app.config["UPLOAD_FOLDER"], "images")
+        try:
+            names = generate_derivatives(images_folder, filename)
+            if any(names.values()):
+                run_write(_record_derivatives, image_id, names)
+        except Exception as e:
+            print(f"生成图片派生图失败 {filename}: {e}")
+        finally:
+            db.session.remove()
+
+
+def submit_derivatives(image_id: int, filename: str) -> bool:
+    """
+    提交派生图生成任务到后台线程池（需要在应用上下文中调用）
+
+    Returns:
+        是否已提交（未安装Pillow时返回False）
+    """
+    if not is_available():
+        return False
+    app = current_app._get_current_object()
+    _get_executor().submit(_build_and_record, app, image_id, filename)
+    return True
+
+
+def resolve_variant(image: TubanImage | None, size: str) -> str | None:
+    """返回指定规格的派生图文件名，没有时返回None"""
+    if image is None or size not in DERIVATIVE_SIZES:
+        return None
+    return getattr(image, f"{size}_filename")
@@ -0,0 +1,218 @@
+"""
+卫片瓦片金字塔模块
+
+大幅面卫片上传后在后台线程中切分为 Deep Zoom（DZI）瓦片金字塔：
+第 L 层尺寸为原图按 2^(最大层-L) 缩小，每层切为 TILE_SIZE 像素的 JPEG 瓦片，
+详情页查看器只请求视口内的瓦片。
+
+目录结构（uploads/images 下，内容相同的卫片共用）：
+    tiles/<原文件名主干>.dzi                       清单（最后写入，作为完成标记）
+    tiles/<原文件名主干>_files/<层>/<列>_<行>.jpg   瓦片
+
+Pillow 需要先把整幅图解码到内存，逐层用 reduce(2) 缩小，
+峰值内存约为原图解码后大小的1.5倍；TILE_WORKERS 默认为1，避免并发切图。
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from config import Config
+from utils.blob_store import image_source_path
+
+TILES_DIRNAME = "tiles"
+TILE_FORMAT = "jpg"
+DZI_NAMESPACE = "http://schemas.microsoft.com/deepzoom/2008"
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _import_pil():
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+    return Image, ImageOps
+
+
+def tiles_folder(images_folder: str) -> str:
+    return os.path.join(images_folder, TILES_DIRNAME)
+
+
+def manifest_filename(filename: str) -> str:
+    """DZI清单文件名（相对 tiles 目录）"""
+    return f"{filename.rsplit('.', 1)[0]}.dzi"
+
+
+def tile_dirname(filename: str) -> str:
+    """瓦片目录名（相对 tiles 目录）"""
+    return f"{filename.rsplit('.', 1)[0]}_files"
+
+
+def manifest_relative_path(filename: str) -> str:
+    """DZI清单相对 uploads/images 的路径"""
+    return os.path.join(TILES_DIRNAME, manifest_filename(filename))
+
+
+def tile_relative_path(filename: str, level: int, col: int, row: int) -> str:
+    """瓦片相对 uploads/images 的路径"""
+    return os.path.join(
+        TILES_DIRNAME, tile_dirname(filename), str(level), f"{col}_{row}.{TILE_FORMAT}"
+    )
+
+
+def has_tiles(images_folder: str, filename: str) -> bool:
+    """瓦片金字塔是否已生成完成"""
+    return os.path.isfile(
+        os.path.join(tiles_folder(images_folder), manifest_filename(filename))
+    )
+
+
+def build_manifest(width: int, height: int) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<Image xmlns="{DZI_NAMESPACE}" TileSize="{Config.TILE_SIZE}" '
+        f'Overlap="0" Format="{TILE_FORMAT}">'
+        f'<Size Width="{width}" Height="{height}"/></Image>\n'
+    )
+
+
+def _flatten_rgb(img):
+    """转为RGB，透明区域铺白底"""
+    Image = _import_pil()[0]
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def _write_level(img, level_dir: str) -> int:
+    """把一层图像切成瓦片，返回瓦片数"""
+    tile_size = Config.TILE_SIZE
+    width, height = img.size
+    os.makedirs(level_dir, exist_ok=True)
+    count = 0
+    for col in range(math.ceil(width / tile_size)):
+        for row in range(math.ceil(height / tile_size)):
+            left, top = col * tile_size, row * tile_size
+            box = (
+                left,
+                top,
+                min(left + tile_size, width),
+                min(top + tile_size, height),
+            )
+            img.crop(box).save(
+                os.path.join(level_dir, f"{col}_{row}.{TILE_FORMAT}"),
+                format="JPEG",
+                quality=Config.TILE_QUALITY,
+            )
+            count += 1
+    return count
+
+
+def build_tile_pyramid(
+    images_folder: str, filename: str, force: bool = False
+) -> dict | None:
+    """
+    为一张卫片生成瓦片金字塔
+
+    Returns:
+        {"width", "height", "levels", "tiles"}；未安装Pillow、
+        图片尺寸不足 TILE_MIN_EDGE 或已生成（非force）时返回None
+    """
+    pil = _import_pil()
+    if pil is None:
+        return None
+    Image, ImageOps = pil
+    if has_tiles(images_folder, filename) and not force:
+        return None
+
+    # 卫片像素数远超 Pillow 默认的解压炸弹阈值
+    if Image.MAX_IMAGE_PIXELS and Image.MAX_IMAGE_PIXELS < Config.TILE_MAX_PIXELS:
+        Image.MAX_IMAGE_PIXELS = Config.TILE_MAX_PIXELS
+
+    root = tiles_folder(images_folder)
+    final_dir = os.path.join(root, tile_dirname(filename))
+    work_dir = f"{final_dir}.tmp"
+    manifest_path = os.path.join(root, manifest_filename(filename))
+
+    with Image.open(image_source_path(images_folder, filename)) as source:
+        width, height = source.size
+        if max(width, height) < Config.TILE_MIN_EDGE:
+            return None
+        img = _flatten_rgb(ImageOps.exif_transpose(source))
+    width, height = img.size
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    max_level = math.ceil(math.log2(max(width, height)))
+    tiles = 0
+    try:
+        for level in range(max_level, -1, -1):
+            tiles += _write_level(img, os.path.join(work_dir, str(level)))
+            if level > 0:
+                img = img.reduce(2)
+
+        # 先替换瓦片目录，最后写清单，清单存在即表示金字塔完整
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        shutil.rmtree(final_dir, ignore_errors=True)
+        os.replace(work_dir, final_dir)
+        tmp_manifest = f"{manifest_path}.tmp"
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            f.write(build_manifest(width, height))
+        os.replace(tmp_manifest, manifest_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {"width": width, "height": height, "levels": max_level + 1, "tiles": tiles}
+
+
+def remove_tiles(images_folder: str, filename: str) -> None:
+    """删除一张卫片的瓦片金字塔"""
+    root = tiles_folder(images_folder)
+    manifest_path = os.path.join(root, manifest_filename(filename))
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    shutil.rmtree(os.path.join(root, tile_dirname(filename)), ignore_errors=True)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, Config.TILE_WORKERS),
+                    thread_name_prefix="image-tiles",
+                )
+    return _executor
+
+
+def _build_in_background(images_folder: str, filename: str) -> None:
+    try:
+        build_tile_pyramid(images_folder, filename)
+    except Exception as e:
+        print(f"生成卫片瓦片失败 {filename}: {e}")
+
+
+def submit_tiles(filename: str) -> bool:
+    """
+    提交瓦片生成任务到后台线程（需要在应用上下文中调用）
+
+    Returns:
+        是否已提交（未安装Pillow时返回False）
+    """
+    if _import_pil() is None:
+        return False
+    images_folder = os.path.join(current_app.config["UPLOAD_FOLDER"], "images")
+    _get_executor().submit(_build_in_background, images_folder, filename)
+    return True
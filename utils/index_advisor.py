@@ -0,0 +1,197 @@
+"""
+索引顾问模块
+
+按高频查询的真实形态（图斑列表、超期列表、地图数据、首页仪表盘）构造查询，
+通过 SQLite 的 EXPLAIN QUERY PLAN 检查执行计划，发现全表扫描时报告出来。
+查询形态需与对应路由保持一致，路由查询条件调整时请同步修改这里。
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import event
+
+from models import db
+from models.tuban import Tuban
+
+# 匹配全表扫描（包括按索引顺序遍历整张表的 SCAN ... USING INDEX）
+FULL_SCAN_PATTERN = re.compile(r"^SCAN (tubans)\b")
+
+UNRESOLVED_STATUSES = ["未整改", "整改中"]
+
+
+class _PlanCaptured(Exception):
+    """已获取执行计划，用于中止实际查询"""
+
+
+def _tuban_list_default():
+    # tuban.list：无筛选，按创建时间倒序分页
+    return (
+        Tuban.query.filter_by(is_deleted=0)
+        .order_by(Tuban.created_at.desc())
+        .limit(20)
+    )
+
+
+def _tuban_list_by_park():
+    # tuban.list：按地质公园筛选
+    return (
+        Tuban.query.filter_by(is_deleted=0)
+        .filter(Tuban.park_name == "示例公园")
+        .order_by(Tuban.created_at.desc())
+        .limit(20)
+    )
+
+
+def _tuban_list_by_status():
+    # tuban.list：按整改进展筛选
+    return (
+        Tuban.query.filter_by(is_deleted=0)
+        .filter(Tuban.rectify_status == "未整改")
+        .order_by(Tuban.created_at.desc())
+        .limit(20)
+    )
+
+
+def _stats_overdue_list():
+    # stats.api_overdue_list
+    return Tuban.query.filter(
+        Tuban.is_deleted == 0,
+        Tuban.rectify_deadline < datetime.now().date(),
+        Tuban.rectify_status.in_(UNRESOLVED_STATUSES),
+    ).order_by(Tuban.rectify_deadline)
+
+
+def _map_tubans():
+    # map.api_tubans：无筛选
+    return Tuban.query.filter(
+        Tuban.is_deleted == 0, Tuban.longitude.isnot(None), Tuban.latitude.isnot(None)
+    )
+
+
+def _map_tubans_by_zone():
+    # map.api_tubans：按功能区筛选
+    return Tuban.query.filter(
+        Tuban.is_deleted == 0,
+        Tuban.longitude.isnot(None),
+        Tuban.latitude.isnot(None),
+        Tuban.func_zone == "核心区",
+    )
+
+
+def _index_total_count():
+    # app.index：图斑总数
+    return Tuban.query.filter_by(is_deleted=0).with_entities(db.func.count(Tuban.id))
+
+
+def _index_problem_stats():
+    # app.index：问题类型统计
+    return (
+        db.session.query(Tuban.problem_type, db.func.count(Tuban.id))
+        .filter_by(is_deleted=0)
+        .group_by(Tuban.problem_type)
+    )
+
+
+def _index_zone_stats():
+    # app.index：功能区统计
+    return (
+        db.session.query(Tuban.func_zone, db.func.count(Tuban.id))
+        .filter_by(is_deleted=0)
+        .group_by(Tuban.func_zone)
+    )
+
+
+def _index_closed_count():
+    # app.index：已销号数量
+    return Tuban.query.filter_by(is_deleted=0, is_closed="是").with_entities(
+        db.func.count(Tuban.id)
+    )
+
+
+def _index_week_todo():
+    # app.index：本周待办
+    today = datetime.now().date()
+    return Tuban.query.filter(
+        Tuban.is_deleted == 0,
+        Tuban.rectify_deadline <= today + timedelta(days=7),
+        Tuban.rectify_deadline >= today,
+        Tuban.rectify_status.in_(UNRESOLVED_STATUSES),
+    ).with_entities(db.func.count(Tuban.id))
+
+
+HOT_QUERIES: dict[str, Callable] = {
+    "tuban.list": _tuban_list_default,
+    "tuban.list[park_name]": _tuban_list_by_park,
+    "tuban.list[rectify_status]": _tuban_list_by_status,
+    "stats.api_overdue_list": _stats_overdue_list,
+    "map.api_tubans": _map_tubans,
+    "map.api_tubans[func_zone]": _map_tubans_by_zone,
+    "index.total_count": _index_total_count,
+    "index.problem_stats": _index_problem_stats,
+    "index.zone_stats": _index_zone_stats,
+    "index.closed_count": _index_closed_count,
+    "index.week_todo": _index_week_todo,
+}
+
+
+def explain_query(query) -> list[str]:
+    """
+    获取查询的执行计划（SQLite EXPLAIN QUERY PLAN）
+
+    通过游标事件在实际执行前以相同的绑定参数执行 EXPLAIN，
+    保证计划与运行时一致（部分索引能否命中与参数是否为字面量有关）。
+    """
+    plan: list[str] = []
+    connection = db.session.connection()
+
+    def _explain(conn, cursor, statement, parameters, context, executemany):
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        plan.extend(row[3] for row in cursor.fetchall())
+        # 只需要执行计划，中止真正的查询
+        raise _PlanCaptured()
+
+    event.listen(connection, "before_cursor_execute", _explain)
+    try:
+        query.all()
+    except _PlanCaptured:
+        pass
+    finally:
+        event.remove(connection, "before_cursor_execute", _explain)
+    return plan
+
+
+def find_full_scans(plan: list[str]) -> list[str]:
+    """从执行计划中找出全表扫描步骤"""
+    return [step for step in plan if FULL_SCAN_PATTERN.match(step)]
+
+
+def check_query_plans() -> dict[str, dict]:
+    """
+    检查所有高频查询的执行计划
+
+    Returns:
+        {查询名: {'plan': [...], 'full_scans': [...], 'ok': bool}}
+    """
+    if db.engine.dialect.name != "sqlite":
+        raise RuntimeError("执行计划检查仅支持SQLite数据库")
+
+    results = {}
+    for name, build_query in HOT_QUERIES.items():
+        plan = explain_query(build_query())
+        full_scans = find_full_scans(plan)
+        results[name] = {"plan": plan, "full_scans": full_scans, "ok": not full_scans}
+    return results
+
+
+def print_query_plan_report(results: dict[str, dict]) -> bool:
+    """打印执行计划报告，全部通过返回True"""
+    all_ok = True
+    for name, result in results.items():
+        status = "ok" if result["ok"] else "FULL SCAN"
+        print(f"[{status}] {name}")
+        for step in result["plan"]:
+            print(f"    {step}")
+        all_ok = all_ok and result["ok"]
+    return all_ok
@@ -0,0 +1,378 @@
+"""
+项目公文全文检索模块
+
+对项目文档（标题、描述、提取文本、AI摘要）和时间线记录（标题、对方单位、
+详细内容、AI摘要）建立全文索引。
+
+SQLite下使用FTS5虚拟表：中文按相邻两字切分（bigram）后写入索引，
+检索词同样切分并按短语匹配，用 bm25 排序；摘要片段在Python端从原文截取并高亮。
+其他数据库（或SQLite未编译FTS5时）退化为 ILIKE 匹配。
+
+索引写入在调用方的会话中执行，随业务数据一起提交。
+"""
+
+import re
+from dataclasses import dataclass
+
+from markupsafe import Markup, escape
+from sqlalchemy import or_, text
+
+from models import db
+from models.project import Project, ProjectDocument, ProjectTimeline
+from utils.db_dialect import icontains
+
+FTS_TABLE = "project_search_fts"
+
+SOURCE_DOCUMENT = "document"
+SOURCE_TIMELINE = "timeline"
+# rowid = 业务主键 * 2 + 来源编号，便于按主键增量更新/删除
+_SOURCE_CODES = {SOURCE_DOCUMENT: 0, SOURCE_TIMELINE: 1}
+
+# bm25 列权重：标题、正文、摘要
+BM25_WEIGHTS = (5.0, 1.0, 2.0)
+SNIPPET_RADIUS = 60
+
+_CJK_RUN = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+")
+_TERM_PATTERN = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+|[0-9A-Za-z]+")
+
+# 按数据库URL缓存FTS表是否可用
+_fts_ready: dict[str, bool] = {}
+
+
+@dataclass
+class SearchHit:
+    source_type: str
+    source_id: int
+    project_id: int
+    project_name: str
+    title: str
+    snippet: Markup
+    score: float
+
+
+def segment_text(value: str | None) -> str:
+    """
+    中文按bigram切分、英文数字按词切分
+
+    "地质灾害评估" -> "地质 质灾 灾害 害评 评估"，单个汉字保留原样。
+    """
+    if not value:
+        return ""
+    tokens = []
+    for term in _TERM_PATTERN.findall(value):
+        if _CJK_RUN.fullmatch(term):
+            if len(term) == 1:
+                tokens.append(term)
+            else:
+                tokens.extend(term[i : i + 2] for i in range(len(term) - 1))
+        else:
+            tokens.append(term.lower())
+    return " ".join(tokens)
+
+
+def query_terms(keyword: str) -> list[str]:
+    """拆分检索词（连续汉字或英文数字为一个词）"""
+    return _TERM_PATTERN.findall(keyword or "")
+
+
+def build_match_query(keyword: str) -> str | None:
+    """构建FTS5 MATCH表达式：每个检索词切分后作为短语，多个词之间为AND"""
+    phrases = []
+    for term in query_terms(keyword):
+        segmented = segment_text(term)
+        if not segmented:
+            continue
+        if _CJK_RUN.fullmatch(term) and len(term) == 1:
+            # 单个汉字：前缀匹配以该字开头的bigram
+            phrases.append(f'"{segmented}"*')
+        else:
+            phrases.append(f'"{segmented}"')
+    return " AND ".join(phrases) if phrases else None
+
+
+def is_fts_enabled() -> bool:
+    """当前数据库是否可以使用FTS5索引"""
+    if db.engine.dialect.name != "sqlite":
+        return False
+    url = str(db.engine.url)
+    if url not in _fts_ready:
+        exists = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:name"),
+            {"name": FTS_TABLE},
+        ).first()
+        _fts_ready[url] = exists is not None
+    return _fts_ready[url]
+
+
+def ensure_search_index() -> bool:
+    """创建FTS5索引表（已存在时跳过），返回是否可用"""
+    if db.engine.dialect.name != "sqlite":
+        return False
+    try:
+        db.session.execute(
+            text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "title, body, summary, "
+                "source_type UNINDEXED, source_id UNINDEXED, project_id UNINDEXED, "
+                "tokenize='unicode61')"
+            )
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"FTS5不可用，全文检索将使用模糊匹配: {e}")
+        return False
+    _fts_ready[str(db.engine.url)] = True
+    return True
+
+
+def _rowid(source_type: str, source_id: int) -> int:
+    return source_id * 2 + _SOURCE_CODES[source_type]
+
+
+def _write_entry(source_type, source_id, project_id, title, body, summary) -> None:
+    rowid = _rowid(source_type, source_id)
+    db.session.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"), {"rowid": rowid}
+    )
+    db.session.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE} "
+            "(rowid, title, body, summary, source_type, source_id, project_id) "
+            "VALUES (:rowid, :title, :body, :summary, :source_type, :source_id, :project_id)"
+        ),
+        {
+            "rowid": rowid,
+            "title": segment_text(title),
+            "body": segment_text(body),
+            "summary": segment_text(summary),
+            "source_type": source_type,
+            "source_id": source_id,
+            "project_id": project_id,
+        },
+    )
+
+
+def _document_fields(doc: ProjectDocument) -> tuple[str, str, str]:
+    body = "\n".join(part for part in (doc.description, doc.extracted_text) if part)
+    return doc.doc_title or "", body, doc.ai_summary or ""
+
+
+def _timeline_fields(timeline: ProjectTimeline) -> tuple[str, str, str]:
+    title = " ".join(
+        part for part in (timeline.event_title, timeline.opposite_party) if part
+    )
+    return title, timeline.content or "", timeline.ai_summary or ""
+
+
+def index_document(doc: ProjectDocument) -> None:
+    """写入/更新文档索引（需已flush获得主键）"""
+    if not is_fts_enabled():
+        return
+    _write_entry(SOURCE_DOCUMENT, doc.id, doc.project_id, *_document_fields(doc))
+
+
+def index_timeline(timeline: ProjectTimeline) -> None:
+    """写入/更新时间线索引（需已flush获得主键）"""
+    if not is_fts_enabled():
+        return
+    _write_entry(
+        SOURCE_TIMELINE, timeline.id, timeline.project_id, *_timeline_fields(timeline)
+    )
+
+
+def remove_from_index(source_type: str, source_id: int) -> None:
+    """删除索引条目"""
+    if not is_fts_enabled():
+        return
+    db.session.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"),
+        {"rowid": _rowid(source_type, source_id)},
+    )
+
+
+def rebuild_search_index(batch_size: int = 500) -> dict[str, int]:
+    """重建全部索引（分批读取，最后统一提交）"""
+    if not ensure_search_index():
+        raise RuntimeError("当前数据库不支持FTS5全文索引")
+
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    counts = {SOURCE_DOCUMENT: 0, SOURCE_TIMELINE: 0}
+    for doc in ProjectDocument.query.order_by(ProjectDocument.id).yield_per(batch_size):
+        index_document(doc)
+        counts[SOURCE_DOCUMENT] += 1
+    for timeline in ProjectTimeline.query.order_by(ProjectTimeline.id).yield_per(
+        batch_size
+    ):
+        index_timeline(timeline)
+        counts[SOURCE_TIMELINE] += 1
+    db.session.execute(
+        text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    )
+    db.session.commit()
+    return counts
+
+
+def highlight_snippet(value: str | None, terms: list[str]) -> Markup:
+    """从原文截取首个命中位置附近的片段，并用<mark>高亮检索词"""
+    if not value:
+        return Markup("")
+    lowered = value.lower()
+    positions = [lowered.find(term.lower()) for term in terms]
+    positions = [pos for pos in positions if pos >= 0]
+    start = max(0, min(positions) - SNIPPET_RADIUS) if positions else 0
+    end = min(len(value), start + SNIPPET_RADIUS * 3)
+    fragment = value[start:end].replace("\n", " ")
+
+    pattern = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    parts = []
+    last = 0
+    if pattern:
+        for match in re.finditer(pattern, fragment, flags=re.IGNORECASE):
+            parts.append(escape(fragment[last : match.start()]))
+            parts.append(Markup("<mark>%s</mark>") % match.group(0))
+            last = match.end()
+    parts.append(escape(fragment[last:]))
+
+    prefix = "..." if start > 0 else ""
+    suffix = "..." if end < len(value) else ""
+    return Markup(prefix) + Markup("").join(parts) + Markup(suffix)
+
+
+def _best_snippet(fields: tuple[str, str, str], terms: list[str]) -> Markup:
+    # 优先在正文中截取，其次摘要、标题
+    title, body, summary = fields
+    for value in (body, summary, title):
+        if value and any(term.lower() in value.lower() for term in terms):
+            return highlight_snippet(value, terms)
+    return highlight_snippet(summary or body, terms)
+
+
+def search_project_content(keyword: str, limit: int = 50) -> list[SearchHit]:
+    """
+    检索项目文档与时间线
+
+    Returns:
+        按相关度排序的命中列表
+    """
+    terms = query_terms(keyword)
+    if not terms:
+        return []
+
+    if is_fts_enabled():
+        ranked = _search_fts(keyword, limit)
+    else:
+        ranked = _search_like(terms, limit)
+    if not ranked:
+        return []
+
+    doc_ids = [sid for stype, sid, _ in ranked if stype == SOURCE_DOCUMENT]
+    timeline_ids = [sid for stype, sid, _ in ranked if stype == SOURCE_TIMELINE]
+    docs = {
+        doc.id: doc
+        for doc in ProjectDocument.query.filter(ProjectDocument.id.in_(doc_ids))
+    }
+    timelines = {
+        timeline.id: timeline
+        for timeline in ProjectTimeline.query.filter(
+            ProjectTimeline.id.in_(timeline_ids)
+        )
+    }
+
+    project_ids = {item.project_id for item in [*docs.values(), *timelines.values()]}
+    project_names = dict(
+        db.session.query(Project.id, Project.project_name).filter(
+            Project.id.in_(project_ids), Project.is_active == 1
+        )
+    )
+
+    hits = []
+    for source_type, source_id, score in ranked:
+        if source_type == SOURCE_DOCUMENT:
+            item = docs.get(source_id)
+            fields = _document_fields(item) if item else None
+            title = item.doc_title if item else ""
+        else:
+            item = timelines.get(source_id)
+            fields = _timeline_fields(item) if item else None
+            title = item.event_title if item else ""
+        # 索引过期或项目已删除时跳过
+        if item is None or item.project_id not in project_names:
+            continue
+        hits.append(
+            SearchHit(
+                source_type=source_type,
+                source_id=source_id,
+                project_id=item.project_id,
+                project_name=project_names[item.project_id],
+                title=title or "",
+                snippet=_best_snippet(fields, terms),
+                score=score,
+            )
+        )
+    return hits
+
+
+def _search_fts(keyword: str, limit: int) -> list[tuple[str, int, float]]:
+    match_query = build_match_query(keyword)
+    if not match_query:
+        return []
+    weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+    rows = db.session.execute(
+        text(
+            f"SELECT source_type, source_id, bm25({FTS_TABLE}, {weights}) AS score "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :query "
+            "ORDER BY score LIMIT :limit"
+        ),
+        {"query": match_query, "limit": limit},
+    )
+    # bm25 越小越相关，取负数使分数越大越相关
+    return [(row.source_type, int(row.source_id), -row.score) for row in rows]
+
+
+def _search_like(terms: list[str], limit: int) -> list[tuple[str, int, float]]:
+    """无FTS时的模糊匹配：所有检索词都需命中，按命中次数排序"""
+    doc_columns = [
+        ProjectDocument.doc_title,
+        ProjectDocument.description,
+        ProjectDocument.extracted_text,
+        ProjectDocument.ai_summary,
+    ]
+    timeline_columns = [
+        ProjectTimeline.event_title,
+        ProjectTimeline.opposite_party,
+        ProjectTimeline.content,
+        ProjectTimeline.ai_summary,
+    ]
+
+    def _filters(columns):
+        return [or_(*(icontains(column, term) for column in columns)) for term in terms]
+
+    ranked = []
+    for doc in ProjectDocument.query.filter(*_filters(doc_columns)).limit(limit * 4):
+        ranked.append(
+            (SOURCE_DOCUMENT, doc.id, _count_terms(_document_fields(doc), terms))
+        )
+    for timeline in ProjectTimeline.query.filter(*_filters(timeline_columns)).limit(
+        limit * 4
+    ):
+        ranked.append(
+            (
+                SOURCE_TIMELINE,
+                timeline.id,
+                _count_terms(_timeline_fields(timeline), terms),
+            )
+        )
+    ranked.sort(key=lambda item: item[2], reverse=True)
+    return ranked[:limit]
+
+
+def _count_terms(fields: tuple[str, str, str], terms: list[str]) -> float:
+    title, body, summary = (value.lower() for value in fields)
+    score = 0.0
+    for term in terms:
+        term = term.lower()
+        score += title.count(term) * BM25_WEIGHTS[0]
+        score += body.count(term) * BM25_WEIGHTS[1]
+        score += summary.count(term) * BM25_WEIGHTS[2]
+    return score
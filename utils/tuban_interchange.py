@@ -0,0 +1,234 @@
+"""
+图斑数据 CSV / Parquet 批量交换模块
+
+导出：按筛选条件用服务端游标（yield_per）分批读取，
+    - CSV 边查询边输出，不在内存中拼接整个文件
+    - Parquet 每批写为一个 row group 到临时文件，写完后发送并删除
+导入：CSV 按行流式读取、Parquet 按 record batch 读取，每 IMPORT_CHUNK_ROWS
+行规范化后经写入队列提交一次，复用 Excel 导入的行哈希与 upsert 逻辑。
+
+列名使用图斑字段名（tuban_code、park_name…），导入时也接受 Excel 模板的中文列名。
+日期为 ISO 格式（Parquet 为 date32），金额/坐标/面积为按字段精度的十进制数
+（Parquet 为 decimal128），导出再导入数值不经过浮点，行哈希保持不变。
+
+Parquet 依赖 pyarrow（可选），未安装时只能使用 CSV。
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import os
+import tempfile
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from urllib.parse import quote
+
+from flask import Response, send_file, stream_with_context
+
+from models import db
+from models.tuban import Tuban
+from utils.excel_handler import (
+    IMPORT_COLUMN_MAPPING,
+    IMPORT_MODE_INSERT,
+    IMPORT_MODES,
+    IMPORT_NUMERIC_SCALES,
+    normalize_import_record,
+    save_import_records,
+)
+
+EXPORT_FORMATS = ("csv", "parquet")
+IMPORT_FORMATS = ("csv", "parquet")
+EXPORT_FIELDS = list(IMPORT_COLUMN_MAPPING.values()) + ["created_at", "updated_at"]
+EXPORT_BATCH_SIZE = 2000
+IMPORT_CHUNK_ROWS = 5000
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    return pa, pq
+
+
+def parquet_available() -> bool:
+    """是否支持Parquet（已安装pyarrow）"""
+    return _import_pyarrow() is not None
+
+
+def iter_tuban_batches(query, batch_size: int = EXPORT_BATCH_SIZE):
+    """按批产出导出字段的行元组（服务端游标，内存占用与总行数无关）"""
+    columns = [getattr(Tuban, field) for field in EXPORT_FIELDS]
+    rows = query.with_entities(*columns).order_by(None).order_by(Tuban.id)
+    batch = []
+    for row in rows.yield_per(batch_size):
+        batch.append(tuple(row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, Decimal):
+        return format(value, "f")
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def content_disposition(filename: str) -> str:
+    """下载响应头（中文文件名按 RFC 5987 编码）"""
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
+
+
+def stream_tubans_csv(query, filename: str):
+    """流式导出CSV（UTF-8带BOM，Excel可直接识别中文）"""
+
+    def generate():
+        buffer = io.StringIO()
+        buffer.write("\ufeff")
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        for batch in iter_tuban_batches(query):
+            writer.writerows([_csv_value(value) for value in row] for row in batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    response = Response(stream_with_context(generate()), mimetype="text/csv")
+    response.headers["Content-Disposition"] = content_disposition(filename)
+    return response
+
+
+def _arrow_schema(pa):
+    fields = []
+    for name in EXPORT_FIELDS:
+        column_type = Tuban.__table__.c[name].type
+        if name in IMPORT_NUMERIC_SCALES:
+            arrow_type = pa.decimal128(column_type.precision, column_type.scale)
+        elif isinstance(column_type, db.DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(column_type, db.Date):
+            arrow_type = pa.date32()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _arrow_columns(batch):
+    """行元组转为列，十进制数按字段精度取整（decimal128 要求位数一致）"""
+    columns = [list(values) for values in zip(*batch)]
+    for index, name in enumerate(EXPORT_FIELDS):
+        if name in IMPORT_NUMERIC_SCALES:
+            exponent = Decimal(1).scaleb(-IMPORT_NUMERIC_SCALES[name])
+            columns[index] = [
+                None if value is None else Decimal(value).quantize(exponent)
+                for value in columns[index]
+            ]
+    return columns
+
+
+def write_tubans_parquet(query, path: str) -> int:
+    """把查询结果写入Parquet文件（每批一个row group），返回行数"""
+    pa, pq = _import_pyarrow()
+    schema = _arrow_schema(pa)
+    total = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in iter_tuban_batches(query):
+            writer.write_table(
+                pa.Table.from_arrays(
+                    [
+                        pa.array(column, type=field.type)
+                        for column, field in zip(_arrow_columns(batch), schema)
+                    ],
+                    schema=schema,
+                )
+            )
+            total += len(batch)
+    return total
+
+
+def send_tubans_parquet(query, filename: str):
+    """导出Parquet：写入临时文件后发送，响应结束时删除"""
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    try:
+        write_tubans_parquet(query, path)
+        response = send_file(
+            path,
+            mimetype="application/vnd.apache.parquet",
+            as_attachment=True,
+            download_name=filename,
+        )
+    except Exception:
+        os.remove(path)
+        raise
+    response.call_on_close(lambda: os.path.exists(path) and os.remove(path))
+    return response
+
+
+def _rename_columns(row: dict) -> dict:
+    """中文列名转为字段名，字段名列原样保留"""
+    return {
+        IMPORT_COLUMN_MAPPING.get(key.strip(), key.strip()): v for key, v in row.items()
+    }
+
+
+def _iter_csv_chunks(path: str, chunk_size: int):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        while True:
+            rows = [_rename_columns(row) for row in islice(reader, chunk_size)]
+            if not rows:
+                break
+            yield rows
+
+
+def _iter_parquet_chunks(path: str, chunk_size: int):
+    pyarrow = _import_pyarrow()
+    if pyarrow is None:
+        raise Exception("读取Parquet需要安装 pyarrow")
+    parquet_file = pyarrow[1].ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        yield [_rename_columns(row) for row in batch.to_pylist()]
+
+
+def load_tubans_from_file(
+    path: str, mode: str = IMPORT_MODE_INSERT, chunk_size: int = IMPORT_CHUNK_ROWS
+) -> dict[str, int]:
+    """
+    分块导入CSV/Parquet文件
+
+    Args:
+        mode: "insert" 跳过已存在的图斑编号；"upsert" 只更新内容有变化的图斑
+
+    Returns:
+        {"inserted", "updated", "unchanged", "skipped"}
+    """
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"不支持的导入模式: {mode}")
+    ext = path.rsplit(".", 1)[-1].lower()
+    if ext == "csv":
+        chunks = _iter_csv_chunks(path, chunk_size)
+    elif ext == "parquet":
+        chunks = _iter_parquet_chunks(path, chunk_size)
+    else:
+        raise ValueError(f"不支持的文件格式: {ext}")
+
+    totals = Counter({"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0})
+    for rows in chunks:
+        records = [normalize_import_record(row) for row in rows]
+        totals.update(save_import_records(records, mode))
+    return dict(totals)
@@ -0,0 +1,478 @@
+"""
+上传目录孤儿文件回收模块
+
+对照数据库中的全部引用扫描 UPLOAD_FOLDER，找出不再被引用的文件：
+软删除的图片及其派生图/瓦片、已删除图斑和被替换的附件、失败导入的临时文件等。
+
+流程：
+    1. 从数据库流式读取全部引用，汇总为集合（blob 以32字节摘要保存，省内存）
+    2. 用 os.scandir 逐目录流式遍历上传目录，逐个做集合判断，不构建文件列表；
+       未被引用的瓦片目录整体处理，不逐个遍历瓦片
+    3. 修改时间在宽限期（UPLOAD_GC_GRACE_HOURS）内的文件跳过，避免误收
+       刚上传还未保存表单、或正在生成的派生图/瓦片
+    4. 孤儿移动到 .quarantine/<批次时间>/ 下（保持相对路径，同一文件系统内
+       只是 rename），超过 UPLOAD_GC_QUARANTINE_DAYS 的隔离批次再彻底删除
+
+.chunks 下的分块上传会话由 cleanup_stale_uploads() 按有效期清理。
+同一时间只允许一个回收任务运行（上传目录下的 .gc.lock）。
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from flask import current_app
+
+from models import db
+from models.blob import Blob
+from utils.blob_store import BLOBS_DIRNAME, TMP_DIRNAME, iter_all_refs, parse_blob_ref
+from utils.chunked_upload import CHUNKS_DIRNAME, cleanup_stale_uploads
+from utils.image_tiles import TILES_DIRNAME
+
+IMAGES_DIRNAME = "images"
+QUARANTINE_DIRNAME = ".quarantine"
+LOCK_FILENAME = ".gc.lock"
+BATCH_FORMAT = "%Y%m%d-%H%M%S"
+LOCK_STALE_SECONDS = 6 * 3600
+BLOB_CHECK_BATCH = 500
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+_DERIVATIVE_RE = re.compile(r"^(?P<stem>.+)_(?:thumb|medium)\.[A-Za-z0-9]+$")
+_TILE_ENTRY_RE = re.compile(r"^(?P<stem>.+?)(?:\.dzi|_files)$")
+
+
+class UploadGCError(Exception):
+    """回收任务无法执行（如已有任务在运行）"""
+
+
+@dataclass
+class LiveReferences:
+    """数据库中仍有效的引用"""
+
+    blob_digests: set[bytes] = field(default_factory=set)
+    # 旧格式引用，相对上传目录的路径（/ 分隔）
+    paths: set[str] = field(default_factory=set)
+    # 未删除图片的文件名主干（派生图、瓦片按主干命名）
+    image_stems: set[str] = field(default_factory=set)
+
+
+class Orphan(NamedTuple):
+    relpath: str
+    path: str
+    size: int
+    mtime: float
+    is_dir: bool = False
+    sha256: str | None = None
+
+
+def _normalize_ref(ref: str) -> str:
+    return os.path.normpath(ref.strip()).replace("\\", "/").lstrip("/")
+
+
+def collect_live_references() -> LiveReferences:
+    """从数据库流式汇总全部有效引用"""
+    from models.tuban import Tuban
+    from models.tuban_image import TubanImage
+
+    refs = LiveReferences()
+    for ref in iter_all_refs():
+        sha256 = parse_blob_ref(ref)
+        if sha256:
+            refs.blob_digests.add(bytes.fromhex(sha256))
+        else:
+            refs.paths.add(_normalize_ref(ref))
+
+    statement = (
+        db.select(
+            TubanImage.filename, TubanImage.thumb_filename, TubanImage.medium_filename
+        )
+        .join(Tuban, Tuban.id == TubanImage.tuban_id)
+        .where(TubanImage.is_deleted == 0, Tuban.is_deleted == 0)
+        .execution_options(yield_per=1000)
+    )
+    for filename, thumb, medium in db.session.execute(statement):
+        refs.image_stems.add(filename.rsplit(".", 1)[0])
+        for name in (filename, thumb, medium):
+            if name:
+                refs.paths.add(f"{IMAGES_DIRNAME}/{name}")
+    return refs
+
+
+def _scandir(path: str):
+    try:
+        with os.scandir(path) as entries:
+            yield from entries
+    except OSError as e:
+        print(f"[skip] 无法读取目录 {path}: {e}")
+
+
+def _dir_size(path: str) -> int:
+    """目录总字节数（流式累加）"""
+    total = 0
+    stack = [path]
+    while stack:
+        for entry in _scandir(stack.pop()):
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+
+def _file_orphan(entry, relpath: str, sha256: str | None = None) -> Orphan:
+    stat = entry.stat(follow_symlinks=False)
+    return Orphan(relpath, entry.path, stat.st_size, stat.st_mtime, sha256=sha256)
+
+
+def _dir_orphan(entry, relpath: str) -> Orphan:
+    stat = entry.stat(follow_symlinks=False)
+    return Orphan(relpath, entry.path, _dir_size(entry.path), stat.st_mtime, True)
+
+
+def _iter_files(path: str, relpath: str):
+    """递归遍历目录下的文件，产出 (DirEntry, 相对路径)"""
+    stack = [(path, relpath)]
+    while stack:
+        dir_path, dir_rel = stack.pop()
+        for entry in _scandir(dir_path):
+            entry_rel = f"{dir_rel}/{entry.name}"
+            if entry.is_dir(follow_symlinks=False):
+                stack.append((entry.path, entry_rel))
+            elif entry.is_file(follow_symlinks=False):
+                yield entry, entry_rel
+
+
+def _blob_orphans(path: str, refs: LiveReferences, stats: Counter):
+    for entry, relpath in _iter_files(path, BLOBS_DIRNAME):
+        stats["scanned"] += 1
+        name = entry.name
+        if relpath.startswith(f"{BLOBS_DIRNAME}/{TMP_DIRNAME}/"):
+            # 中断的写入留下的临时文件
+            yield _file_orphan(entry, relpath)
+        elif _SHA256_RE.match(name):
+            if bytes.fromhex(name) not in refs.blob_digests:
+                yield _file_orphan(entry, relpath, sha256=name)
+        else:
+            yield _file_orphan(entry, relpath)
+
+
+def _tile_orphans(path: str, refs: LiveReferences, stats: Counter):
+    relbase = f"{IMAGES_DIRNAME}/{TILES_DIRNAME}"
+    for entry in _scandir(path):
+        stats["scanned"] += 1
+        relpath = f"{relbase}/{entry.name}"
+        match = _TILE_ENTRY_RE.match(entry.name)
+        if match and match.group("stem") in refs.image_stems:
+            continue
+        # 已删除图片的瓦片目录、中断生成的 .tmp 目录/清单
+        if entry.is_dir(follow_symlinks=False):
+            yield _dir_orphan(entry, relpath)
+        elif entry.is_file(follow_symlinks=False):
+            yield _file_orphan(entry, relpath)
+
+
+def _image_orphans(path: str, refs: LiveReferences, stats: Counter):
+    for entry in _scandir(path):
+        relpath = f"{IMAGES_DIRNAME}/{entry.name}"
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name == TILES_DIRNAME:
+                yield from _tile_orphans(entry.path, refs, stats)
+            else:
+                yield from _legacy_orphans(entry.path, relpath, refs, stats)
+            continue
+        if not entry.is_file(follow_symlinks=False):
+            continue
+        stats["scanned"] += 1
+        if relpath in refs.paths:
+            continue
+        match = _DERIVATIVE_RE.match(entry.name)
+        if match and match.group("stem") in refs.image_stems:
+            continue
+        yield _file_orphan(entry, relpath)
+
+
+def _legacy_orphans(path: str, relpath: str, refs: LiveReferences, stats: Counter):
+    for entry, entry_rel in _iter_files(path, relpath):
+        stats["scanned"] += 1
+        if entry_rel not in refs.paths:
+            yield _file_orphan(entry, entry_rel)
+
+
+def iter_orphans(upload_root: str, refs: LiveReferences, stats: Counter):
+    """流式遍历上传目录，产出未被引用的文件/目录（未做宽限期过滤）"""
+    for entry in _scandir(upload_root):
+        name = entry.name
+        if entry.is_dir(follow_symlinks=False):
+            if name in (CHUNKS_DIRNAME, QUARANTINE_DIRNAME):
+                continue
+            if name == BLOBS_DIRNAME:
+                yield from _blob_orphans(entry.path, refs, stats)
+            elif name == IMAGES_DIRNAME:
+                yield from _image_orphans(entry.path, refs, stats)
+            else:
+                yield from _legacy_orphans(entry.path, name, refs, stats)
+        elif entry.is_file(follow_symlinks=False) and name != LOCK_FILENAME:
+            stats["scanned"] += 1
+            if name not in refs.paths:
+                yield _file_orphan(entry, name)
+
+
+def _referenced_digests(sha256_list: list[str]) -> set[str]:
+    """扫描期间又被引用的blob（引用计数大于0）"""
+    rows = db.session.execute(
+        db.select(Blob.sha256).where(Blob.sha256.in_(sha256_list), Blob.ref_count > 0)
+    )
+    return {sha256 for (sha256,) in rows}
+
+
+class _Quarantine:
+    """把孤儿移动到一个隔离批次目录"""
+
+    def __init__(self, upload_root: str, report_only: bool):
+        self.upload_root = upload_root
+        self.report_only = report_only
+        self.batch_dir = os.path.join(
+            upload_root, QUARANTINE_DIRNAME, datetime.now().strftime(BATCH_FORMAT)
+        )
+        self._created_dirs: set[str] = set()
+
+    def move(self, orphan: Orphan, cutoff: float) -> bool:
+        if self.report_only:
+            return False
+        try:
+            # 扫描后文件可能又被写入（重复上传会刷新blob的修改时间）
+            if os.stat(orphan.path, follow_symlinks=False).st_mtime >= cutoff:
+                return False
+            target = os.path.join(self.batch_dir, *orphan.relpath.split("/"))
+            parent = os.path.dirname(target)
+            if parent not in self._created_dirs:
+                os.makedirs(parent, exist_ok=True)
+                self._created_dirs.add(parent)
+            os.replace(orphan.path, target)
+        except FileNotFoundError:
+            return False
+        return True
+
+
+def quarantine_orphans(
+    upload_root: str,
+    refs: LiveReferences,
+    cutoff: float,
+    stats: Counter,
+    report_only: bool = False,
+) -> None:
+    """隔离宽限期之前的孤儿，统计写入 stats"""
+    quarantine = _Quarantine(upload_root, report_only)
+    pending_blobs: list[Orphan] = []
+
+    def handle(orphan: Orphan) -> None:
+        stats["orphan_files"] += 1
+        stats["orphan_bytes"] += orphan.size
+        if quarantine.move(orphan, cutoff):
+            stats["quarantined_files"] += 1
+            stats["quarantined_bytes"] += orphan.size
+
+    def flush_blobs() -> None:
+        referenced = _referenced_digests([o.sha256 for o in pending_blobs])
+        for orphan in pending_blobs:
+            if orphan.sha256 in referenced:
+                stats["skipped_referenced"] += 1
+            else:
+                handle(orphan)
+        pending_blobs.clear()
+
+    for orphan in iter_orphans(upload_root, refs, stats):
+        if orphan.mtime >= cutoff:
+            stats["skipped_recent"] += 1
+            continue
+        if orphan.sha256:
+            # 按批复核引用计数，扫描期间被重新引用的blob不隔离
+            pending_blobs.append(orphan)
+            if len(pending_blobs) >= BLOB_CHECK_BATCH:
+                flush_blobs()
+        else:
+            handle(orphan)
+    if pending_blobs:
+        flush_blobs()
+
+
+def _batch_time(entry) -> datetime:
+    try:
+        return datetime.strptime(entry.name, BATCH_FORMAT)
+    except ValueError:
+        return datetime.fromtimestamp(entry.stat(follow_symlinks=False).st_mtime)
+
+
+def _delete_blob_rows(sha256_list: list[str]) -> int:
+    """删除已清除内容且无引用的blob记录（写入线程中执行）"""
+    result = db.session.execute(
+        db.delete(Blob).where(Blob.sha256.in_(sha256_list), Blob.ref_count <= 0)
+    )
+    return result.rowcount
+
+
+def purge_quarantine(upload_root: str, before: datetime, stats: Counter) -> None:
+    """彻底删除早于 before 的隔离批次，并删除对应的blob记录"""
+    from utils.blob_store import blob_path
+    from utils.write_queue import run_write
+
+    root = os.path.join(upload_root, QUARANTINE_DIRNAME)
+    if not os.path.isdir(root):
+        return
+    for batch in _scandir(root):
+        if not batch.is_dir(follow_symlinks=False) or _batch_time(batch) >= before:
+            continue
+        purged_blobs = []
+        for entry, _ in _iter_files(batch.path, batch.name):
+            stats["purged_files"] += 1
+            stats["purged_bytes"] += entry.stat(follow_symlinks=False).st_size
+            if _SHA256_RE.match(entry.name):
+                purged_blobs.append(entry.name)
+        shutil.rmtree(batch.path, ignore_errors=True)
+
+        # 隔离期间相同内容又被上传过的，blob文件和记录仍在使用
+        purged_blobs = [
+            sha256
+            for sha256 in purged_blobs
+            if not blob_path(upload_root, sha256).exists()
+        ]
+        for start in range(0, len(purged_blobs), BLOB_CHECK_BATCH):
+            stats["purged_blob_rows"] += run_write(
+                _delete_blob_rows, purged_blobs[start : start + BLOB_CHECK_BATCH]
+            )
+
+
+def restore_quarantine(upload_root: str, batch_name: str) -> dict[str, int]:
+    """把一个隔离批次中的文件移回原位置（原位置已有文件时保留在隔离区）"""
+    batch_dir = os.path.join(upload_root, QUARANTINE_DIRNAME, batch_name)
+    if os.path.basename(
+        os.path.normpath(batch_name)
+    ) != batch_name or not os.path.isdir(batch_dir):
+        raise UploadGCError(f"隔离批次不存在: {batch_name}")
+
+    stats = Counter()
+    for entry, relpath in _iter_files(batch_dir, ""):
+        target = os.path.join(upload_root, *relpath.lstrip("/").split("/"))
+        if os.path.exists(target):
+            stats["conflicts"] += 1
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(entry.path, target)
+        stats["restored"] += 1
+    if not stats["conflicts"]:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+    return dict(stats)
+
+
+@contextmanager
+def _gc_lock(upload_root: str):
+    """进程间互斥：同一上传目录同时只运行一个回收任务"""
+    lock_path = os.path.join(upload_root, LOCK_FILENAME)
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                stale = time.time() - os.stat(lock_path).st_mtime > LOCK_STALE_SECONDS
+            except FileNotFoundError:
+                continue
+            if not stale:
+                raise UploadGCError("已有回收任务正在运行")
+            # 上次任务异常退出留下的锁
+            os.remove(lock_path)
+    else:
+        raise UploadGCError("无法获取回收任务锁")
+
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+
+def run_gc(
+    report_only: bool = False,
+    grace_hours: float | None = None,
+    quarantine_days: float | None = None,
+) -> dict[str, int]:
+    """
+    执行一次孤儿文件回收（需要在应用上下文中调用）
+
+    Args:
+        report_only: 只统计可回收的文件和字节数，不移动/删除任何文件
+        grace_hours: 宽限期，默认 UPLOAD_GC_GRACE_HOURS
+        quarantine_days: 隔离保留天数，默认 UPLOAD_GC_QUARANTINE_DAYS
+
+    Returns:
+        统计：scanned、orphan_files/orphan_bytes（可回收）、quarantined_*、
+        purged_*、skipped_recent、skipped_referenced、stale_chunk_sessions
+    """
+    config = current_app.config
+    upload_root = config["UPLOAD_FOLDER"]
+    if grace_hours is None:
+        grace_hours = config["UPLOAD_GC_GRACE_HOURS"]
+    if quarantine_days is None:
+        quarantine_days = config["UPLOAD_GC_QUARANTINE_DAYS"]
+    if not os.path.isdir(upload_root):
+        return {}
+
+    stats = Counter()
+    with _gc_lock(upload_root):
+        refs = collect_live_references()
+        db.session.rollback()  # 结束读事务，扫描期间不占用数据库快照
+        cutoff = time.time() - grace_hours * 3600
+        quarantine_orphans(upload_root, refs, cutoff, stats, report_only)
+        if not report_only:
+            stats["stale_chunk_sessions"] = cleanup_stale_uploads()
+            purge_quarantine(
+                upload_root, datetime.now() - timedelta(days=quarantine_days), stats
+            )
+    return dict(stats)
+
+
+def _gc_loop(app, interval_seconds: float) -> None:
+    while True:
+        time.sleep(interval_seconds)
+        with app.app_context():
+            try:
+                stats = run_gc()
+                print(
+                    f"上传目录回收完成：隔离 {stats.get('quarantined_files', 0)} 个文件"
+                    f"（{stats.get('quarantined_bytes', 0)} 字节），"
+                    f"清除 {stats.get('purged_files', 0)} 个文件"
+                )
+            except UploadGCError as e:
+                print(f"上传目录回收跳过: {e}")
+            except Exception as e:
+                print(f"上传目录回收失败: {e}")
+            finally:
+                db.session.remove()
+
+
+def start_gc_scheduler(app) -> threading.Thread | None:
+    """按 UPLOAD_GC_INTERVAL_HOURS 在后台线程中定期回收（为0时不启动）"""
+    interval_hours = app.config.get("UPLOAD_GC_INTERVAL_HOURS", 0)
+    if interval_hours <= 0:
+        return None
+    thread = threading.Thread(
+        target=_gc_loop,
+        args=(app, interval_hours * 3600),
+        name="upload-gc",
+        daemon=True,
+    )
+    thread.start()
+    return thread
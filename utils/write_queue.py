@@ -0,0 +1,186 @@
+"""
+单写入线程队列模块
+
+SQLite同一时间只允许一个写事务。多线程服务下并发的写请求会争抢写锁并报
+"database is locked"。本模块把写事务集中交给一个专用写入线程执行：
+请求线程提交写入函数并等待 Future 结果，写入线程把同一时间窗内到达的
+多个写入合并为一次提交（group commit），每个写入函数在独立的SAVEPOINT中
+执行，单个失败不影响同批次其他写入。
+
+写入函数在写入线程的应用上下文中运行，只能使用 db.session，
+不能访问 request/session 等请求上下文对象，且不要自行 commit。
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from flask import current_app
+
+from models import db, mark_db_write
+from utils.db_tuning import set_immediate_transactions
+
+
+class WriteStillRunningError(TimeoutError):
+    """写入已开始执行但超时仍未完成，结果未知"""
+
+
+@dataclass
+class _WriteJob:
+    func: Callable[..., Any]
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+    future: Future = field(default_factory=Future)
+
+
+class WriteQueue:
+    """单写入线程 + 批量提交"""
+
+    def __init__(self, app, batch_size: int = 32, batch_window: float = 0.005):
+        self.app = app
+        self.batch_size = max(1, batch_size)
+        self.batch_window = max(0.0, batch_window)
+        self._queue: "queue.Queue[_WriteJob]" = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> Future:
+        """提交写入函数，返回 Future"""
+        self._ensure_started()
+        job = _WriteJob(func, args, kwargs)
+        self._queue.put(job)
+        return job.future
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="db-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        set_immediate_transactions(True)
+        with self.app.app_context():
+            while True:
+                batch = self._collect_batch()
+                try:
+                    self._execute_batch(batch)
+                except Exception as e:
+                    # 兜底：保证写入线程不退出，等待方不会永久阻塞
+                    self.app.logger.exception("写入队列批次执行失败: %s", e)
+                    for job in batch:
+                        if not job.future.done():
+                            job.future.set_exception(e)
+
+    def _collect_batch(self) -> list[_WriteJob]:
+        """阻塞等待第一个写入，然后在时间窗内收集更多写入"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _execute_batch(self, batch: list[_WriteJob]) -> None:
+        results: list[tuple[_WriteJob, Any, BaseException | None]] = []
+        try:
+            for job in batch:
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with db.session.begin_nested():
+                        result = job.func(*job.args, **job.kwargs)
+                    results.append((job, result, None))
+                except Exception as e:
+                    results.append((job, None, e))
+
+            try:
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                for job, _, error in results:
+                    job.future.set_exception(error or e)
+                return
+
+            for job, result, error in results:
+                if error is not None:
+                    job.future.set_exception(error)
+                else:
+                    job.future.set_result(result)
+        finally:
+            # 清空身份映射，避免写入线程长期持有过期对象
+            db.session.remove()
+
+
+def get_write_queue(app=None) -> WriteQueue:
+    """获取应用的写入队列（按应用单例）"""
+    app = app or current_app._get_current_object()
+    write_queue = app.extensions.get("write_queue")
+    if write_queue is None:
+        write_queue = WriteQueue(
+            app,
+            batch_size=app.config.get("WRITE_QUEUE_BATCH_SIZE", 32),
+            batch_window=app.config.get("WRITE_QUEUE_BATCH_WINDOW_MS", 5) / 1000,
+        )
+        app.extensions["write_queue"] = write_queue
+    return write_queue
+
+
+def submit_write(func: Callable[..., Any], *args, **kwargs) -> Future:
+    """提交写入函数到写入线程（不等待结果）"""
+    return get_write_queue().submit(func, *args, **kwargs)
+
+
+def run_write(func: Callable[..., Any], *args, **kwargs):
+    """
+    执行写入函数并返回其结果
+
+    启用写入队列时交给写入线程执行并等待；未启用时在当前会话中执行并提交。
+    写入函数抛出的异常会在调用方重新抛出。
+
+    等待超过 WRITE_QUEUE_TIMEOUT 时，尚未开始执行的写入被取消并抛出
+    TimeoutError（未写入，调用方可安全重试）；已开始执行的写入再等待一个
+    WRITE_QUEUE_TIMEOUT，仍未完成则抛出 WriteStillRunningError（写入可能
+    随后提交，调用方不应直接重试）。
+    """
+    app = current_app._get_current_object()
+    if not app.config.get("WRITE_QUEUE_ENABLED"):
+        try:
+            result = func(*args, **kwargs)
+            db.session.commit()
+            return result
+        except Exception:
+            db.session.rollback()
+            raise
+
+    timeout = app.config.get("WRITE_QUEUE_TIMEOUT", 60)
+    future = get_write_queue(app).submit(func, *args, **kwargs)
+    try:
+        result = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        # 写入线程跳过已取消的任务（set_running_or_notify_cancel）
+        if future.cancel():
+            raise TimeoutError("写入队列繁忙，本次保存未执行，请稍后重试")
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise WriteStillRunningError(
+                "写入仍在执行，结果未知，请稍后刷新确认，不要重复提交"
+            ) from None
+    # 写入线程没有请求上下文，由调用方记录写入时间（读己之写）
+    mark_db_write()
+    return result